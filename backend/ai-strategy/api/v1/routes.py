@@ -24,9 +24,9 @@ from models.responses import (
 )
 from core.generator import StrategyGenerator
 from core.validator import StrategyValidator
-from core.optimizer import StrategyOptimizer
+from core.optimizer import StrategyOptimizer, get_optimizer
 from templates.manager import TemplateManager
-from providers.factory import ProviderFactory
+from providers.factory import ProviderFactory, ProviderType
 from utils.logger import get_logger
 from utils.config import get_config
 
@@ -44,8 +44,8 @@ def get_strategy_validator() -> StrategyValidator:
     return StrategyValidator()
 
 def get_strategy_optimizer() -> StrategyOptimizer:
-    """获取策略优化器"""
-    return StrategyOptimizer()
+    """获取策略优化器，共享全局实例的执行器，由应用关闭时统一释放"""
+    return get_optimizer()
 
 def get_template_manager() -> TemplateManager:
     """获取模板管理器"""
@@ -79,8 +79,9 @@ async def health_check(
         
         for provider_name in enabled_providers:
             try:
-                provider = provider_factory.create_provider(provider_name)
-                is_connected = await provider.verify_connection()
+                # 复用工厂缓存的实例及其连接池，避免每次健康检查都新建会话
+                provider = provider_factory.get_or_create_provider(ProviderType(provider_name))
+                is_connected = await provider.validate_connection()
                 provider_status[provider_name] = "healthy" if is_connected else "unhealthy"
             except Exception as e:
                 logger.warning(f"提供商 {provider_name} 健康检查失败: {e}")
@@ -460,8 +461,8 @@ async def get_system_info(
         providers_info = {}
         for provider_name in config.get('llm_providers', {}).keys():
             try:
-                provider = provider_factory.get_provider(provider_name)
-                model_info = await provider.get_model_info()
+                provider = provider_factory.get_or_create_provider(ProviderType(provider_name))
+                model_info = provider.get_model_info()
                 providers_info[provider_name] = {
                     "available": True,
                     "model_info": model_info
@@ -0,0 +1,164 @@
+"""LLM响应缓存模块"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+from utils.logger import LoggerMixin
+
+try:
+    # orjson为C实现，序列化速度比标准库json快数倍
+    import orjson
+    
+    def _dumps_sorted(obj: Any) -> bytes:
+        """按键排序序列化为JSON字节串"""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+except ImportError:  # orjson不可用时回退到标准库json
+    def _dumps_sorted(obj: Any) -> bytes:
+        """按键排序序列化为JSON字节串"""
+        return json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+
+class CacheBackend(Protocol):
+    """缓存后端协议"""
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，不存在或已过期时返回None"""
+        ...
+    
+    async def set(self, key: str, value: Any) -> None:
+        """写入缓存值"""
+        ...
+    
+    async def delete(self, key: str) -> None:
+        """删除缓存值"""
+        ...
+    
+    async def clear(self) -> None:
+        """清空缓存"""
+        ...
+
+class MemoryCacheBackend:
+    """进程内LRU缓存后端
+    
+    超过容量时淘汰最久未使用的条目，条目超过TTL后视为失效
+    """
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        """初始化内存缓存后端
+        
+        Args:
+            max_size: 最大条目数
+            ttl: 条目有效期（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，不存在或已过期时返回None"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        
+        self._data.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: Any) -> None:
+        """写入缓存值，超出容量时淘汰最久未使用的条目"""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+    
+    async def delete(self, key: str) -> None:
+        """删除缓存值"""
+        self._data.pop(key, None)
+    
+    async def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        """当前条目数"""
+        return len(self._data)
+
+class LLMCache(LoggerMixin):
+    """LLM响应缓存
+    
+    以模型、提示词和生成参数的哈希作为键进行精确匹配，命中时可完全跳过LLM调用
+    """
+    
+    def __init__(self, backend: Optional[CacheBackend] = None, max_size: int = 1024, ttl: float = 3600):
+        """初始化LLM缓存
+        
+        Args:
+            backend: 缓存后端，默认使用进程内LRU缓存
+            max_size: 默认后端的最大条目数
+            ttl: 默认后端的条目有效期（秒）
+        """
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_size=max_size, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def cache_key(model: Any, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """计算缓存键
+        
+        Args:
+            model: 模型名称或模型列表
+            prompt: 提示词
+            params: 生成参数
+        
+        Returns:
+            SHA-256十六进制摘要
+        """
+        payload = _dumps_sorted({"model": model, "prompt": prompt, "params": params or {}})
+        return hashlib.sha256(payload).hexdigest()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值并记录命中统计
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            缓存值，未命中时返回None
+        """
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    async def set(self, key: str, value: Any) -> None:
+        """写入缓存值"""
+        await self.backend.set(key, value)
+    
+    async def delete(self, key: str) -> None:
+        """删除缓存值"""
+        await self.backend.delete(key)
+    
+    async def clear(self) -> None:
+        """清空缓存并重置统计"""
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -1,18 +1,123 @@
 """策略生成器核心模块"""
 
 import asyncio
+import functools
+import re
 import time
+import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from pathlib import Path
 
 from models.requests import StrategyRequest
 from models.responses import StrategyResponse, ModelResponse
 from models.strategy import Strategy
-from providers.factory import ProviderFactory, ProviderType
+from providers.factory import ProviderType, get_provider_factory
 from providers.base import BaseLLMProvider
 from utils.logger import LoggerMixin
 from utils.config import get_config
+from core.cache import LLMCache
+
+# 只用于控制生成过程、不写入提示词的自定义参数
+_GENERATION_PARAM_KEYS = frozenset(['max_tokens', 'temperature', 'timeout'])
+
+# 提供商名称字符串到ProviderType的映射，键取自各ProviderType成员的值
+_PROVIDER_TYPES: Dict[str, ProviderType] = {provider_type.value: provider_type for provider_type in ProviderType}
+
+# 策略综合评分权重：置信度、代码质量、风险指标、执行时间、完整性
+_SCORE_WEIGHTS = np.array([0.3, 0.25, 0.25, 0.1, 0.1])
+
+# 代码质量评估关注的特征，合并为一个正则以便单次扫描
+_CODE_FEATURE_PATTERN = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in {
+    'class_def': r'class',
+    'init_method': r'def __init__',
+    'signal_method': r'def generate_signals',
+    'comment_line': r'^[^\S\n]*#',
+    'import_stmt': r'import',
+    'try_block': r'try:',
+    'except_block': r'except',
+}.items()), re.MULTILINE)
+
+# 提示词末尾固定的代码要求，存放在独立文件中
+_SYSTEM_PROMPT_PATH = Path(__file__).parent / 'prompts' / 'system_prompt.txt'
+
+@functools.cache
+def _get_system_prompt() -> str:
+    """加载提示词末尾固定的代码要求
+    
+    文件只在首次调用时读取一次，之后直接返回进程内缓存的文本
+    
+    Returns:
+        代码要求文本
+    """
+    return _SYSTEM_PROMPT_PATH.read_text(encoding='utf-8').rstrip('\n')
+
+@functools.lru_cache(maxsize=None)
+def _get_prompt_skeleton(market_type: Any, time_frame: Any, risk_level: Any, use_ptrade_syntax: bool) -> str:
+    """构建提示词骨架
+    
+    市场类型、时间周期、风险等级和PTrade要求只有有限种组合，每种组合只拼接一次；
+    描述、模板和自定义参数保留为format占位符
+    
+    Args:
+        market_type: 市场类型
+        time_frame: 时间周期
+        risk_level: 风险等级
+        use_ptrade_syntax: 是否使用PTrade语法
+    
+    Returns:
+        含 {description}、{template}、{params} 占位符的提示词骨架
+    """
+    ptrade_line = "\n请使用PTrade框架语法编写策略代码。" if use_ptrade_syntax else ""
+    return (
+        f"请生成一个{market_type.value}市场的量化交易策略。\n"
+        "策略描述: {description}\n"
+        f"时间周期: {time_frame.value}\n"
+        f"风险等级: {risk_level.value}"
+        "{template}"
+        f"{ptrade_line}"
+        "{params}\n\n"
+        f"{_get_system_prompt()}"
+    )
+
+def _format_custom_params(custom_items: Tuple[Tuple[str, Any], ...]) -> str:
+    """格式化写入提示词的自定义参数"""
+    if not custom_items:
+        return ""
+    return "\n额外要求: " + ", ".join(f"{key}: {value}" for key, value in custom_items)
+
+@functools.lru_cache(maxsize=512)
+def _build_prompt_cached(
+    description: str,
+    market_type: Any,
+    time_frame: Any,
+    risk_level: Any,
+    template_id: Optional[str],
+    use_ptrade_syntax: bool,
+    custom_items: Tuple[Tuple[str, Any], ...]
+) -> str:
+    """根据请求字段构建提示词，相同字段组合直接命中缓存
+    
+    Args:
+        description: 策略描述
+        market_type: 市场类型
+        time_frame: 时间周期
+        risk_level: 风险等级
+        template_id: 模板ID
+        use_ptrade_syntax: 是否使用PTrade语法
+        custom_items: 写入提示词的自定义参数键值对
+    
+    Returns:
+        完整的提示词
+    """
+    skeleton = _get_prompt_skeleton(market_type, time_frame, risk_level, use_ptrade_syntax)
+    return skeleton.format(
+        description=description,
+        template=f"\n基于模板: {template_id}" if template_id else "",
+        params=_format_custom_params(custom_items)
+    )
 
 @dataclass
 class GenerationContext:
@@ -32,10 +137,15 @@ class StrategyGenerator(LoggerMixin):
     负责协调多个LLM提供商生成量化交易策略
     """
     
-    def __init__(self):
-        """初始化策略生成器"""
+    def __init__(self, cache: Optional[LLMCache] = None):
+        """初始化策略生成器
+        
+        Args:
+            cache: LLM响应缓存，未指定时按配置文件的cache节创建
+        """
         self.config = get_config()
-        self.provider_factory = ProviderFactory()
+        # 共享全局工厂缓存的提供商实例，复用其HTTP连接池，服务关闭时统一释放
+        self.provider_factory = get_provider_factory()
         self.executor = ThreadPoolExecutor(max_workers=5)
         
         # 从配置获取生成参数
@@ -44,6 +154,16 @@ class StrategyGenerator(LoggerMixin):
         self.default_timeout = generation_config.get('timeout', 60)
         self.enable_comparison = generation_config.get('enable_comparison', True)
         
+        # 响应缓存
+        if cache is None:
+            cache_config = self.config.get('cache', {})
+            if cache_config.get('enabled', False):
+                cache = LLMCache(
+                    max_size=cache_config.get('max_size', 1024),
+                    ttl=cache_config.get('ttl', 3600)
+                )
+        self.cache = cache
+        
         self.logger.info("策略生成器初始化完成")
     
     async def generate_strategy(self, request: StrategyRequest) -> StrategyResponse:
@@ -60,14 +180,25 @@ class StrategyGenerator(LoggerMixin):
         try:
             self.logger.info(f"开始生成策略，用户: {request.user_id}，模型: {request.models}")
             
-            # 创建生成上下文
-            context = await self._create_generation_context(request)
+            # 相同的确定性请求复用缓存的模型响应，跳过LLM调用；
+            # 缓存中只保存与用户无关的部分，响应按本次请求重新构建
+            cache_key = self._get_cache_key(request)
+            cached = await self.cache.get(cache_key) if cache_key else None
             
-            # 并发生成策略
-            model_responses = await self._generate_concurrent(context)
-            
-            # 选择最佳策略
-            best_strategy = self._select_best_strategy(model_responses)
+            if cached is not None:
+                self.logger.info("命中策略生成缓存")
+                model_responses = [ModelResponse(**item) for item in cached['model_responses']]
+                best_index = cached['best_index']
+                best_strategy = model_responses[best_index] if best_index is not None else None
+            else:
+                # 创建生成上下文
+                context = await self._create_generation_context(request)
+                
+                # 并发生成策略
+                model_responses = await self._generate_concurrent(context)
+                
+                # 选择最佳策略
+                best_strategy = self._select_best_strategy(model_responses)
             
             # 构建响应
             response = self._build_response(
@@ -77,6 +208,13 @@ class StrategyGenerator(LoggerMixin):
                 execution_time=time.time() - start_time
             )
             
+            if cache_key and cached is None and response.success:
+                best_index = next(i for i, r in enumerate(model_responses) if r is best_strategy)
+                await self.cache.set(cache_key, {
+                    'model_responses': [r.dict() for r in model_responses],
+                    'best_index': best_index
+                })
+            
             self.logger.info(f"策略生成完成，耗时: {response.execution_time:.2f}秒")
             return response
             
@@ -104,6 +242,52 @@ class StrategyGenerator(LoggerMixin):
                 error=error_msg
             )
     
+    def _get_cache_key(self, request: StrategyRequest) -> Optional[str]:
+        """计算请求的缓存键
+        
+        只缓存确定性请求，即所有模型的实际temperature都为0；
+        缓存内容为模型响应，不含用户ID、策略ID等与请求方相关的字段
+        
+        Args:
+            request: 策略生成请求
+        
+        Returns:
+            缓存键，不可缓存时返回None
+        """
+        if self.cache is None or not self._is_deterministic(request):
+            return None
+        
+        return LLMCache.cache_key(
+            model=list(request.models),
+            prompt=self._build_prompt(request),
+            params=request.custom_params
+        )
+    
+    def _is_deterministic(self, request: StrategyRequest) -> bool:
+        """判断请求涉及的所有模型是否都以temperature为0生成
+        
+        请求未指定temperature时，各提供商使用自身配置的默认值
+        
+        Args:
+            request: 策略生成请求
+        
+        Returns:
+            实际temperature全部为0时返回True
+        """
+        temperature = request.custom_params.get('temperature')
+        if temperature is not None:
+            return temperature == 0
+        
+        provider_names = request.models or self.provider_factory.get_available_providers()
+        try:
+            return all(
+                self.provider_factory.get_or_create_provider(_PROVIDER_TYPES[name]).config.temperature == 0
+                for name in provider_names
+            )
+        except Exception:
+            # 无法确定某个模型的默认值时按非确定性处理
+            return False
+    
     async def _create_generation_context(self, request: StrategyRequest) -> GenerationContext:
         """创建生成上下文
         
@@ -125,7 +309,8 @@ class StrategyGenerator(LoggerMixin):
         # 确定要使用的提供商
         if request.models:
             # 使用请求指定的模型
-            requested_providers = [model for model in request.models if model in available_providers]
+            available_set = frozenset(available_providers)
+            requested_providers = [model for model in request.models if model in available_set]
             if not requested_providers:
                 raise ValueError(f"请求的模型 {request.models} 都不可用，可用模型: {available_providers}")
         else:
@@ -136,8 +321,8 @@ class StrategyGenerator(LoggerMixin):
         providers = []
         for provider_name in requested_providers:
             try:
-                provider_type = ProviderType(provider_name)
-                provider = self.provider_factory.create_provider(provider_type)
+                provider_type = _PROVIDER_TYPES[provider_name]
+                provider = self.provider_factory.get_or_create_provider(provider_type)
                 providers.append(provider)
             except Exception as e:
                 self.logger.warning(f"创建提供商 {provider_name} 失败: {e}")
@@ -155,62 +340,65 @@ class StrategyGenerator(LoggerMixin):
     async def _generate_concurrent(self, context: GenerationContext) -> List[ModelResponse]:
         """并发生成策略
         
+        所有提供商同时发起请求，总耗时取决于最慢的提供商而非耗时之和
+        
         Args:
             context: 生成上下文
         
         Returns:
-            模型响应列表
+            模型响应列表，顺序与提供商顺序一致
         """
-        # 构建提示词
+        # 提示词只构建一次，所有提供商共享
         prompt = self._build_prompt(context.request)
         
-        # 创建生成任务
-        tasks = []
-        for provider in context.providers:
-            task = self._generate_with_provider(
-                provider=provider,
-                prompt=prompt,
-                context=context
-            )
-            tasks.append(task)
-        
-        # 并发执行，限制并发数
+        # 限制并发数
         semaphore = asyncio.Semaphore(self.max_concurrent)
         
-        async def limited_generate(task):
-            async with semaphore:
-                return await task
+        # 每个调用内部已将异常转换为错误响应，gather直接返回有序结果
+        return await asyncio.gather(*[
+            self._call_provider(provider, prompt, context, semaphore)
+            for provider in context.providers
+        ])
+    
+    async def _call_provider(
+        self,
+        provider: BaseLLMProvider,
+        prompt: str,
+        context: GenerationContext,
+        semaphore: asyncio.Semaphore
+    ) -> ModelResponse:
+        """在并发限制内调用提供商，失败时返回错误响应而不抛出异常
         
-        # 等待所有任务完成
-        results = await asyncio.gather(
-            *[limited_generate(task) for task in tasks],
-            return_exceptions=True
-        )
+        Args:
+            provider: LLM提供商
+            prompt: 提示词
+            context: 生成上下文
+            semaphore: 并发限制信号量
         
-        # 处理结果
-        model_responses = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                provider_name = context.providers[i].name
-                self.logger.error(f"提供商 {provider_name} 生成失败: {result}")
-                # 创建错误响应
-                error_response = ModelResponse(
-                    model_name=provider_name,
-                    code="",
-                    description="生成失败",
-                    parameters={},
-                    risk_metrics={},
-                    confidence_score=0.0,
-                    execution_time=0.0,
-                    error=str(result),
-                    warnings=[],
-                    metadata={}
+        Returns:
+            模型响应
+        """
+        try:
+            async with semaphore:
+                return await self._generate_with_provider(
+                    provider=provider,
+                    prompt=prompt,
+                    context=context
                 )
-                model_responses.append(error_response)
-            else:
-                model_responses.append(result)
-        
-        return model_responses
+        except Exception as e:
+            self.logger.error(f"提供商 {provider.name} 生成失败: {e}")
+            return ModelResponse(
+                model_name=provider.name,
+                code="",
+                description="生成失败",
+                parameters={},
+                risk_metrics={},
+                confidence_score=0.0,
+                execution_time=0.0,
+                error=str(e),
+                warnings=[],
+                metadata={}
+            )
     
     async def _generate_with_provider(
         self,
@@ -232,13 +420,16 @@ class StrategyGenerator(LoggerMixin):
             asyncio.TimeoutError: 生成超时
         """
         try:
+            # 只传递请求中指定的生成参数，其余使用提供商配置的默认值
+            generation_kwargs = {
+                key: context.request.custom_params[key]
+                for key in ('max_tokens', 'temperature')
+                if context.request.custom_params.get(key) is not None
+            }
+            
             # 设置超时
             response = await asyncio.wait_for(
-                provider.generate(
-                    prompt=prompt,
-                    max_tokens=context.request.custom_params.get('max_tokens'),
-                    temperature=context.request.custom_params.get('temperature')
-                ),
+                provider.generate(prompt=prompt, **generation_kwargs),
                 timeout=context.timeout
             )
             
@@ -258,44 +449,28 @@ class StrategyGenerator(LoggerMixin):
         Returns:
             完整的提示词
         """
-        # 基础提示词
-        prompt_parts = [
-            f"请生成一个{request.market_type.value}市场的量化交易策略。",
-            f"策略描述: {request.description}",
-            f"时间周期: {request.time_frame.value}",
-            f"风险等级: {request.risk_level.value}"
-        ]
-        
-        # 添加模板信息
-        if request.template_id:
-            prompt_parts.append(f"基于模板: {request.template_id}")
-        
-        # 添加PTrade语法要求
-        if request.use_ptrade_syntax:
-            prompt_parts.append("请使用PTrade框架语法编写策略代码。")
-        
-        # 添加自定义参数
+        custom_items = ()
         if request.custom_params:
-            custom_info = []
-            for key, value in request.custom_params.items():
-                if key not in ['max_tokens', 'temperature', 'timeout']:
-                    custom_info.append(f"{key}: {value}")
-            if custom_info:
-                prompt_parts.append(f"额外要求: {', '.join(custom_info)}")
-        
-        # 添加代码要求
-        prompt_parts.extend([
-            "",
-            "代码要求:",
-            "1. 必须包含完整的策略类定义",
-            "2. 实现__init__和generate_signals方法",
-            "3. 代码要有详细注释",
-            "4. 考虑风险控制和资金管理",
-            "5. 确保代码可以直接运行",
-            "6. 返回清晰的买卖信号"
-        ])
+            custom_items = tuple(
+                (key, value) for key, value in request.custom_params.items()
+                if key not in _GENERATION_PARAM_KEYS
+            )
+        
+        args = (
+            request.description,
+            request.market_type,
+            request.time_frame,
+            request.risk_level,
+            request.template_id,
+            request.use_ptrade_syntax,
+            custom_items
+        )
         
-        return "\n".join(prompt_parts)
+        try:
+            return _build_prompt_cached(*args)
+        except TypeError:
+            # 自定义参数中含有不可哈希的值（如列表），跳过缓存直接构建
+            return _build_prompt_cached.__wrapped__(*args)
     
     def _select_best_strategy(self, model_responses: List[ModelResponse]) -> Optional[ModelResponse]:
         """选择最佳策略
@@ -333,19 +508,46 @@ class StrategyGenerator(LoggerMixin):
             最佳策略响应
         """
         # 计算综合评分
-        scored_responses = []
+        scores = self._score_strategies(responses)
         
-        for response in responses:
-            score = self._calculate_strategy_score(response)
-            scored_responses.append((response, score))
+        for response, score in zip(responses, scores):
             self.logger.debug(f"策略 {response.model_name} 评分: {score:.3f}")
         
         # 选择评分最高的
-        best_response = max(scored_responses, key=lambda x: x[1])[0]
+        best_response = responses[int(np.argmax(scores))]
         
         self.logger.info(f"选择最佳策略: {best_response.model_name}")
         return best_response
     
+    def _score_strategies(self, responses: List[ModelResponse]) -> np.ndarray:
+        """批量计算策略综合评分
+        
+        各项子评分按列打包为矩阵，一次矩阵乘法得到所有策略的加权总分
+        
+        Args:
+            responses: 模型响应列表
+        
+        Returns:
+            综合评分数组 (0-1)，顺序与响应列表一致
+        """
+        components = np.empty((len(responses), len(_SCORE_WEIGHTS)), dtype=np.float64)
+        
+        for i, response in enumerate(responses):
+            components[i] = (
+                # 置信度评分
+                response.confidence_score,
+                # 代码质量评分
+                self._evaluate_code_quality(response.code),
+                # 风险指标评分
+                self._evaluate_risk_metrics(response.risk_metrics),
+                # 执行时间评分（越快越好，30秒为基准）
+                max(0, 1 - response.execution_time / 30),
+                # 完整性评分
+                self._evaluate_completeness(response)
+            )
+        
+        return np.minimum(components @ _SCORE_WEIGHTS, 1.0)
+    
     def _calculate_strategy_score(self, response: ModelResponse) -> float:
         """计算策略综合评分
         
@@ -355,40 +557,7 @@ class StrategyGenerator(LoggerMixin):
         Returns:
             综合评分 (0-1)
         """
-        # 权重配置
-        weights = {
-            'confidence': 0.3,
-            'code_quality': 0.25,
-            'risk_metrics': 0.25,
-            'execution_time': 0.1,
-            'completeness': 0.1
-        }
-        
-        # 置信度评分
-        confidence_score = response.confidence_score
-        
-        # 代码质量评分
-        code_quality_score = self._evaluate_code_quality(response.code)
-        
-        # 风险指标评分
-        risk_score = self._evaluate_risk_metrics(response.risk_metrics)
-        
-        # 执行时间评分（越快越好，但设置上限）
-        time_score = max(0, 1 - response.execution_time / 30)  # 30秒为基准
-        
-        # 完整性评分
-        completeness_score = self._evaluate_completeness(response)
-        
-        # 计算加权总分
-        total_score = (
-            weights['confidence'] * confidence_score +
-            weights['code_quality'] * code_quality_score +
-            weights['risk_metrics'] * risk_score +
-            weights['execution_time'] * time_score +
-            weights['completeness'] * completeness_score
-        )
-        
-        return min(total_score, 1.0)
+        return float(self._score_strategies([response])[0])
     
     def _evaluate_code_quality(self, code: str) -> float:
         """评估代码质量
@@ -402,32 +571,34 @@ class StrategyGenerator(LoggerMixin):
         if not code:
             return 0.0
         
+        # 一次扫描统计所有特征的出现次数
+        found = Counter(match.lastgroup for match in _CODE_FEATURE_PATTERN.finditer(code))
+        
         score = 0.0
         
         # 基础结构检查
-        if 'class' in code:
+        if found['class_def']:
             score += 0.2
-        if 'def __init__' in code:
+        if found['init_method']:
             score += 0.2
-        if 'def generate_signals' in code:
+        if found['signal_method']:
             score += 0.2
         
         # 注释质量
-        lines = code.split('\n')
-        comment_lines = [line for line in lines if line.strip().startswith('#')]
-        if len(comment_lines) > len(lines) * 0.1:  # 至少10%的注释
+        line_count = code.count('\n') + 1
+        if found['comment_line'] > line_count * 0.1:  # 至少10%的注释
             score += 0.1
         
         # 代码长度合理性
-        if 50 < len(lines) < 200:  # 合理的代码长度
+        if 50 < line_count < 200:  # 合理的代码长度
             score += 0.1
         
         # 导入语句
-        if 'import' in code:
+        if found['import_stmt']:
             score += 0.1
         
         # 错误处理
-        if 'try:' in code and 'except' in code:
+        if found['try_block'] and found['except_block']:
             score += 0.1
         
         return min(score, 1.0)
@@ -603,20 +774,18 @@ class StrategyGenerator(LoggerMixin):
         }
         
         # 计算各模型评分
-        scores = []
+        scores = self._score_strategies(successful_responses)
         execution_times = []
         code_lengths = []
         
-        for response in successful_responses:
-            score = self._calculate_strategy_score(response)
+        for response, score in zip(successful_responses, scores):
             comparison["model_scores"][response.model_name] = {
-                "score": score,
+                "score": float(score),
                 "confidence": response.confidence_score,
                 "execution_time": response.execution_time,
                 "code_length": len(response.code)
             }
             
-            scores.append(score)
             execution_times.append(response.execution_time)
             code_lengths.append(len(response.code))
         
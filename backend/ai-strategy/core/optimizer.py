@@ -3,12 +3,13 @@
 import asyncio
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Any, Tuple, Callable
+from typing import Dict, List, Optional, Any, Tuple, Callable, Awaitable, NamedTuple, Union
 from dataclasses import dataclass
 from enum import Enum
 import json
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
 from models.strategy import Strategy, StrategyParameter, PerformanceMetric
 from models.requests import StrategyOptimizationRequest
@@ -16,6 +17,128 @@ from models.responses import OptimizationResult
 from utils.logger import LoggerMixin
 from utils.config import get_config
 
+try:
+    from skopt import Optimizer as SkoptOptimizer
+    from skopt.space import Integer, Real
+except ImportError:  # scikit-optimize为可选依赖
+    SkoptOptimizer = None
+
+# 模拟回测指标的取值范围，顺序与BacktestMetrics的字段一致
+_BACKTEST_METRIC_LOWS = np.array([0.05, 0.8, 0.05, 0.45, 1.1])
+_BACKTEST_METRIC_HIGHS = np.array([0.25, 2.0, 0.20, 0.70, 2.5])
+
+class BacktestMetrics(NamedTuple):
+    """回测性能指标
+    
+    每次试验都会产生一组指标，用定长元组代替字典以减少内存分配；
+    提供与字典一致的get方法，目标函数和约束检查无需区分两种类型
+    """
+    total_return: float
+    sharpe_ratio: float
+    max_drawdown: float
+    win_rate: float
+    profit_factor: float
+    
+    def get(self, name: str, default: Any = None) -> Any:
+        """按指标名取值，指标不存在时返回default"""
+        return getattr(self, name) if name in self._fields else default
+
+def _metrics_to_dict(metrics: Any) -> Any:
+    """将BacktestMetrics转换为字典，其他类型原样返回"""
+    return metrics._asdict() if isinstance(metrics, BacktestMetrics) else metrics
+
+def _backtest_strategy(
+    strategy: Strategy,
+    historical_data: pd.DataFrame,
+    rng: np.random.Generator
+) -> BacktestMetrics:
+    """对单个策略运行回测
+    
+    单次评估（_run_backtest）和批量评估都经由此函数，两者的指标来自同一套回测逻辑
+    
+    Args:
+        strategy: 策略
+        historical_data: 历史数据
+        rng: 随机数生成器
+    
+    Returns:
+        性能指标
+    """
+    # 简化实现：返回模拟的性能指标
+    return BacktestMetrics(*rng.uniform(_BACKTEST_METRIC_LOWS, _BACKTEST_METRIC_HIGHS).tolist())
+
+def _backtest_batch_worker(
+    strategies: List[Strategy],
+    historical_data: pd.DataFrame,
+    seed: int
+) -> List[Union[BacktestMetrics, Exception]]:
+    """批量运行回测
+    
+    模块级函数，可以被pickle后在子进程中执行；单个策略回测失败时在对应位置返回异常，
+    不影响同批次的其他策略
+    
+    Args:
+        strategies: 策略列表
+        historical_data: 历史数据
+        seed: 随机种子，由调用方从全局随机状态中抽取，保证多进程下结果可复现
+    
+    Returns:
+        与strategies顺序一致的性能指标或异常列表
+    """
+    rng = np.random.default_rng(seed)
+    
+    results: List[Union[BacktestMetrics, Exception]] = []
+    for strategy in strategies:
+        try:
+            results.append(_backtest_strategy(strategy, historical_data, rng))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def _parameter_cache_key(parameters: Dict[str, Any]) -> Optional[Tuple]:
+    """计算参数组合的缓存键
+    
+    Args:
+        parameters: 参数组合
+    
+    Returns:
+        浮点数保留6位小数后的有序键值元组，参数值不可哈希时返回None
+    """
+    key = tuple(sorted(
+        (name, round(value, 6) if isinstance(value, float) else value)
+        for name, value in parameters.items()
+    ))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _deduplicate_parameters(param_list: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """按缓存键对参数组合去重
+    
+    Args:
+        param_list: 参数组合列表
+    
+    Returns:
+        (去重后的参数组合列表, 每个原组合在去重列表中的下标)
+    """
+    unique_params = []
+    inverse = []
+    index_by_key: Dict[Tuple, int] = {}
+    
+    for params in param_list:
+        key = _parameter_cache_key(params)
+        index = index_by_key.get(key) if key is not None else None
+        if index is None:
+            index = len(unique_params)
+            unique_params.append(params)
+            if key is not None:
+                index_by_key[key] = index
+        inverse.append(index)
+    
+    return unique_params, inverse
+
 class OptimizationMethod(str, Enum):
     """优化方法"""
     GRID_SEARCH = "grid_search"          # 网格搜索
@@ -36,6 +159,28 @@ class OptimizationObjective(str, Enum):
     SORTINO_RATIO = "sortino_ratio"      # 索提诺比率
     CUSTOM = "custom"                    # 自定义
 
+# 约束项对应的指标名，以及约束是否为下界
+_CONSTRAINT_RULES: Dict[str, Tuple[str, bool]] = {
+    'min_sharpe': ('sharpe_ratio', True),
+    'min_return': ('total_return', True),
+    'min_win_rate': ('win_rate', True),
+    'min_profit_factor': ('profit_factor', True),
+    'max_drawdown': ('max_drawdown', False),
+}
+
+# 约束预筛选：数据不少于该K线数时才做预回测，预回测夏普比率低于约束的该比例即淘汰
+_PRESCREEN_MIN_BARS = 100
+_PRESCREEN_SHARPE_RATIO = 0.3
+
+# 优化目标对应的指标名、符号和缺省值，需要最小化的指标取负值
+_OBJECTIVE_METRICS: Dict[OptimizationObjective, Tuple[str, int, float]] = {
+    OptimizationObjective.SHARPE_RATIO: ('sharpe_ratio', 1, 0),
+    OptimizationObjective.RETURN: ('total_return', 1, 0),
+    OptimizationObjective.MAX_DRAWDOWN: ('max_drawdown', -1, 1),  # 负值，因为要最小化回撤
+    OptimizationObjective.WIN_RATE: ('win_rate', 1, 0),
+    OptimizationObjective.PROFIT_FACTOR: ('profit_factor', 1, 0),
+}
+
 @dataclass
 class OptimizationConfig:
     """优化配置"""
@@ -49,6 +194,7 @@ class OptimizationConfig:
     random_seed: Optional[int] = None
     custom_objective: Optional[Callable] = None
     constraints: Dict[str, Any] = None
+    use_process_pool: bool = False  # 遗传算法是否在进程池中批量回测
 
 @dataclass
 class OptimizationResult:
@@ -79,8 +225,19 @@ class StrategyOptimizer(LoggerMixin):
         self.max_parallel_workers = opt_config.get('max_parallel_workers', 4)
         self.default_timeout = opt_config.get('default_timeout', 300)
         
-        # 初始化执行器
+        self.use_process_pool = opt_config.get('use_process_pool', False)
+        
+        # 初始化执行器，进程池仅在启用多进程回测时按需创建
         self.executor = ThreadPoolExecutor(max_workers=self.max_parallel_workers)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        
+        # 优化方法到实现的映射
+        self._optimization_methods: Dict[OptimizationMethod, Callable] = {
+            OptimizationMethod.GRID_SEARCH: self._grid_search_optimization,
+            OptimizationMethod.RANDOM_SEARCH: self._random_search_optimization,
+            OptimizationMethod.BAYESIAN: self._bayesian_optimization,
+            OptimizationMethod.GENETIC: self._genetic_optimization,
+        }
         
         self.logger.info("策略优化器初始化完成")
     
@@ -115,25 +272,14 @@ class StrategyOptimizer(LoggerMixin):
             self.logger.info(f"开始优化策略，方法: {opt_config.method.value}, 目标: {opt_config.objective.value}")
             
             # 根据优化方法执行优化
-            if opt_config.method == OptimizationMethod.GRID_SEARCH:
-                result = await self._grid_search_optimization(
-                    strategy, historical_data, optimizable_params, opt_config
-                )
-            elif opt_config.method == OptimizationMethod.RANDOM_SEARCH:
-                result = await self._random_search_optimization(
-                    strategy, historical_data, optimizable_params, opt_config
-                )
-            elif opt_config.method == OptimizationMethod.BAYESIAN:
-                result = await self._bayesian_optimization(
-                    strategy, historical_data, optimizable_params, opt_config
-                )
-            elif opt_config.method == OptimizationMethod.GENETIC:
-                result = await self._genetic_optimization(
-                    strategy, historical_data, optimizable_params, opt_config
-                )
-            else:
+            optimization_func = self._optimization_methods.get(opt_config.method)
+            if optimization_func is None:
                 raise ValueError(f"不支持的优化方法: {opt_config.method}")
             
+            result = await optimization_func(
+                strategy, historical_data, optimizable_params, opt_config
+            )
+            
             # 计算执行时间
             execution_time = time.time() - start_time
             result.execution_time = execution_time
@@ -143,6 +289,11 @@ class StrategyOptimizer(LoggerMixin):
                 result.optimization_history
             )
             
+            # 回测指标在优化过程中以BacktestMetrics传递，输出前统一转换为字典
+            result.performance_metrics = _metrics_to_dict(result.performance_metrics)
+            for record in result.optimization_history:
+                record['metrics'] = _metrics_to_dict(record['metrics'])
+            
             self.logger.info(f"策略优化完成，最佳得分: {result.best_score:.4f}, 耗时: {execution_time:.2f}秒")
             
             return result
@@ -162,7 +313,8 @@ class StrategyOptimizer(LoggerMixin):
             timeout_seconds=request.timeout_seconds or self.default_timeout,
             parallel_workers=min(request.parallel_workers or 4, self.max_parallel_workers),
             random_seed=request.random_seed,
-            constraints=request.constraints or {}
+            constraints=request.constraints or {},
+            use_process_pool=self.use_process_pool
         )
     
     def _extract_optimizable_parameters(self, strategy: Strategy) -> Dict[str, StrategyParameter]:
@@ -195,39 +347,29 @@ class StrategyOptimizer(LoggerMixin):
                 random.seed(config.random_seed)
             param_grid = random.sample(param_grid, max_combinations)
         
-        # 并行评估参数组合
-        tasks = []
-        for i, params in enumerate(param_grid):
-            task = self._evaluate_parameter_combination(
-                strategy, historical_data, params, config.objective, i
-            )
-            tasks.append(task)
-        
-        # 执行评估
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 整个网格一次性批量评估
+        results = await self._evaluate_parameter_batch(
+            strategy, historical_data, param_grid, config.objective,
+            constraints=config.constraints
+        )
         
-        # 处理结果
-        valid_results = []
-        optimization_history = []
+        if not results or all(result['error'] is not None for result in results):
+            raise ValueError("所有参数组合评估都失败了")
         
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                self.logger.warning(f"参数组合 {i} 评估失败: {result}")
-                continue
-            
-            valid_results.append(result)
-            optimization_history.append({
+        optimization_history = [
+            {
                 'iteration': i,
-                'parameters': param_grid[i],
+                'parameters': result['parameters'],
                 'score': result['score'],
                 'metrics': result['metrics']
-            })
-        
-        if not valid_results:
-            raise ValueError("所有参数组合评估都失败了")
+            }
+            for i, result in enumerate(results)
+        ]
         
         # 找到最佳结果
-        best_result = max(valid_results, key=lambda x: x['score'])
+        best_result = results[int(np.argmax([result['score'] for result in results]))]
+        if not np.isfinite(best_result['score']):
+            raise ValueError("没有满足约束条件的参数组合")
         
         return OptimizationResult(
             best_parameters=best_result['parameters'],
@@ -235,7 +377,7 @@ class StrategyOptimizer(LoggerMixin):
             optimization_history=optimization_history,
             convergence_info={'method': 'grid_search', 'converged': True},
             execution_time=0,  # 将在外部设置
-            iterations_completed=len(valid_results),
+            iterations_completed=len(results),
             performance_metrics=best_result['metrics'],
             parameter_sensitivity={}
         )
@@ -259,15 +401,29 @@ class StrategyOptimizer(LoggerMixin):
         best_metrics = None
         optimization_history = []
         
-        for iteration in range(config.max_iterations):
-            # 随机生成参数
-            params = self._generate_random_parameters(optimizable_params)
+        # 得分写入预分配数组，收敛检查直接取最近10个得分的切片
+        scores = np.empty(config.max_iterations)
+        # 评估缓存只在本次优化内有效，重复的参数组合只评估一次
+        evaluation_cache: Dict[Tuple, asyncio.Future] = {}
+        
+        iteration = 0
+        converged = False
+        while iteration < config.max_iterations and not converged:
+            # 每轮随机生成一批参数并发评估，轮与轮之间检查收敛
+            batch_size = min(config.parallel_workers, config.max_iterations - iteration)
+            batch_params = self._generate_random_parameter_batch(optimizable_params, batch_size)
             
-            # 评估参数
-            try:
-                result = await self._evaluate_parameter_combination(
-                    strategy, historical_data, params, config.objective, iteration
-                )
+            results = await self._evaluate_concurrently(
+                strategy, historical_data, batch_params, config.objective, iteration, config.parallel_workers,
+                cache=evaluation_cache, constraints=config.constraints
+            )
+            
+            for offset, (params, result) in enumerate(zip(batch_params, results)):
+                current_iteration = iteration + offset
+                
+                if isinstance(result, Exception):
+                    self.logger.warning(f"第 {current_iteration} 次迭代评估失败: {result}")
+                    continue
                 
                 score = result['score']
                 metrics = result['metrics']
@@ -279,22 +435,28 @@ class StrategyOptimizer(LoggerMixin):
                     best_metrics = metrics
                 
                 optimization_history.append({
-                    'iteration': iteration,
+                    'iteration': current_iteration,
                     'parameters': params,
                     'score': score,
-                    'metrics': metrics
+                    'metrics': metrics,
+                    'pruned': result['pruned']
                 })
                 
-                # 检查收敛
-                if len(optimization_history) > 10:
-                    recent_scores = [h['score'] for h in optimization_history[-10:]]
-                    if max(recent_scores) - min(recent_scores) < config.convergence_threshold:
-                        self.logger.info(f"随机搜索在第 {iteration} 次迭代收敛")
-                        break
+                n_scores = len(optimization_history)
+                scores[n_scores - 1] = score
                 
-            except Exception as e:
-                self.logger.warning(f"第 {iteration} 次迭代评估失败: {e}")
-                continue
+                # 检查收敛，窗口内有不满足约束（得分为负无穷）的组合时不判断
+                if n_scores > 10:
+                    recent_scores = scores[n_scores - 10:n_scores]
+                    if (
+                        np.isfinite(recent_scores).all()
+                        and recent_scores.max() - recent_scores.min() < config.convergence_threshold
+                    ):
+                        self.logger.info(f"随机搜索在第 {current_iteration} 次迭代收敛")
+                        converged = True
+                        break
+            
+            iteration += batch_size
         
         if best_params is None:
             raise ValueError("随机搜索未找到有效的参数组合")
@@ -317,24 +479,133 @@ class StrategyOptimizer(LoggerMixin):
         optimizable_params: Dict[str, StrategyParameter],
         config: OptimizationConfig
     ) -> OptimizationResult:
-        """贝叶斯优化（简化版本）"""
-        # 注意：这是一个简化的贝叶斯优化实现
-        # 在实际应用中，建议使用专业的贝叶斯优化库如scikit-optimize
+        """贝叶斯优化
+        
+        使用scikit-optimize的高斯过程模型，每轮ask一批候选点并发评估后再tell，
+        批量提交使模型重新拟合的次数从迭代次数降到批次数
+        """
+        if SkoptOptimizer is None:
+            self.logger.warning("scikit-optimize未安装，贝叶斯优化退化为随机初始采样")
+            return await self._bayesian_initial_sampling(
+                strategy, historical_data, optimizable_params, config
+            )
+        
+        # 只有数值参数进入搜索空间，其余参数固定为默认值
+        param_names = []
+        dimensions = []
+        fixed_params = {}
+        for param_name, param in optimizable_params.items():
+            if param.type == "int":
+                dimensions.append(Integer(int(param.min_value), int(param.max_value), name=param_name))
+                param_names.append(param_name)
+            elif param.type == "float":
+                dimensions.append(Real(param.min_value, param.max_value, name=param_name))
+                param_names.append(param_name)
+            else:
+                fixed_params[param_name] = param.default_value
+        
+        if not dimensions:
+            return await self._bayesian_initial_sampling(
+                strategy, historical_data, optimizable_params, config
+            )
+        
+        optimizer = SkoptOptimizer(
+            dimensions,
+            base_estimator="GP",
+            acq_func="gp_hedge",
+            random_state=config.random_seed
+        )
+        
+        best_score = float('-inf')
+        best_params = None
+        best_metrics = None
+        optimization_history = []
+        evaluation_cache: Dict[Tuple, asyncio.Future] = {}
+        
+        iteration = 0
+        while iteration < config.max_iterations:
+            batch_size = min(config.parallel_workers, config.max_iterations - iteration)
+            points = optimizer.ask(n_points=batch_size)
+            batch_params = []
+            for point in points:
+                params = dict(fixed_params)
+                for name, dimension, value in zip(param_names, dimensions, point):
+                    params[name] = int(value) if isinstance(dimension, Integer) else float(value)
+                batch_params.append(params)
+            
+            results = await self._evaluate_concurrently(
+                strategy, historical_data, batch_params, config.objective, iteration, config.parallel_workers,
+                cache=evaluation_cache, constraints=config.constraints
+            )
+            
+            observed_points = []
+            observed_losses = []
+            for offset, (point, params, result) in enumerate(zip(points, batch_params, results)):
+                if isinstance(result, Exception):
+                    self.logger.warning(f"第 {iteration + offset} 次迭代评估失败: {result}")
+                    continue
+                
+                score = result['score']
+                if np.isfinite(score):
+                    observed_points.append(point)
+                    # skopt求最小值，得分取负
+                    observed_losses.append(-score)
+                
+                if score > best_score:
+                    best_score = score
+                    best_params = params
+                    best_metrics = result['metrics']
+                
+                optimization_history.append({
+                    'iteration': iteration + offset,
+                    'parameters': params,
+                    'score': score,
+                    'metrics': result['metrics'],
+                    'pruned': result['pruned']
+                })
+            
+            if observed_points:
+                optimizer.tell(observed_points, observed_losses)
+            
+            iteration += batch_size
+        
+        if best_params is None:
+            raise ValueError("贝叶斯优化未找到有效的参数组合")
         
+        return OptimizationResult(
+            best_parameters=best_params,
+            best_score=best_score,
+            optimization_history=optimization_history,
+            convergence_info={'method': 'bayesian', 'converged': True},
+            execution_time=0,
+            iterations_completed=len(optimization_history),
+            performance_metrics=best_metrics,
+            parameter_sensitivity={}
+        )
+    
+    async def _bayesian_initial_sampling(
+        self,
+        strategy: Strategy,
+        historical_data: pd.DataFrame,
+        optimizable_params: Dict[str, StrategyParameter],
+        config: OptimizationConfig
+    ) -> OptimizationResult:
+        """贝叶斯优化的简化版本：仅做随机初始采样，scikit-optimize不可用时使用"""
         # 初始随机采样
         n_initial = min(10, config.max_iterations // 4)
         initial_results = []
         
-        for i in range(n_initial):
-            params = self._generate_random_parameters(optimizable_params)
+        for i, params in enumerate(self._generate_random_parameter_batch(optimizable_params, n_initial)):
             try:
                 result = await self._evaluate_parameter_combination(
-                    strategy, historical_data, params, config.objective, i
+                    strategy, historical_data, params, config.objective, i,
+                    constraints=config.constraints
                 )
                 initial_results.append({
                     'parameters': params,
                     'score': result['score'],
-                    'metrics': result['metrics']
+                    'metrics': result['metrics'],
+                    'pruned': result['pruned']
                 })
             except Exception as e:
                 self.logger.warning(f"初始采样 {i} 失败: {e}")
@@ -342,15 +613,18 @@ class StrategyOptimizer(LoggerMixin):
         if not initial_results:
             raise ValueError("贝叶斯优化初始采样失败")
         
-        # 找到最佳结果
+        # 找到最佳结果，全部候选都不满足约束时与其他优化方法一样报错
         best_result = max(initial_results, key=lambda x: x['score'])
+        if not np.isfinite(best_result['score']):
+            raise ValueError("没有满足约束条件的参数组合")
         
         optimization_history = [
             {
                 'iteration': i,
                 'parameters': result['parameters'],
                 'score': result['score'],
-                'metrics': result['metrics']
+                'metrics': result['metrics'],
+                'pruned': result['pruned']
             }
             for i, result in enumerate(initial_results)
         ]
@@ -381,37 +655,52 @@ class StrategyOptimizer(LoggerMixin):
             np.random.seed(config.random_seed)
         
         # 初始化种群
-        population = []
-        for _ in range(config.population_size):
-            individual = self._generate_random_parameters(optimizable_params)
-            population.append(individual)
+        population = self._generate_random_parameter_batch(optimizable_params, config.population_size)
         
         best_score = float('-inf')
         best_params = None
         best_metrics = None
         optimization_history = []
+        evaluation_cache: Dict[Tuple, asyncio.Future] = {}
         
         for generation in range(config.max_iterations):
-            # 评估种群
-            fitness_scores = []
-            for i, individual in enumerate(population):
+            # 种群收敛后存在大量重复个体，只评估互不相同的个体
+            unique_individuals, inverse = _deduplicate_parameters(population)
+            
+            if config.use_process_pool:
+                # 整个种群的回测在子进程中批量完成，绕开GIL
                 try:
-                    result = await self._evaluate_parameter_combination(
-                        strategy, historical_data, individual, config.objective, 
-                        generation * config.population_size + i
+                    unique_results = await self._evaluate_parameter_batch(
+                        strategy, historical_data, unique_individuals, config.objective,
+                        executor=self._get_process_pool(), constraints=config.constraints
                     )
-                    score = result['score']
-                    fitness_scores.append(score)
-                    
-                    # 更新最佳结果
-                    if score > best_score:
-                        best_score = score
-                        best_params = individual.copy()
-                        best_metrics = result['metrics']
-                    
                 except Exception as e:
-                    fitness_scores.append(float('-inf'))
-                    self.logger.warning(f"个体评估失败: {e}")
+                    unique_results = [e] * len(unique_individuals)
+            else:
+                # 并发评估整个种群
+                unique_results = await self._evaluate_concurrently(
+                    strategy, historical_data, unique_individuals, config.objective,
+                    generation * config.population_size, config.parallel_workers,
+                    cache=evaluation_cache, constraints=config.constraints
+                )
+            
+            results = [unique_results[index] for index in inverse]
+            
+            # 评估失败的个体适应度保持为负无穷
+            fitness_scores = np.full(len(population), float('-inf'))
+            for i, (individual, result) in enumerate(zip(population, results)):
+                if isinstance(result, Exception):
+                    self.logger.warning(f"个体评估失败: {result}")
+                    continue
+                
+                score = result['score']
+                fitness_scores[i] = score
+                
+                # 更新最佳结果
+                if score > best_score:
+                    best_score = score
+                    best_params = individual.copy()
+                    best_metrics = result['metrics']
             
             # 记录历史
             optimization_history.append({
@@ -419,7 +708,7 @@ class StrategyOptimizer(LoggerMixin):
                 'parameters': best_params,
                 'score': best_score,
                 'metrics': best_metrics,
-                'population_best': max(fitness_scores) if fitness_scores else float('-inf')
+                'population_best': float(fitness_scores.max()) if fitness_scores.size else float('-inf')
             })
             
             # 选择、交叉、变异
@@ -443,54 +732,108 @@ class StrategyOptimizer(LoggerMixin):
         )
     
     def _generate_parameter_grid(self, optimizable_params: Dict[str, StrategyParameter]) -> List[Dict[str, Any]]:
-        """生成参数网格"""
-        param_combinations = [{}]
+        """生成参数网格
+        
+        各数值参数的取值轴通过np.meshgrid一次展开为 (组合数, 参数数) 的矩阵，
+        组合顺序与逐个参数嵌套展开时一致
+        """
+        numeric_names = []
+        axes = []
+        fixed_params = {}
         
         for param_name, param in optimizable_params.items():
-            new_combinations = []
-            
             # 生成参数值列表
             if param.type == "int":
-                values = list(range(
+                axes.append(np.arange(
                     int(param.min_value),
                     int(param.max_value) + 1,
                     max(1, (int(param.max_value) - int(param.min_value)) // 10)
                 ))
+                numeric_names.append(param_name)
             elif param.type == "float":
-                values = np.linspace(
+                axes.append(np.linspace(
                     param.min_value,
                     param.max_value,
                     min(10, int((param.max_value - param.min_value) / 0.01) + 1)
-                ).tolist()
+                ))
+                numeric_names.append(param_name)
             else:
-                values = [param.default_value]
-            
-            # 组合参数
-            for combination in param_combinations:
-                for value in values:
-                    new_combination = combination.copy()
-                    new_combination[param_name] = value
-                    new_combinations.append(new_combination)
-            
-            param_combinations = new_combinations
+                fixed_params[param_name] = param.default_value
+        
+        if not axes:
+            return [dict(fixed_params)]
+        
+        # 组合参数
+        mesh = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(axes))
+        is_int = [optimizable_params[name].type == "int" for name in numeric_names]
+        
+        param_combinations = []
+        for row in mesh.tolist():
+            combination = dict(fixed_params)
+            for param_name, value, integer in zip(numeric_names, row, is_int):
+                combination[param_name] = int(value) if integer else value
+            param_combinations.append(combination)
         
         return param_combinations
     
+    def _numeric_parameter_bounds(
+        self,
+        optimizable_params: Dict[str, StrategyParameter]
+    ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """提取数值参数的名称与取值范围
+        
+        Args:
+            optimizable_params: 可优化参数
+        
+        Returns:
+            (参数名列表, 下界数组, 上界数组, 是否整数参数的布尔数组)
+        """
+        numeric_names = [name for name, param in optimizable_params.items() if param.type in ("int", "float")]
+        numeric_params = [optimizable_params[name] for name in numeric_names]
+        lows = np.array([float(param.min_value) for param in numeric_params])
+        highs = np.array([float(param.max_value) for param in numeric_params])
+        is_int = np.array([param.type == "int" for param in numeric_params], dtype=bool)
+        return numeric_names, lows, highs, is_int
+    
     def _generate_random_parameters(self, optimizable_params: Dict[str, StrategyParameter]) -> Dict[str, Any]:
         """生成随机参数"""
-        params = {}
+        return self._generate_random_parameter_batch(optimizable_params, 1)[0]
+    
+    def _generate_random_parameter_batch(
+        self,
+        optimizable_params: Dict[str, StrategyParameter],
+        n: int
+    ) -> List[Dict[str, Any]]:
+        """批量生成随机参数
         
-        for param_name, param in optimizable_params.items():
-            if param.type == "int":
-                value = np.random.randint(int(param.min_value), int(param.max_value) + 1)
-            elif param.type == "float":
-                value = np.random.uniform(param.min_value, param.max_value)
-            else:
-                value = param.default_value
-            
-            params[param_name] = value
+        一次生成 (n, 数值参数数) 的均匀随机矩阵，再按各参数范围缩放
         
-        return params
+        Args:
+            optimizable_params: 可优化参数
+            n: 生成的参数组合数
+        
+        Returns:
+            随机参数组合列表，整数参数包含上界，非数值参数取默认值
+        """
+        numeric_names, lows, highs, is_int = self._numeric_parameter_bounds(optimizable_params)
+        
+        values = lows + np.random.random((n, len(numeric_names))) * (highs - lows + is_int)
+        values = np.where(is_int, np.minimum(np.floor(values), highs), values)
+        
+        batch = []
+        for row in values.tolist():
+            numeric_values = dict(zip(numeric_names, row))
+            params = {}
+            for param_name, param in optimizable_params.items():
+                if param.type == "int":
+                    params[param_name] = int(numeric_values[param_name])
+                elif param.type == "float":
+                    params[param_name] = numeric_values[param_name]
+                else:
+                    params[param_name] = param.default_value
+            batch.append(params)
+        
+        return batch
     
     async def _evaluate_parameter_combination(
         self,
@@ -498,198 +841,398 @@ class StrategyOptimizer(LoggerMixin):
         historical_data: pd.DataFrame,
         parameters: Dict[str, Any],
         objective: OptimizationObjective,
-        iteration: int
+        iteration: int,
+        constraints: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """评估参数组合"""
+        """评估参数组合
+        
+        设置了最小夏普比率约束时，先在前10%的K线上做一次预回测，
+        预回测夏普比率远低于约束的组合直接淘汰，不再运行完整回测；
+        被淘汰组合的pruned为True，其metrics只是预回测的指标，不是完整回测结果
+        """
         try:
             # 创建策略副本并设置参数
             strategy_copy = self._create_strategy_with_parameters(strategy, parameters)
             
+            # 预筛选
+            min_sharpe = (constraints or {}).get('min_sharpe')
+            if min_sharpe is not None and len(historical_data) >= _PRESCREEN_MIN_BARS:
+                preview_result = await self._run_backtest(
+                    strategy_copy, historical_data, bars_limit=len(historical_data) // 10
+                )
+                if preview_result.get('sharpe_ratio', 0) < min_sharpe * _PRESCREEN_SHARPE_RATIO:
+                    return {
+                        'parameters': parameters,
+                        'score': float('-inf'),
+                        'metrics': preview_result,
+                        'pruned': True
+                    }
+            
             # 运行回测
             backtest_result = await self._run_backtest(strategy_copy, historical_data)
             
-            # 计算目标函数值
-            score = self._calculate_objective_score(backtest_result, objective)
+            # 计算目标函数值，不满足约束的组合得分为负无穷
+            if self._satisfies_constraints(backtest_result, constraints):
+                score = self._calculate_objective_score(backtest_result, objective)
+            else:
+                score = float('-inf')
             
             return {
                 'parameters': parameters,
                 'score': score,
-                'metrics': backtest_result
+                'metrics': backtest_result,
+                'pruned': False
             }
             
         except Exception as e:
             self.logger.error(f"参数组合评估失败 (迭代 {iteration}): {e}")
             raise
     
+    def _satisfies_constraints(self, metrics: Union[Dict[str, float], BacktestMetrics], constraints: Optional[Dict[str, Any]]) -> bool:
+        """检查性能指标是否满足约束
+        
+        Args:
+            metrics: 性能指标
+            constraints: 约束条件，如 {'min_sharpe': 1.0, 'max_drawdown': 0.1}
+        
+        Returns:
+            是否满足全部约束，未知的约束项和缺失的指标不参与检查
+        """
+        for constraint_name, bound in (constraints or {}).items():
+            rule = _CONSTRAINT_RULES.get(constraint_name)
+            if rule is None:
+                continue
+            
+            metric_name, is_lower_bound = rule
+            value = metrics.get(metric_name)
+            if value is None:
+                continue
+            
+            if (value < bound) if is_lower_bound else (value > bound):
+                return False
+        
+        return True
+    
+    async def _evaluate_concurrently(
+        self,
+        strategy: Strategy,
+        historical_data: pd.DataFrame,
+        param_list: List[Dict[str, Any]],
+        objective: OptimizationObjective,
+        start_iteration: int,
+        max_concurrency: int,
+        cache: Optional[Dict[Tuple, asyncio.Future]] = None,
+        constraints: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """并发评估多组参数
+        
+        提供cache时，参数取值（浮点数保留6位小数）相同的组合只评估一次，
+        包括同一批次内重复的组合
+        
+        Args:
+            strategy: 待优化的策略
+            historical_data: 历史数据
+            param_list: 参数组合列表
+            objective: 优化目标
+            start_iteration: 第一组参数对应的迭代序号
+            max_concurrency: 同时进行的评估数上限
+            cache: 本次优化的评估缓存
+            constraints: 约束条件
+        
+        Returns:
+            与param_list顺序一致的评估结果，评估失败的位置为异常对象
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def evaluate(offset: int, params: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._evaluate_parameter_combination(
+                    strategy, historical_data, params, objective, start_iteration + offset,
+                    constraints=constraints
+                )
+        
+        def schedule(offset: int, params: Dict[str, Any]) -> Awaitable[Dict[str, Any]]:
+            key = _parameter_cache_key(params) if cache is not None else None
+            if key is None:
+                return evaluate(offset, params)
+            
+            future = cache.get(key)
+            if future is None:
+                future = asyncio.ensure_future(evaluate(offset, params))
+                cache[key] = future
+            return future
+        
+        return await asyncio.gather(
+            *(schedule(offset, params) for offset, params in enumerate(param_list)),
+            return_exceptions=True
+        )
+    
+    async def _evaluate_parameter_batch(
+        self,
+        strategy: Strategy,
+        historical_data: pd.DataFrame,
+        param_grid: List[Dict[str, Any]],
+        objective: OptimizationObjective,
+        executor: Optional[Executor] = None,
+        constraints: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """批量评估参数组合
+        
+        所有参数组合在执行器中的一次批量回测内完成，避免逐个组合调度协程
+        
+        Args:
+            strategy: 待优化的策略
+            historical_data: 历史数据
+            param_grid: 参数组合列表
+            objective: 优化目标
+            executor: 运行回测的执行器，默认使用优化器的线程池
+            constraints: 约束条件，不满足约束的组合得分为负无穷
+        
+        Returns:
+            与param_grid顺序一致的评估结果列表，评估失败的组合得分为负无穷，
+            error字段记录失败原因
+        """
+        outcomes: List[Union[BacktestMetrics, Exception, None]] = [None] * len(param_grid)
+        
+        # 构建策略失败的组合不进入回测批次
+        strategies = []
+        batch_indices = []
+        for i, params in enumerate(param_grid):
+            try:
+                strategies.append(self._create_strategy_with_parameters(strategy, params))
+                batch_indices.append(i)
+            except Exception as e:
+                outcomes[i] = e
+        
+        if strategies:
+            loop = asyncio.get_running_loop()
+            metrics_batch = await loop.run_in_executor(
+                executor or self.executor,
+                _backtest_batch_worker,
+                strategies,
+                historical_data,
+                self._next_backtest_seed()
+            )
+            for i, metrics in zip(batch_indices, metrics_batch):
+                outcomes[i] = metrics
+        
+        results = []
+        for i, (params, outcome) in enumerate(zip(param_grid, outcomes)):
+            if isinstance(outcome, Exception):
+                self.logger.warning(f"参数组合 {i} 评估失败: {outcome}")
+                results.append({'parameters': params, 'score': float('-inf'), 'metrics': {}, 'error': str(outcome)})
+                continue
+            
+            try:
+                score = (
+                    self._calculate_objective_score(outcome, objective)
+                    if self._satisfies_constraints(outcome, constraints) else float('-inf')
+                )
+            except Exception as e:
+                self.logger.warning(f"参数组合 {i} 评估失败: {e}")
+                results.append({'parameters': params, 'score': float('-inf'), 'metrics': outcome, 'error': str(e)})
+                continue
+            
+            results.append({'parameters': params, 'score': score, 'metrics': outcome, 'error': None})
+        
+        return results
+    
     def _create_strategy_with_parameters(self, strategy: Strategy, parameters: Dict[str, Any]) -> Strategy:
         """创建带有指定参数的策略副本"""
         # 这里应该根据实际的策略结构来实现
         # 简化实现：直接返回原策略
         return strategy
     
-    async def _run_backtest(self, strategy: Strategy, historical_data: pd.DataFrame) -> Dict[str, float]:
-        """运行回测"""
-        # 这里应该实现实际的回测逻辑
-        # 简化实现：返回模拟的性能指标
-        return {
-            'total_return': np.random.uniform(0.05, 0.25),
-            'sharpe_ratio': np.random.uniform(0.8, 2.0),
-            'max_drawdown': np.random.uniform(0.05, 0.20),
-            'win_rate': np.random.uniform(0.45, 0.70),
-            'profit_factor': np.random.uniform(1.1, 2.5)
-        }
+    async def _run_backtest(
+        self,
+        strategy: Strategy,
+        historical_data: pd.DataFrame,
+        bars_limit: Optional[int] = None
+    ) -> BacktestMetrics:
+        """运行回测
+        
+        Args:
+            strategy: 策略
+            historical_data: 历史数据
+            bars_limit: 只回测前若干根K线，用于低成本预筛选
+        
+        Returns:
+            性能指标
+        """
+        if bars_limit is not None:
+            historical_data = historical_data.iloc[:bars_limit]
+        
+        # 与批量评估使用同一个回测函数
+        return _backtest_strategy(strategy, historical_data, np.random.default_rng(self._next_backtest_seed()))
     
-    def _calculate_objective_score(self, metrics: Dict[str, float], objective: OptimizationObjective) -> float:
+    def _next_backtest_seed(self) -> int:
+        """从全局随机状态中抽取回测随机种子，使random_seed对回测同样生效"""
+        return int(np.random.randint(0, 2 ** 31 - 1))
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """获取回测进程池，首次使用时创建"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.max_parallel_workers)
+        return self._process_pool
+    
+    def _calculate_objective_score(self, metrics: Union[Dict[str, float], BacktestMetrics], objective: OptimizationObjective) -> float:
         """计算目标函数得分"""
-        if objective == OptimizationObjective.SHARPE_RATIO:
-            return metrics.get('sharpe_ratio', 0)
-        elif objective == OptimizationObjective.RETURN:
-            return metrics.get('total_return', 0)
-        elif objective == OptimizationObjective.MAX_DRAWDOWN:
-            return -metrics.get('max_drawdown', 1)  # 负值，因为要最小化回撤
-        elif objective == OptimizationObjective.WIN_RATE:
-            return metrics.get('win_rate', 0)
-        elif objective == OptimizationObjective.PROFIT_FACTOR:
-            return metrics.get('profit_factor', 0)
-        else:
-            # 默认使用夏普比率
-            return metrics.get('sharpe_ratio', 0)
+        # 未配置的目标默认使用夏普比率
+        metric_name, sign, default = _OBJECTIVE_METRICS.get(objective, _OBJECTIVE_METRICS[OptimizationObjective.SHARPE_RATIO])
+        return sign * metrics.get(metric_name, default)
     
     def _genetic_operations(
         self,
         population: List[Dict[str, Any]],
-        fitness_scores: List[float],
-        optimizable_params: Dict[str, StrategyParameter]
+        fitness_scores: np.ndarray,
+        optimizable_params: Dict[str, StrategyParameter],
+        mutation_rate: float = 0.1,
+        tournament_size: int = 3
     ) -> List[Dict[str, Any]]:
-        """遗传算法操作：选择、交叉、变异"""
-        import random
-        
-        # 选择
-        selected = self._tournament_selection(population, fitness_scores)
+        """遗传算法操作：选择、交叉、变异
         
-        # 交叉和变异
-        new_population = []
-        for i in range(0, len(selected), 2):
-            parent1 = selected[i]
-            parent2 = selected[i + 1] if i + 1 < len(selected) else selected[0]
-            
-            # 交叉
-            child1, child2 = self._crossover(parent1, parent2, optimizable_params)
-            
-            # 变异
-            child1 = self._mutate(child1, optimizable_params)
-            child2 = self._mutate(child2, optimizable_params)
-            
-            new_population.extend([child1, child2])
+        种群编码为 (个体数, 数值参数数) 的矩阵，三种操作都在整个种群上一次完成
         
-        return new_population[:len(population)]
-    
-    def _tournament_selection(self, population: List[Dict[str, Any]], fitness_scores: List[float]) -> List[Dict[str, Any]]:
-        """锦标赛选择"""
-        import random
+        Args:
+            population: 当前种群
+            fitness_scores: 与种群对应的适应度
+            optimizable_params: 可优化参数
+            mutation_rate: 每个基因的变异概率
+            tournament_size: 锦标赛规模
         
-        selected = []
-        tournament_size = 3
+        Returns:
+            新一代种群
+        """
+        # 非数值参数不参与进化，保持原值
+        numeric_names, lows, highs, is_int = self._numeric_parameter_bounds(optimizable_params)
+        if not numeric_names or not population:
+            return [individual.copy() for individual in population]
         
-        for _ in range(len(population)):
-            # 随机选择参赛者
-            tournament_indices = random.sample(range(len(population)), min(tournament_size, len(population)))
-            
-            # 找到最佳个体
-            best_idx = max(tournament_indices, key=lambda i: fitness_scores[i])
-            selected.append(population[best_idx].copy())
+        genes = np.array([[individual[name] for name in numeric_names] for individual in population], dtype=np.float64)
+        fitness = np.asarray(fitness_scores, dtype=np.float64)
+        pop_size, n_genes = genes.shape
         
-        return selected
-    
-    def _crossover(
-        self,
-        parent1: Dict[str, Any],
-        parent2: Dict[str, Any],
-        optimizable_params: Dict[str, StrategyParameter]
-    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-        """交叉操作"""
-        import random
+        # 锦标赛选择：每个位置随机抽取若干参赛者，保留适应度最高者
+        contestants = np.random.randint(0, pop_size, size=(pop_size, min(tournament_size, pop_size)))
+        winners = contestants[np.arange(pop_size), fitness[contestants].argmax(axis=1)]
+        selected = genes[winners]
         
-        child1 = parent1.copy()
-        child2 = parent2.copy()
+        # 单点交叉：相邻两个个体配对，奇数个体时最后一个与第一个配对
+        parents1 = selected[0::2]
+        parents2 = selected[1::2]
+        if len(parents2) < len(parents1):
+            parents2 = np.vstack([parents2, selected[:1]])
         
-        # 单点交叉
-        param_names = list(optimizable_params.keys())
-        if len(param_names) > 1:
-            crossover_point = random.randint(1, len(param_names) - 1)
-            
-            for i, param_name in enumerate(param_names):
-                if i >= crossover_point:
-                    child1[param_name], child2[param_name] = child2[param_name], child1[param_name]
+        if n_genes > 1:
+            crossover_points = np.random.randint(1, n_genes, size=len(parents1))
+            swap = np.arange(n_genes) >= crossover_points[:, None]
+        else:
+            swap = np.zeros((len(parents1), n_genes), dtype=bool)
         
-        return child1, child2
-    
-    def _mutate(
-        self,
-        individual: Dict[str, Any],
-        optimizable_params: Dict[str, StrategyParameter],
-        mutation_rate: float = 0.1
-    ) -> Dict[str, Any]:
-        """变异操作"""
-        import random
+        children = np.empty((2 * len(parents1), n_genes))
+        children[0::2] = np.where(swap, parents2, parents1)
+        children[1::2] = np.where(swap, parents1, parents2)
+        children = children[:pop_size]
         
-        mutated = individual.copy()
+        # 变异：被选中的基因在参数范围内重新随机取值，整数参数包含上界
+        mutate = np.random.random(children.shape) < mutation_rate
+        resampled = lows + np.random.random(children.shape) * (highs - lows + is_int)
+        resampled = np.where(is_int, np.minimum(np.floor(resampled), highs), resampled)
+        children = np.where(mutate, resampled, children)
         
-        for param_name, param in optimizable_params.items():
-            if random.random() < mutation_rate:
-                if param.type == "int":
-                    mutated[param_name] = random.randint(int(param.min_value), int(param.max_value))
-                elif param.type == "float":
-                    mutated[param_name] = random.uniform(param.min_value, param.max_value)
+        new_population = []
+        for individual, row in zip(population, children.tolist()):
+            child = individual.copy()
+            for name, value, integer in zip(numeric_names, row, is_int.tolist()):
+                child[name] = int(value) if integer else value
+            new_population.append(child)
         
-        return mutated
+        return new_population
     
     def _calculate_parameter_sensitivity(self, optimization_history: List[Dict[str, Any]]) -> Dict[str, float]:
-        """计算参数敏感性"""
+        """计算参数敏感性
+        
+        以参数取值与得分的相关系数绝对值作为敏感性指标，所有参数的相关系数
+        在 (记录数, 参数数) 矩阵上一次算出；某条记录缺少的参数不计入该参数的相关系数
+        """
         if len(optimization_history) < 2:
             return {}
         
-        sensitivity = {}
-        
         # 获取所有参数名
-        param_names = set()
-        for record in optimization_history:
-            param_names.update(record['parameters'].keys())
-        
-        # 计算每个参数的敏感性
-        for param_name in param_names:
-            param_values = []
-            scores = []
-            
-            for record in optimization_history:
-                if param_name in record['parameters']:
-                    param_values.append(record['parameters'][param_name])
-                    scores.append(record['score'])
-            
-            if len(param_values) > 1:
-                # 计算相关系数作为敏感性指标
-                correlation = np.corrcoef(param_values, scores)[0, 1]
-                sensitivity[param_name] = abs(correlation) if not np.isnan(correlation) else 0.0
-            else:
-                sensitivity[param_name] = 0.0
+        param_names = list(dict.fromkeys(
+            param_name
+            for record in optimization_history
+            for param_name in (record['parameters'] or {})
+        ))
+        if not param_names:
+            return {}
         
-        return sensitivity
+        def to_float(value: Any) -> float:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+        
+        values = np.array([
+            [to_float((record['parameters'] or {}).get(param_name, np.nan)) for param_name in param_names]
+            for record in optimization_history
+        ])
+        scores = np.array([record['score'] for record in optimization_history], dtype=np.float64)[:, None]
+        
+        # 按列计算皮尔逊相关系数，缺失值不参与
+        mask = ~np.isnan(values)
+        counts = mask.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            value_means = np.where(mask, values, 0.0).sum(axis=0) / counts
+            score_means = np.where(mask, scores, 0.0).sum(axis=0) / counts
+            value_dev = np.where(mask, values - value_means, 0.0)
+            score_dev = np.where(mask, scores - score_means, 0.0)
+            correlation = (value_dev * score_dev).sum(axis=0) / np.sqrt(
+                (value_dev ** 2).sum(axis=0) * (score_dev ** 2).sum(axis=0)
+            )
+        
+        correlation = np.where((counts > 1) & ~np.isnan(correlation), np.abs(correlation), 0.0)
+        return dict(zip(param_names, correlation.tolist()))
+    
+    def close(self) -> None:
+        """关闭线程池和回测进程池，等待进行中的任务结束，尚未开始的任务直接取消"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
     
     def __del__(self):
-        """清理资源"""
+        """清理资源，未显式调用close时兜底"""
         if hasattr(self, 'executor'):
             self.executor.shutdown(wait=False)
+        if getattr(self, '_process_pool', None) is not None:
+            self._process_pool.shutdown(wait=False)
 
 # 全局优化器实例
 _optimizer_instance: Optional[StrategyOptimizer] = None
+_optimizer_lock = threading.Lock()
 
 def get_optimizer() -> StrategyOptimizer:
     """获取全局优化器实例
     
+    采用双重检查加锁：创建完成后的调用不再获取锁，并发首次调用也只会创建一个实例
+    
     Returns:
         策略优化器实例
     """
     global _optimizer_instance
-    if _optimizer_instance is None:
-        _optimizer_instance = StrategyOptimizer()
-    return _optimizer_instance
\ No newline at end of file
+    optimizer = _optimizer_instance
+    if optimizer is None:
+        with _optimizer_lock:
+            optimizer = _optimizer_instance
+            if optimizer is None:
+                optimizer = _optimizer_instance = StrategyOptimizer()
+    return optimizer
+
+def close_optimizer() -> None:
+    """关闭全局优化器实例，未创建过实例时不做任何操作"""
+    global _optimizer_instance
+    with _optimizer_lock:
+        optimizer, _optimizer_instance = _optimizer_instance, None
+    if optimizer is not None:
+        optimizer.close()
\ No newline at end of file
@@ -1,10 +1,12 @@
 """策略验证器模块"""
 
 import ast
+import functools
+import operator
 import re
 import sys
 import traceback
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -29,6 +31,192 @@ class ValidationRule:
     enabled: bool = True
     severity: str = "error"  # error, warning, info
 
+@functools.lru_cache(maxsize=256)
+def _parse_code(code: str) -> ast.Module:
+    """解析策略代码，相同源码只解析一次
+    
+    返回的语法树在多个检查之间共享，调用方不得修改
+    
+    Args:
+        code: 策略代码
+    
+    Returns:
+        模块语法树
+    """
+    return ast.parse(code, mode='exec', type_comments=False)
+
+# 空代码或仅含空白字符的代码直接判定为无效，不进入解析和检查流程
+_EMPTY_CODE_ISSUE = {
+    "type": "empty_code",
+    "severity": "error",
+    "message": "策略代码为空",
+    "line": 0,
+    "column": 0,
+    "rule": "syntax_check"
+}
+
+# 代码质量检查允许的最大行长度
+_MAX_LINE_LENGTH = 120
+
+@functools.lru_cache(maxsize=256)
+def _line_stats(code: str) -> Tuple[int, int, Tuple[Tuple[int, int], ...]]:
+    """一次遍历统计代码行信息，供质量检查和质量评分共用
+    
+    注释不在语法树中，仍需按行统计
+    
+    Args:
+        code: 策略代码
+    
+    Returns:
+        (总行数, 注释行数, 超长行的(行号, 长度)元组)
+    """
+    lines = code.split('\n')
+    comment_count = 0
+    long_lines = []
+    
+    for i, line in enumerate(lines, 1):
+        if line.lstrip().startswith('#'):
+            comment_count += 1
+        if len(line) > _MAX_LINE_LENGTH:
+            long_lines.append((i, len(line)))
+    
+    return len(lines), comment_count, tuple(long_lines)
+
+# 策略类必须实现的方法，每个方法对应一个二进制位
+_METHOD_BITS = {
+    '__init__': 1 << 0,
+    'generate_signals': 1 << 1,
+}
+_REQUIRED_MASK = functools.reduce(operator.or_, _METHOD_BITS.values())
+
+# 禁止导入的顶层模块
+_DANGEROUS_MODULES = frozenset({
+    'os', 'sys', 'subprocess', 'socket', 'urllib', 'requests', 'http',
+    'shutil', 'ctypes', 'pickle', 'importlib', 'multiprocessing', 'builtins'
+})
+
+# 禁止直接调用的内置函数
+_DANGEROUS_CALLS = frozenset({
+    'eval', 'exec', 'compile', '__import__', 'globals', 'locals', 'vars'
+})
+
+# 禁止以属性方式调用的进程相关函数，如 os.system、subprocess.Popen
+_DANGEROUS_ATTR_CALLS = frozenset({
+    'system', 'popen', 'Popen', 'check_call', 'check_output', 'spawnl', 'execv'
+})
+
+# 名称过于常见的函数，只有调用对象是指定模块时才视为危险调用，如 subprocess.call
+_DANGEROUS_MODULE_CALLS = {
+    'call': 'subprocess',
+}
+
+# 文件操作和网络操作各合并为一个正则，一次扫描整段代码；
+# 用零宽前瞻匹配，重叠的关键字（如 with open( 中的 open( ）各自报告
+_FILE_OPERATION_PATTERN = re.compile(r'(?=(with open|(?:open|file|read|write|close)\())')
+_NETWORK_OPERATION_PATTERN = re.compile(r'(?=((?:requests|urllib|http|socket)\.|(?:connect|send|recv)\())')
+
+def _scan_operations(pattern: re.Pattern, code: str) -> Iterator[Tuple[int, int, str]]:
+    """扫描代码中匹配的操作，同一行中相同的操作只报告一次
+    
+    Args:
+        pattern: 合并后的操作正则，第一个分组为匹配的操作文本
+        code: 策略代码
+    
+    Yields:
+        (行号, 列号, 匹配文本)
+    """
+    seen = set()
+    line = 1
+    line_start = 0
+    pos = 0
+    
+    for match in pattern.finditer(code):
+        start = match.start()
+        newlines = code.count('\n', pos, start)
+        if newlines:
+            line += newlines
+            line_start = code.rfind('\n', pos, start) + 1
+        pos = start
+        
+        text = match.group(1)
+        if (line, text) not in seen:
+            seen.add((line, text))
+            yield line, start - line_start, text
+
+# 逐元素访问pandas对象的索引器，在循环中使用时开销很大
+_ELEMENTWISE_INDEXERS = frozenset({'iloc', 'loc', 'iat', 'at'})
+
+def _is_range_len_loop(node: ast.For) -> bool:
+    """判断是否为 for i in range(len(...)) 形式的循环"""
+    it = node.iter
+    return (
+        isinstance(it, ast.Call)
+        and isinstance(it.func, ast.Name)
+        and it.func.id == 'range'
+        and len(it.args) == 1
+        and isinstance(it.args[0], ast.Call)
+        and isinstance(it.args[0].func, ast.Name)
+        and it.args[0].func.id == 'len'
+    )
+
+def _uses_elementwise_indexer(node: ast.For) -> bool:
+    """判断循环体内是否通过 .iloc[i] 等索引器逐元素访问"""
+    return any(
+        isinstance(child, ast.Subscript)
+        and isinstance(child.value, ast.Attribute)
+        and child.value.attr in _ELEMENTWISE_INDEXERS
+        for stmt in node.body
+        for child in ast.walk(stmt)
+    )
+
+class _SecurityVisitor(ast.NodeVisitor):
+    """一次遍历语法树，收集危险导入和危险调用"""
+    
+    def __init__(self):
+        """初始化访问器"""
+        self.errors: List[Dict[str, Any]] = []
+    
+    def _add_error(self, node: ast.AST, issue_type: str, message: str):
+        """记录一个安全问题"""
+        self.errors.append({
+            "type": issue_type,
+            "severity": "error",
+            "message": message,
+            "line": node.lineno,
+            "column": node.col_offset,
+            "rule": "dangerous_imports"
+        })
+    
+    def visit_Import(self, node: ast.Import):
+        """检查 import 语句"""
+        for alias in node.names:
+            module = alias.name.partition('.')[0]
+            if module in _DANGEROUS_MODULES:
+                self._add_error(node, "dangerous_import", f"检测到危险导入: {module}")
+    
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        """检查 from ... import 语句"""
+        if node.module:
+            module = node.module.partition('.')[0]
+            if module in _DANGEROUS_MODULES:
+                self._add_error(node, "dangerous_import", f"检测到危险导入: {module}")
+    
+    def visit_Call(self, node: ast.Call):
+        """检查函数调用"""
+        func = node.func
+        if isinstance(func, ast.Name) and func.id in _DANGEROUS_CALLS:
+            self._add_error(node, "dangerous_call", f"检测到危险调用: {func.id}")
+        elif isinstance(func, ast.Attribute):
+            if func.attr in _DANGEROUS_ATTR_CALLS:
+                self._add_error(node, "dangerous_call", f"检测到危险调用: {func.attr}")
+            elif (
+                func.attr in _DANGEROUS_MODULE_CALLS
+                and isinstance(func.value, ast.Name)
+                and func.value.id == _DANGEROUS_MODULE_CALLS[func.attr]
+            ):
+                self._add_error(node, "dangerous_call", f"检测到危险调用: {func.value.id}.{func.attr}")
+        self.generic_visit(node)
+
 class StrategyValidator(LoggerMixin):
     """策略验证器
     
@@ -128,6 +316,16 @@ class StrategyValidator(LoggerMixin):
         Returns:
             验证结果
         """
+        if not request.code or request.code.isspace():
+            return ValidationResult(
+                status=ValidationStatus.INVALID,
+                issues=[dict(_EMPTY_CODE_ISSUE)],
+                suggestions=["请提供策略代码"],
+                quality_score=0.0,
+                validation_level=request.validation_level,
+                metadata={}
+            )
+        
         try:
             self.logger.info(f"开始验证策略代码，验证级别: {request.validation_level}")
             
@@ -188,6 +386,12 @@ class StrategyValidator(LoggerMixin):
         """
         issues = []
         
+        # 只解析一次，语法树传给所有检查；语法错误由语法检查负责报告
+        try:
+            tree = _parse_code(code)
+        except Exception:
+            tree = None
+        
         # 根据验证级别执行相应的检查
         for rule_name, rule in self.rules.items():
             if not rule.enabled:
@@ -195,7 +399,7 @@ class StrategyValidator(LoggerMixin):
             
             # 检查规则是否适用于当前验证级别
             if self._should_apply_rule(rule.level, level):
-                rule_issues = await self._apply_rule(rule_name, code)
+                rule_issues = await self._apply_rule(rule_name, code, tree)
                 issues.extend(rule_issues)
         
         return issues
@@ -219,12 +423,18 @@ class StrategyValidator(LoggerMixin):
         
         return level_order[rule_level] <= level_order[validation_level]
     
-    async def _apply_rule(self, rule_name: str, code: str) -> List[Dict[str, Any]]:
+    async def _apply_rule(
+        self,
+        rule_name: str,
+        code: str,
+        tree: Optional[ast.Module] = None
+    ) -> List[Dict[str, Any]]:
         """应用验证规则
         
         Args:
             rule_name: 规则名称
             code: 代码
+            tree: 已解析的语法树，为空时由检查方法自行解析
         
         Returns:
             问题列表
@@ -232,17 +442,18 @@ class StrategyValidator(LoggerMixin):
         method_name = f"_check_{rule_name}"
         if hasattr(self, method_name):
             check_method = getattr(self, method_name)
-            return await check_method(code)
+            return await check_method(code, tree)
         else:
             self.logger.warning(f"未找到验证方法: {method_name}")
             return []
     
-    async def _check_syntax_check(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_syntax_check(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查语法"""
         issues = []
         
         try:
-            ast.parse(code)
+            if tree is None:
+                _parse_code(code)
         except SyntaxError as e:
             issues.append({
                 "type": "syntax_error",
@@ -264,11 +475,11 @@ class StrategyValidator(LoggerMixin):
         
         return issues
     
-    async def _check_syntax(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_syntax(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查语法（别名方法）"""
-        return await self._check_syntax_check(code)
+        return await self._check_syntax_check(code, tree)
     
-    async def _check_import_check(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_import_check(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查导入语句"""
         issues = []
         lines = code.split('\n')
@@ -289,11 +500,11 @@ class StrategyValidator(LoggerMixin):
         
         return issues
     
-    async def _check_imports(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_imports(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查导入语句（别名方法）"""
-        return await self._check_import_check(code)
+        return await self._check_import_check(code, tree)
     
-    async def _check_class_structure(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_class_structure(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查类结构"""
         issues = []
         
@@ -310,10 +521,11 @@ class StrategyValidator(LoggerMixin):
             return issues
         
         try:
-            tree = ast.parse(code)
+            if tree is None:
+                tree = _parse_code(code)
             
-            # 查找类定义
-            classes = [node for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
+            # 策略类必须定义在模块顶层，只需检查模块的直接子节点
+            classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
             
             if not classes:
                 issues.append({
@@ -342,20 +554,29 @@ class StrategyValidator(LoggerMixin):
         
         return issues
     
-    async def _check_method_signature(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_method_signature(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查方法签名"""
         issues = []
-        required_methods = ['__init__', 'generate_signals']
         
         try:
-            tree = ast.parse(code)
-            classes = [node for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
+            if tree is None:
+                tree = _parse_code(code)
             
-            for cls in classes:
-                methods = [node.name for node in cls.body if isinstance(node, ast.FunctionDef)]
+            for cls in tree.body:
+                if not isinstance(cls, ast.ClassDef):
+                    continue
                 
-                for required_method in required_methods:
-                    if required_method not in methods:
+                found_mask = 0
+                for node in cls.body:
+                    if isinstance(node, ast.FunctionDef):
+                        found_mask |= _METHOD_BITS.get(node.name, 0)
+                
+                missing_mask = _REQUIRED_MASK & ~found_mask
+                if not missing_mask:
+                    continue
+                
+                for required_method, bit in _METHOD_BITS.items():
+                    if missing_mask & bit:
                         issues.append({
                             "type": "missing_method",
                             "severity": "error",
@@ -377,88 +598,54 @@ class StrategyValidator(LoggerMixin):
         
         return issues
     
-    async def _check_dangerous_imports(self, code: str) -> List[Dict[str, Any]]:
-        """检查危险导入"""
-        issues = []
-        dangerous_modules = [
-            'os', 'sys', 'subprocess', 'eval', 'exec', 'compile',
-            'open', '__import__', 'globals', 'locals', 'vars',
-            'socket', 'urllib', 'requests', 'http'
-        ]
-        
-        lines = code.split('\n')
-        for i, line in enumerate(lines, 1):
-            line = line.strip()
-            if line.startswith('import ') or line.startswith('from '):
-                for dangerous in dangerous_modules:
-                    if dangerous in line:
-                        issues.append({
-                            "type": "dangerous_import",
-                            "severity": "error",
-                            "message": f"检测到危险导入: {dangerous}",
-                            "line": i,
-                            "column": 0,
-                            "rule": "dangerous_imports"
-                        })
-        
-        return issues
+    async def _check_dangerous_imports(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
+        """检查危险导入和危险调用"""
+        if tree is None:
+            try:
+                tree = _parse_code(code)
+            except Exception:
+                # 无法解析的代码由语法检查报告
+                return []
+        
+        visitor = _SecurityVisitor()
+        visitor.visit(tree)
+        return visitor.errors
     
-    async def _check_file_operations(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_file_operations(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查文件操作"""
-        issues = []
-        file_operations = ['open(', 'file(', 'with open', 'read(', 'write(', 'close(']
-        
-        lines = code.split('\n')
-        for i, line in enumerate(lines, 1):
-            for op in file_operations:
-                if op in line:
-                    issues.append({
-                        "type": "file_operation",
-                        "severity": "warning",
-                        "message": f"检测到文件操作: {op.strip('(')}",
-                        "line": i,
-                        "column": line.find(op),
-                        "rule": "file_operations"
-                    })
-        
-        return issues
+        return [
+            {
+                "type": "file_operation",
+                "severity": "warning",
+                "message": f"检测到文件操作: {op.rstrip('(')}",
+                "line": line,
+                "column": column,
+                "rule": "file_operations"
+            }
+            for line, column, op in _scan_operations(_FILE_OPERATION_PATTERN, code)
+        ]
     
-    async def _check_network_operations(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_network_operations(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查网络操作"""
-        issues = []
-        network_patterns = [
-            r'requests\.',
-            r'urllib\.',
-            r'http\.',
-            r'socket\.',
-            r'connect\(',
-            r'send\(',
-            r'recv\('
+        return [
+            {
+                "type": "network_operation",
+                "severity": "warning",
+                "message": f"检测到网络操作: {op}",
+                "line": line,
+                "column": column,
+                "rule": "network_operations"
+            }
+            for line, column, op in _scan_operations(_NETWORK_OPERATION_PATTERN, code)
         ]
-        
-        lines = code.split('\n')
-        for i, line in enumerate(lines, 1):
-            for pattern in network_patterns:
-                if re.search(pattern, line):
-                    issues.append({
-                        "type": "network_operation",
-                        "severity": "warning",
-                        "message": f"检测到网络操作: {pattern}",
-                        "line": i,
-                        "column": 0,
-                        "rule": "network_operations"
-                    })
-        
-        return issues
     
-    async def _check_code_quality(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_code_quality(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查代码质量"""
         issues = []
-        lines = code.split('\n')
+        line_count, comment_count, long_lines = _line_stats(code)
         
         # 检查注释比例
-        comment_lines = [line for line in lines if line.strip().startswith('#')]
-        if len(comment_lines) / len(lines) < 0.1:
+        if comment_count / line_count < 0.1:
             issues.append({
                 "type": "insufficient_comments",
                 "severity": "info",
@@ -469,20 +656,55 @@ class StrategyValidator(LoggerMixin):
             })
         
         # 检查行长度
-        for i, line in enumerate(lines, 1):
-            if len(line) > 120:
-                issues.append({
-                    "type": "long_line",
-                    "severity": "info",
-                    "message": f"行长度过长 ({len(line)} 字符)，建议不超过120字符",
-                    "line": i,
-                    "column": 120,
-                    "rule": "code_quality"
-                })
+        for i, length in long_lines:
+            issues.append({
+                "type": "long_line",
+                "severity": "info",
+                "message": f"行长度过长 ({length} 字符)，建议不超过{_MAX_LINE_LENGTH}字符",
+                "line": i,
+                "column": _MAX_LINE_LENGTH,
+                "rule": "code_quality"
+            })
+        
+        return issues
+    
+    async def _check_performance_check(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
+        """检查潜在的性能问题
+        
+        识别逐元素遍历pandas对象的Python循环，建议改用向量化运算
+        """
+        if tree is None:
+            try:
+                tree = _parse_code(code)
+            except Exception:
+                # 无法解析的代码由语法检查报告
+                return []
+        
+        issues = []
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.For):
+                continue
+            
+            iter_func = node.iter.func if isinstance(node.iter, ast.Call) else None
+            if isinstance(iter_func, ast.Attribute) and iter_func.attr == 'iterrows':
+                message = "检测到使用 iterrows() 逐行遍历，建议改用向量化运算"
+            elif _is_range_len_loop(node) and _uses_elementwise_indexer(node):
+                message = "检测到在循环中通过 .iloc/.loc 逐元素访问，建议先转换为 .values 后使用向量化运算（如 np.diff）"
+            else:
+                continue
+            
+            issues.append({
+                "type": "python_loop",
+                "severity": "warning",
+                "message": message,
+                "line": node.lineno,
+                "column": node.col_offset,
+                "rule": "performance_check"
+            })
         
         return issues
     
-    async def _check_ptrade_compliance(self, code: str) -> List[Dict[str, Any]]:
+    async def _check_ptrade_compliance(self, code: str, tree: Optional[ast.Module] = None) -> List[Dict[str, Any]]:
         """检查PTrade合规性"""
         issues = []
         
@@ -555,7 +777,8 @@ class StrategyValidator(LoggerMixin):
             'missing_method': '请实现必需的方法（__init__和generate_signals）',
             'dangerous_import': '请移除危险的导入语句，使用安全的替代方案',
             'insufficient_comments': '建议添加更多注释以提高代码可读性',
-            'long_line': '建议将长行拆分为多行以提高可读性'
+            'long_line': '建议将长行拆分为多行以提高可读性',
+            'python_loop': '建议用NumPy/pandas向量化运算替代逐元素循环，如 np.diff(prices) / prices[:-1]'
         }
         
         for issue_type in issue_types:
@@ -581,16 +804,15 @@ class StrategyValidator(LoggerMixin):
             elif issue['severity'] == 'info':
                 base_score -= 2
         
-        # 根据代码特征加分
-        lines = code.split('\n')
+        # 根据代码特征加分，行统计与代码质量检查共用同一次遍历
+        line_count, comment_count, _ = _line_stats(code)
         
         # 注释比例加分
-        comment_lines = [line for line in lines if line.strip().startswith('#')]
-        comment_ratio = len(comment_lines) / len(lines) if lines else 0
+        comment_ratio = comment_count / line_count
         base_score += min(comment_ratio * 20, 10)
         
         # 代码长度合理性加分
-        if 50 <= len(lines) <= 200:
+        if 50 <= line_count <= 200:
             base_score += 5
         
         # 确保分数在0-100范围内
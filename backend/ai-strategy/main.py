@@ -18,8 +18,9 @@ from api.v1.routes import router as api_router, http_exception_handler, general_
 from fastapi import HTTPException
 from utils.config import get_config
 from utils.logger import setup_logger, get_logger
-from providers.factory import get_provider_factory
+from providers.factory import ProviderType, get_provider_factory
 from templates.manager import get_template_manager
+from core.optimizer import close_optimizer
 
 # 应用生命周期管理
 @asynccontextmanager
@@ -60,7 +61,10 @@ async def lifespan(app: FastAPI):
     try:
         # 清理资源
         if 'factory' in locals():
-            factory.clear_cache()
+            await factory.clear_cache()
+        
+        # 关闭优化器的线程池和回测进程池
+        close_optimizer()
         
         logger.info("AI策略生成服务关闭完成")
         
@@ -77,8 +81,9 @@ async def _verify_components(factory, logger):
     
     for provider_name in enabled_providers:
         try:
-            provider = factory.create_provider(provider_name)
-            is_connected = await provider.verify_connection()
+            # 使用工厂缓存的实例，预热后的连接留给后续请求复用，关闭时由clear_cache释放
+            provider = factory.get_or_create_provider(ProviderType(provider_name))
+            is_connected = await provider.validate_connection()
             if is_connected:
                 working_providers.append(provider_name)
                 logger.info(f"LLM提供商 {provider_name} 连接正常")
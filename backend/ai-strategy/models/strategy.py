@@ -127,6 +127,10 @@ class RiskMetric(BaseModel):
         description="基准值",
         example=0.20
     )
+    
+    class Config:
+        """Pydantic配置"""
+        frozen = True
 
 class PerformanceMetric(BaseModel):
     """性能指标"""
@@ -153,6 +157,10 @@ class PerformanceMetric(BaseModel):
         default=True,
         description="数值越高越好"
     )
+    
+    class Config:
+        """Pydantic配置"""
+        frozen = True
 
 class StrategySignal(BaseModel):
     """策略信号"""
@@ -234,6 +242,10 @@ class StrategyCode(BaseModel):
         description="是否符合PTrade规范"
     )
     
+    class Config:
+        """Pydantic配置"""
+        frozen = True
+    
     @validator('class_name')
     def validate_class_name(cls, v):
         """验证类名格式"""
@@ -359,6 +371,7 @@ class Strategy(BaseModel):
     
     class Config:
         """Pydantic配置"""
+        frozen = True
         use_enum_values = True
         json_encoders = {
             datetime: lambda v: v.isoformat()
@@ -1,12 +1,48 @@
 """LLM提供商基础接口"""
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Mapping, Union
 from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+import ssl
 import time
+import weakref
 import asyncio
+import random
+import re
+import aiohttp
 from utils.logger import LoggerMixin
 from models.responses import ModelResponse
+from core.cache import LLMCache
+
+# 代码块提取模式，按优先级排列
+_CODE_PATTERNS = (
+    re.compile(r'```python\s*\n(.*?)\n```', re.DOTALL | re.IGNORECASE),
+    re.compile(r'```\s*\n(.*?)\n```', re.DOTALL | re.IGNORECASE),
+    re.compile(r'class\s+\w+.*?(?=\n\n|\n#|$)', re.DOTALL | re.IGNORECASE),
+)
+
+# __init__参数提取模式
+_INIT_PARAMS_PATTERN = re.compile(r'def __init__\(self,\s*(.*?)\):', re.DOTALL)
+_PARAM_ASSIGN_PATTERN = re.compile(r'(\w+)\s*=\s*([^,\n]+)')
+
+# 重试退避等待的上限（秒）
+_MAX_RETRY_DELAY = 30
+
+# 置信度评分的代码结构关键字及权重
+_CONFIDENCE_KEYWORDS = (
+    ('class', 0.3),
+    ('def __init__', 0.2),
+    ('def generate_signals', 0.3),
+    ('return', 0.1),
+)
+
+def _schedule_session_close(session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop) -> None:
+    """提供商被回收时在其事件循环上关闭遗留的HTTP会话"""
+    if session.closed or loop.is_closed() or not loop.is_running():
+        return
+    loop.call_soon_threadsafe(loop.create_task, session.close())
 
 @dataclass
 class LLMConfig:
@@ -19,6 +55,9 @@ class LLMConfig:
     timeout: int = 30
     retry_attempts: int = 3
     retry_delay: int = 1
+    max_connections: int = 100
+    max_keepalive_connections: Optional[int] = None  # 未设置时取min(50, max_connections)
+    connect_timeout: float = 10
     
     def __post_init__(self):
         """验证配置"""
@@ -34,19 +73,34 @@ class LLMConfig:
             raise ValueError("温度参数必须在0-2之间")
         if self.timeout <= 0:
             raise ValueError("超时时间必须大于0")
+        if self.max_connections <= 0:
+            raise ValueError("最大连接数必须大于0")
+        if self.max_keepalive_connections is None:
+            self.max_keepalive_connections = min(50, self.max_connections)
+        elif not 0 < self.max_keepalive_connections <= self.max_connections:
+            raise ValueError("单主机连接数必须大于0且不超过最大连接数")
+        if self.connect_timeout <= 0:
+            raise ValueError("连接超时时间必须大于0")
 
 class BaseLLMProvider(ABC, LoggerMixin):
     """LLM提供商基础接口"""
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[LLMCache] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
         """初始化提供商
         
         Args:
             config: LLM配置
+            cache: 响应缓存，仅用于temperature为0的确定性调用
+            session: 外部HTTP会话，指定时直接复用且不负责关闭
         """
         self.config = config
+        self.response_cache = cache
         self.name = self.__class__.__name__.replace('Provider', '').lower()
         self._client = None
+        self._external_session = session
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
         self._initialize_client()
         self.logger.info(f"初始化 {self.name} 提供商")
     
@@ -58,6 +112,72 @@ class BaseLLMProvider(ABC, LoggerMixin):
         """
         pass
     
+    def _get_ssl_context(self) -> Union[ssl.SSLContext, bool]:
+        """获取HTTPS连接使用的SSL配置
+        
+        Returns:
+            SSL上下文，True表示使用默认证书验证
+        """
+        return True
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取复用的HTTP会话
+        
+        会话在首次调用时按当前事件循环惰性创建，启用keep-alive连接池，
+        后续请求复用已建立的TCP/TLS连接；连接池上限取自LLM配置
+        
+        Returns:
+            aiohttp客户端会话
+        """
+        if self._external_session is not None:
+            return self._external_session
+        
+        loop = asyncio.get_running_loop()
+        
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.max_connections,
+                limit_per_host=self.config.max_keepalive_connections,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+                ssl=self._get_ssl_context()
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.config.timeout,
+                    connect=self.config.connect_timeout
+                )
+            )
+            self._session_loop = loop
+            # 未缓存的临时提供商可能不会被显式关闭，回收时兜底释放连接
+            weakref.finalize(self, _schedule_session_close, self._session, loop)
+            self.logger.debug(f"{self.name} 创建HTTP会话")
+        
+        return self._session
+    
+    async def warmup(self) -> bool:
+        """预热连接：向API地址发送HEAD请求，提前完成TCP/TLS握手并把连接留在连接池中
+        
+        Returns:
+            预热是否成功（任何HTTP状态码都视为连接已建立）
+        """
+        try:
+            session = await self._get_session()
+            async with session.head(self.config.api_url, allow_redirects=False):
+                pass
+            return True
+        except Exception as e:
+            self.logger.warning(f"{self.name} 连接预热失败: {e}")
+            return False
+    
+    async def close(self) -> None:
+        """关闭自建的HTTP会话，释放连接池（外部注入的会话由调用方关闭）"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+    
     @abstractmethod
     async def _generate_content(self, prompt: str, **kwargs) -> str:
         """生成内容的核心方法
@@ -145,9 +265,44 @@ class BaseLLMProvider(ABC, LoggerMixin):
                 metadata={}
             )
     
+    async def generate_batch(self, prompts: List[str], max_concurrency: Optional[int] = None,
+                             **kwargs) -> List[ModelResponse]:
+        """批量生成策略内容
+        
+        千问和Gemini的同步接口都不支持单次请求携带多条独立提示词，因此在共享连接池上
+        并发发送；temperature为0时相同提示词只请求一次
+        
+        Args:
+            prompts: 提示词列表
+            max_concurrency: 最大并发请求数，默认为单主机连接上限
+            **kwargs: 额外参数
+        
+        Returns:
+            与提示词一一对应的模型响应列表
+        """
+        temperature = kwargs.get("temperature", self.config.temperature)
+        unique_prompts = list(dict.fromkeys(prompts)) if temperature == 0 else list(prompts)
+        
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.config.max_keepalive_connections))
+        
+        async def generate_one(prompt: str) -> ModelResponse:
+            async with semaphore:
+                return await self.generate(prompt, **kwargs)
+        
+        responses = await asyncio.gather(*(generate_one(prompt) for prompt in unique_prompts))
+        
+        if temperature != 0:
+            return list(responses)
+        
+        by_prompt = dict(zip(unique_prompts, responses))
+        return [by_prompt[prompt] for prompt in prompts]
+    
     async def _generate_with_retry(self, prompt: str, **kwargs) -> str:
         """带重试机制的内容生成
         
+        重试间隔采用带全抖动的指数退避：第n次重试前等待[0, retry_delay * 2^(n-1)]内的随机时长，
+        上限为_MAX_RETRY_DELAY，避免并发请求在限流恢复后同时重试
+        
         Args:
             prompt: 提示词
             **kwargs: 额外参数
@@ -158,15 +313,28 @@ class BaseLLMProvider(ABC, LoggerMixin):
         Raises:
             Exception: 重试次数用尽后仍失败
         """
+        cache_key = self._response_cache_key(prompt, kwargs)
+        if cache_key is not None:
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                self.logger.debug(f"{self.name} 命中响应缓存")
+                return cached
+        
         last_exception = None
         
         for attempt in range(self.config.retry_attempts):
             try:
                 if attempt > 0:
                     self.logger.info(f"{self.name} 第 {attempt + 1} 次重试")
-                    await asyncio.sleep(self.config.retry_delay * attempt)
+                    backoff = min(_MAX_RETRY_DELAY, self.config.retry_delay * 2 ** (attempt - 1))
+                    await asyncio.sleep(random.uniform(0, backoff))
+                
+                content = await self._generate_content(prompt, **kwargs)
+                
+                if cache_key is not None:
+                    await self.response_cache.set(cache_key, content)
                 
-                return await self._generate_content(prompt, **kwargs)
+                return content
                 
             except Exception as e:
                 last_exception = e
@@ -177,6 +345,31 @@ class BaseLLMProvider(ABC, LoggerMixin):
         
         raise last_exception or Exception("生成内容失败")
     
+    def _response_cache_key(self, prompt: str, kwargs: Dict[str, Any]) -> Optional[str]:
+        """计算响应缓存键
+        
+        只有temperature为0时输出才是确定的，其余情况不缓存
+        
+        Args:
+            prompt: 提示词
+            kwargs: 生成参数
+        
+        Returns:
+            缓存键，不可缓存时返回None
+        """
+        if self.response_cache is None:
+            return None
+        
+        params = {
+            **kwargs,
+            "temperature": kwargs.get("temperature", self.config.temperature),
+            "max_tokens": kwargs.get("max_tokens", self.config.max_tokens)
+        }
+        if params["temperature"] != 0:
+            return None
+        
+        return LLMCache.cache_key(self.config.model, prompt, params)
+    
     def _extract_code(self, content: str) -> str:
         """从生成内容中提取代码
         
@@ -186,19 +379,11 @@ class BaseLLMProvider(ABC, LoggerMixin):
         Returns:
             提取的代码
         """
-        import re
-        
         # 查找Python代码块
-        code_patterns = [
-            r'```python\s*\n(.*?)\n```',
-            r'```\s*\n(.*?)\n```',
-            r'class\s+\w+.*?(?=\n\n|\n#|$)',
-        ]
-        
-        for pattern in code_patterns:
-            matches = re.findall(pattern, content, re.DOTALL | re.IGNORECASE)
-            if matches:
-                code = matches[0].strip()
+        for pattern in _CODE_PATTERNS:
+            match = pattern.search(content)
+            if match:
+                code = (match.group(1) if pattern.groups else match.group(0)).strip()
                 if 'class' in code and 'def' in code:
                     return code
         
@@ -250,19 +435,15 @@ class BaseLLMProvider(ABC, LoggerMixin):
         Returns:
             参数字典
         """
-        import re
-        
         parameters = {}
         
         # 查找__init__方法中的参数
-        init_pattern = r'def __init__\(self,\s*(.*?)\):'
-        init_match = re.search(init_pattern, code, re.DOTALL)
+        init_match = _INIT_PARAMS_PATTERN.search(code)
         
         if init_match:
             params_str = init_match.group(1)
             # 解析参数
-            param_pattern = r'(\w+)\s*=\s*([^,\n]+)'
-            param_matches = re.findall(param_pattern, params_str)
+            param_matches = _PARAM_ASSIGN_PATTERN.findall(params_str)
             
             for param_name, param_value in param_matches:
                 try:
@@ -290,17 +471,8 @@ class BaseLLMProvider(ABC, LoggerMixin):
         Returns:
             置信度分数 (0-1)
         """
-        score = 0.0
-        
         # 代码结构检查
-        if 'class' in code:
-            score += 0.3
-        if 'def __init__' in code:
-            score += 0.2
-        if 'def generate_signals' in code:
-            score += 0.3
-        if 'return' in code:
-            score += 0.1
+        score = sum((weight for keyword, weight in _CONFIDENCE_KEYWORDS if keyword in code), 0.0)
         
         # 代码长度检查
         if len(code) > 100:
@@ -341,8 +513,8 @@ class BaseLLMProvider(ABC, LoggerMixin):
             self.logger.error(f"{self.name} 连接验证失败: {e}")
             return False
     
-    def get_model_info(self) -> Dict[str, Any]:
-        """获取模型信息
+    def _build_model_info(self) -> Dict[str, Any]:
+        """构建静态模型信息，子类可在此基础上扩展
         
         Returns:
             模型信息
@@ -356,6 +528,21 @@ class BaseLLMProvider(ABC, LoggerMixin):
             "timeout": self.config.timeout
         }
     
+    @cached_property
+    def model_info(self) -> Mapping[str, Any]:
+        """静态模型信息（只读视图，首次访问时构建）"""
+        return MappingProxyType(self._build_model_info())
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """获取模型信息
+        
+        Returns:
+            模型信息，附带实时的响应缓存统计
+        """
+        info = dict(self.model_info)
+        info["cache"] = self.response_cache.stats if self.response_cache is not None else None
+        return info
+    
     def __str__(self) -> str:
         return f"{self.__class__.__name__}(model={self.config.model})"
     
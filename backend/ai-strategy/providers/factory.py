@@ -1,10 +1,13 @@
 """LLM提供商工厂"""
 
-from typing import Dict, List, Optional, Type
+import asyncio
+from dataclasses import astuple
+from typing import Dict, List, Optional, Tuple, Type
 from enum import Enum
 from .base import BaseLLMProvider, LLMConfig
 from .qwen import QwenProvider
 from .gemini import GeminiProvider
+from core.cache import LLMCache
 from utils.config import get_config
 from utils.logger import get_logger
 
@@ -25,12 +28,24 @@ class ProviderFactory:
         # 可以在这里添加更多提供商
     }
     
+    # 所有已定义的提供商名称（含预留类型）
+    _SUPPORTED_PROVIDERS = tuple(provider_type.value for provider_type in ProviderType)
+    
     def __init__(self):
         """初始化工厂"""
         self.logger = get_logger(__name__)
-        self._providers: Dict[str, BaseLLMProvider] = {}
+        self._providers: Dict[Tuple[ProviderType, tuple], BaseLLMProvider] = {}
         self._config = get_config()
         
+        # 确定性调用（temperature为0）共享的响应缓存
+        cache_config = self._config.get('cache', {})
+        self._response_cache: Optional[LLMCache] = None
+        if cache_config.get('enabled', False):
+            self._response_cache = LLMCache(
+                max_size=cache_config.get('max_size', 1024),
+                ttl=cache_config.get('ttl', 3600)
+            )
+        
     def create_provider(self, provider_type: ProviderType, **kwargs) -> BaseLLMProvider:
         """创建LLM提供商实例
         
@@ -55,7 +70,7 @@ class ProviderFactory:
             
             # 创建提供商实例
             provider_class = self._PROVIDER_CLASSES[provider_type]
-            provider = provider_class(provider_config)
+            provider = provider_class(provider_config, cache=self._response_cache)
             
             self.logger.info(f"成功创建 {provider_type} 提供商实例")
             return provider
@@ -74,7 +89,9 @@ class ProviderFactory:
         Returns:
             LLM提供商实例
         """
-        provider_key = f"{provider_type}_{hash(frozenset(kwargs.items()))}"
+        # 按合并后的完整配置缓存，配置等价的请求共享同一实例及其连接池
+        provider_config = self._get_provider_config(provider_type, **kwargs)
+        provider_key = (provider_type, astuple(provider_config))
         
         if provider_key not in self._providers:
             self._providers[provider_key] = self.create_provider(provider_type, **kwargs)
@@ -106,6 +123,35 @@ class ProviderFactory:
         self.logger.info(f"成功创建 {len(providers)} 个提供商实例")
         return providers
     
+    async def create_multiple_providers_async(self, provider_types: List[ProviderType], **kwargs) -> List[BaseLLMProvider]:
+        """创建多个提供商实例并并发预热连接
+        
+        实例创建本身不涉及I/O；各提供商的TCP/TLS握手并发进行，首个真实请求不再承担握手延迟。
+        预热的是工厂缓存中的实例，之后get_or_create_provider返回的正是已建立连接的实例
+        
+        Args:
+            provider_types: 提供商类型列表
+            **kwargs: 额外配置参数
+        
+        Returns:
+            提供商实例列表
+        """
+        providers = []
+        
+        for provider_type in provider_types:
+            try:
+                providers.append(self.get_or_create_provider(provider_type, **kwargs))
+            except Exception as e:
+                self.logger.warning(f"创建 {provider_type} 提供商失败，跳过: {e}")
+        
+        if not providers:
+            raise Exception("所有提供商创建都失败了")
+        
+        warmed = await asyncio.gather(*(provider.warmup() for provider in providers))
+        self.logger.info(f"{sum(warmed)}/{len(providers)} 个提供商连接预热完成")
+        
+        return providers
+    
     def _get_provider_config(self, provider_type: ProviderType, **kwargs) -> LLMConfig:
         """获取提供商配置
         
@@ -144,13 +190,24 @@ class ProviderFactory:
                 temperature=config_dict.get('temperature', 0.7),
                 timeout=config_dict.get('timeout', 30),
                 retry_attempts=config_dict.get('retry_attempts', 3),
-                retry_delay=config_dict.get('retry_delay', 1)
+                retry_delay=config_dict.get('retry_delay', 1),
+                max_connections=config_dict.get('max_connections', 100),
+                max_keepalive_connections=config_dict.get('max_keepalive_connections'),
+                connect_timeout=config_dict.get('connect_timeout', 10)
             )
             
         except Exception as e:
             self.logger.error(f"获取 {provider_type} 配置失败: {e}")
             raise ValueError(f"获取 {provider_type} 配置失败: {str(e)}")
     
+    def get_supported_providers(self) -> List[str]:
+        """获取已定义的提供商列表（含预留类型）
+        
+        Returns:
+            提供商名称列表
+        """
+        return list(self._SUPPORTED_PROVIDERS)
+    
     def get_available_providers(self) -> List[str]:
         """获取可用的提供商列表
         
@@ -170,11 +227,13 @@ class ProviderFactory:
         
         return available
     
-    async def validate_providers(self, provider_types: Optional[List[ProviderType]] = None) -> Dict[str, bool]:
-        """验证提供商连接状态
+    async def validate_providers(self, provider_types: Optional[List[ProviderType]] = None,
+                                 max_concurrency: Optional[int] = None) -> Dict[str, bool]:
+        """并发验证提供商连接状态
         
         Args:
             provider_types: 要验证的提供商类型列表，None表示验证所有可用提供商
+            max_concurrency: 最大并发验证数，None表示使用配置中的max_concurrent_requests
         
         Returns:
             提供商名称到验证结果的映射
@@ -182,21 +241,31 @@ class ProviderFactory:
         if provider_types is None:
             provider_types = [ProviderType(name) for name in self.get_available_providers()]
         
+        if max_concurrency is None:
+            max_concurrency = self._config.get('performance', {}).get('max_concurrent_requests', 10)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def validate(provider_type: ProviderType) -> bool:
+            async with semaphore:
+                provider = self.get_or_create_provider(provider_type)
+                return await provider.validate_connection()
+        
+        outcomes = await asyncio.gather(
+            *(validate(provider_type) for provider_type in provider_types),
+            return_exceptions=True
+        )
+        
         results = {}
         
-        for provider_type in provider_types:
-            try:
-                provider = self.create_provider(provider_type)
-                is_valid = await provider.validate_connection()
-                results[provider_type.value] = is_valid
-                
-                if is_valid:
-                    self.logger.info(f"{provider_type} 提供商验证成功")
-                else:
-                    self.logger.warning(f"{provider_type} 提供商验证失败")
-                    
-            except Exception as e:
-                self.logger.error(f"{provider_type} 提供商验证异常: {e}")
+        for provider_type, outcome in zip(provider_types, outcomes):
+            if isinstance(outcome, BaseException):
+                self.logger.error(f"{provider_type} 提供商验证异常: {outcome}")
+                results[provider_type.value] = False
+            elif outcome:
+                self.logger.info(f"{provider_type} 提供商验证成功")
+                results[provider_type.value] = True
+            else:
+                self.logger.warning(f"{provider_type} 提供商验证失败")
                 results[provider_type.value] = False
         
         return results
@@ -211,15 +280,23 @@ class ProviderFactory:
             提供商信息
         """
         try:
-            provider = self.create_provider(provider_type)
+            provider = self.get_or_create_provider(provider_type)
             return provider.get_model_info()
         except Exception as e:
             self.logger.error(f"获取 {provider_type} 提供商信息失败: {e}")
             return {"error": str(e)}
     
-    def clear_cache(self):
-        """清除缓存的提供商实例"""
+    async def clear_cache(self):
+        """清除缓存的提供商实例，并关闭其HTTP会话"""
+        providers = list(self._providers.values())
         self._providers.clear()
+        
+        for provider in providers:
+            try:
+                await provider.close()
+            except Exception as e:
+                self.logger.warning(f"关闭 {provider.name} 提供商会话失败: {e}")
+        
         self.logger.info("提供商缓存已清除")
     
     def __len__(self) -> int:
@@ -6,17 +6,21 @@ import asyncio
 import ssl
 from typing import Dict, Any, Optional
 from .base import BaseLLMProvider, LLMConfig
+from core.cache import LLMCache
 
 class GeminiProvider(BaseLLMProvider):
     """Gemini LLM提供商"""
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[LLMCache] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
         """初始化Gemini提供商
         
         Args:
             config: LLM配置
+            cache: 响应缓存
+            session: 外部HTTP会话
         """
-        super().__init__(config)
+        super().__init__(config, cache, session)
         self.headers = {
             "Content-Type": "application/json",
             "Accept": "application/json"
@@ -29,6 +33,13 @@ class GeminiProvider(BaseLLMProvider):
         # Gemini使用HTTP API，不需要特殊的客户端初始化
         self.logger.info("Gemini HTTP客户端初始化完成")
     
+    def _get_ssl_context(self) -> ssl.SSLContext:
+        """创建SSL上下文，跳过证书验证（开发环境）"""
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return ssl_context
+    
     async def _generate_content(self, prompt: str, **kwargs) -> str:
         """使用Gemini API生成内容
         
@@ -81,42 +92,34 @@ class GeminiProvider(BaseLLMProvider):
             ]
         }
         
-        # 发送API请求
-        timeout = aiohttp.ClientTimeout(total=self.config.timeout)
-        
-        # 创建SSL上下文，跳过证书验证（开发环境）
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-            try:
-                self.logger.debug(f"发送Gemini API请求: {self.config.api_url}")
+        # 发送API请求（复用会话连接池）
+        session = await self._get_session()
+        try:
+            self.logger.debug(f"发送Gemini API请求: {self.config.api_url}")
+            
+            async with session.post(
+                self.api_url_with_key,
+                headers=self.headers,
+                json=request_data
+            ) as response:
+                
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"Gemini API请求失败 (状态码: {response.status}): {error_text}")
+                
+                response_data = await response.json()
                 
-                async with session.post(
-                    self.api_url_with_key,
-                    headers=self.headers,
-                    json=request_data
-                ) as response:
-                    
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"Gemini API请求失败 (状态码: {response.status}): {error_text}")
-                    
-                    response_data = await response.json()
-                    
-                    # 解析响应
-                    return self._parse_response(response_data)
-                    
-            except aiohttp.ClientError as e:
-                raise Exception(f"Gemini API网络请求失败: {str(e)}")
-            except json.JSONDecodeError as e:
-                raise Exception(f"Gemini API响应解析失败: {str(e)}")
-            except Exception as e:
-                if "Gemini API" in str(e):
-                    raise
-                raise Exception(f"Gemini API调用异常: {str(e)}")
+                # 解析响应
+                return self._parse_response(response_data)
+                
+        except aiohttp.ClientError as e:
+            raise Exception(f"Gemini API网络请求失败: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise Exception(f"Gemini API响应解析失败: {str(e)}")
+        except Exception as e:
+            if "Gemini API" in str(e):
+                raise
+            raise Exception(f"Gemini API调用异常: {str(e)}")
     
     def _parse_response(self, response_data: Dict[str, Any]) -> str:
         """解析Gemini API响应
@@ -235,13 +238,13 @@ class GeminiProvider(BaseLLMProvider):
             self.logger.error(f"Gemini API连接验证失败: {e}")
             return False
     
-    def get_model_info(self) -> Dict[str, Any]:
-        """获取Gemini模型信息
+    def _build_model_info(self) -> Dict[str, Any]:
+        """构建Gemini模型信息
         
         Returns:
             模型信息
         """
-        base_info = super().get_model_info()
+        base_info = super()._build_model_info()
         base_info.update({
             "provider": "Google Gemini",
             "api_version": "v1",
@@ -3,19 +3,28 @@
 import json
 import aiohttp
 import asyncio
+import re
+import ssl
 from typing import Dict, Any, Optional
 from .base import BaseLLMProvider, LLMConfig
+from core.cache import LLMCache
+
+# 含中文字符的注释行
+_CHINESE_COMMENT_PATTERN = re.compile(r'^[^\S\n]*#.*[\u4e00-\u9fff]', re.MULTILINE)
 
 class QwenProvider(BaseLLMProvider):
     """千问LLM提供商"""
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, cache: Optional[LLMCache] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
         """初始化千问提供商
         
         Args:
             config: LLM配置
+            cache: 响应缓存
+            session: 外部HTTP会话
         """
-        super().__init__(config)
+        super().__init__(config, cache, session)
         self.headers = {
             "Authorization": f"Bearer {self.config.api_key}",
             "Content-Type": "application/json",
@@ -27,6 +36,13 @@ class QwenProvider(BaseLLMProvider):
         # 千问使用HTTP API，不需要特殊的客户端初始化
         self.logger.info("千问HTTP客户端初始化完成")
     
+    def _get_ssl_context(self) -> ssl.SSLContext:
+        """创建SSL上下文，跳过证书验证（用于测试）"""
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return ssl_context
+    
     async def _generate_content(self, prompt: str, **kwargs) -> str:
         """使用千问API生成内容
         
@@ -63,43 +79,34 @@ class QwenProvider(BaseLLMProvider):
             }
         }
         
-        # 发送API请求
-        timeout = aiohttp.ClientTimeout(total=self.config.timeout)
-        
-        # 创建SSL上下文，跳过证书验证（用于测试）
-        import ssl
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-            try:
-                self.logger.debug(f"发送千问API请求: {self.config.api_url}")
+        # 发送API请求（复用会话连接池）
+        session = await self._get_session()
+        try:
+            self.logger.debug(f"发送千问API请求: {self.config.api_url}")
+            
+            async with session.post(
+                self.config.api_url,
+                headers=self.headers,
+                json=request_data
+            ) as response:
+                
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"千问API请求失败 (状态码: {response.status}): {error_text}")
+                
+                response_data = await response.json()
                 
-                async with session.post(
-                    self.config.api_url,
-                    headers=self.headers,
-                    json=request_data
-                ) as response:
-                    
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"千问API请求失败 (状态码: {response.status}): {error_text}")
-                    
-                    response_data = await response.json()
-                    
-                    # 解析响应
-                    return self._parse_response(response_data)
-                    
-            except aiohttp.ClientError as e:
-                raise Exception(f"千问API网络请求失败: {str(e)}")
-            except json.JSONDecodeError as e:
-                raise Exception(f"千问API响应解析失败: {str(e)}")
-            except Exception as e:
-                if "千问API" in str(e):
-                    raise
-                raise Exception(f"千问API调用异常: {str(e)}")
+                # 解析响应
+                return self._parse_response(response_data)
+                
+        except aiohttp.ClientError as e:
+            raise Exception(f"千问API网络请求失败: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise Exception(f"千问API响应解析失败: {str(e)}")
+        except Exception as e:
+            if "千问API" in str(e):
+                raise
+            raise Exception(f"千问API调用异常: {str(e)}")
     
     def _parse_response(self, response_data: Dict[str, Any]) -> str:
         """解析千问API响应
@@ -186,13 +193,13 @@ class QwenProvider(BaseLLMProvider):
             self.logger.error(f"千问API连接验证失败: {e}")
             return False
     
-    def get_model_info(self) -> Dict[str, Any]:
-        """获取千问模型信息
+    def _build_model_info(self) -> Dict[str, Any]:
+        """构建千问模型信息
         
         Returns:
             模型信息
         """
-        base_info = super().get_model_info()
+        base_info = super()._build_model_info()
         base_info.update({
             "provider": "阿里云千问",
             "api_version": "v1",
@@ -226,9 +233,7 @@ class QwenProvider(BaseLLMProvider):
         adjustments = 0.0
         
         # 检查中文注释质量
-        chinese_comments = len([line for line in code.split('\n') 
-                              if line.strip().startswith('#') and any('\u4e00' <= char <= '\u9fff' for char in line)])
-        if chinese_comments > 0:
+        if _CHINESE_COMMENT_PATTERN.search(code):
             adjustments += 0.05
         
         # 检查代码结构完整性
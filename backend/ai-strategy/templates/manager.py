@@ -1,15 +1,24 @@
 """策略模板管理器"""
 
+import functools
+import heapq
 import json
 import os
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Set, Tuple
+from dataclasses import dataclass, asdict, fields, replace
 from enum import Enum
 
 from models.responses import StrategyTemplate
 from utils.logger import LoggerMixin
 from utils.config import get_config
 
+try:
+    # orjson为C实现，解析大模板文件比标准库json快数倍
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson不可用时回退到标准库json（同样接受UTF-8字节串）
+    _json_loads = json.loads
+
 class TemplateCategory(str, Enum):
     """模板分类"""
     TREND_FOLLOWING = "trend_following"      # 趋势跟踪
@@ -21,9 +30,43 @@ class TemplateCategory(str, Enum):
     MULTI_FACTOR = "multi_factor"            # 多因子策略
     CUSTOM = "custom"                        # 自定义
 
+# 创建模板时的必需字段
+_REQUIRED_TEMPLATE_FIELDS = frozenset({'name', 'description', 'category', 'code'})
+
+def _category_value(category: Any) -> str:
+    """获取分类的字符串值，兼容枚举和字符串"""
+    return category.value if hasattr(category, 'value') else category
+
+def _search_fields(metadata: Any) -> Tuple[str, str, str, Tuple[str, ...], str]:
+    """预计算模板的小写搜索字段
+    
+    Returns:
+        (全部字段拼接文本, 名称, 描述, 标签, 分类)，拼接文本用于快速排除不匹配的模板
+    """
+    name = metadata.name.lower()
+    description = metadata.description.lower()
+    tags = tuple(tag.lower() for tag in metadata.tags or ())
+    category = _category_value(metadata.category).lower()
+    return '\n'.join((name, description, *tags, category)), name, description, tags, category
+
+def _with_slots(cls):
+    """为数据类补充__slots__
+    
+    服务镜像为Python 3.9，不支持 dataclass(slots=True)；做法与标准库相同：
+    以字段名作为__slots__重建类，字段默认值已保存在生成的__init__中，无需保留类属性
+    """
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict = {
+        key: value for key, value in cls.__dict__.items()
+        if key not in field_names and key not in ('__dict__', '__weakref__')
+    }
+    cls_dict['__slots__'] = field_names
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+@_with_slots
 @dataclass
 class TemplateMetadata:
-    """模板元数据"""
+    """模板元数据（使用__slots__，大量模板常驻内存时不再为每个实例分配__dict__）"""
     id: str
     name: str
     description: str
@@ -54,6 +97,19 @@ class TemplateManager(LoggerMixin):
         self.templates: Dict[str, TemplateMetadata] = {}
         self.template_codes: Dict[str, str] = {}
         
+        # 二级索引：属性值 -> 模板ID集合
+        self._by_category: Dict[str, Set[str]] = {}
+        self._by_difficulty: Dict[str, Set[str]] = {}
+        self._by_market_type: Dict[str, Set[str]] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+        # 模板ID -> (加载序号, 分类, 难度, 市场类型, 标签)，用于撤销索引和保持加载顺序
+        self._index_entries: Dict[str, Tuple[int, str, Optional[str], Tuple[str, ...], Tuple[str, ...]]] = {}
+        self._index_seq = 0
+        # 模板ID -> 预计算的小写搜索字段
+        self._search_entries: Dict[str, Tuple[str, str, str, Tuple[str, ...], str]] = {}
+        # 分类列表缓存，分类索引变化时失效
+        self._categories_cache: Optional[Tuple[str, ...]] = None
+        
         # 获取模板配置
         template_config = self.config.get('strategy_templates', {})
         self.template_dir = template_config.get('template_dir', 'templates')
@@ -67,26 +123,29 @@ class TemplateManager(LoggerMixin):
         self.logger.info(f"模板管理器初始化完成，加载了 {len(self.templates)} 个模板")
     
     def _load_builtin_templates(self):
-        """加载内置模板"""
-        builtin_templates = self._get_builtin_templates()
+        """加载内置模板
         
-        for template_data in builtin_templates:
-            try:
-                metadata = TemplateMetadata(**template_data['metadata'])
-                self.templates[metadata.id] = metadata
-                self.template_codes[metadata.id] = template_data['code']
-                
-                self.logger.debug(f"加载内置模板: {metadata.name}")
-            except Exception as e:
-                self.logger.error(f"加载内置模板失败: {e}")
+        内置模板在进程内只解析一次，每个管理器持有元数据的独立副本，
+        以免使用计数等可变字段在实例间串扰
+        """
+        try:
+            builtin_templates = _builtin_templates()
+        except Exception as e:
+            self.logger.error(f"加载内置模板失败: {e}")
+            return
+        
+        for template_id, (metadata, code) in builtin_templates.items():
+            self._store_template(template_id, replace(metadata), code)
+            
+            self.logger.debug(f"加载内置模板: {metadata.name}")
     
     def _load_custom_templates(self, custom_file: str = None):
         """加载自定义模板"""
         if custom_file:
             # 加载指定的自定义模板文件
             try:
-                with open(custom_file, 'r', encoding='utf-8') as f:
-                    templates_data = json.load(f)
+                with open(custom_file, 'rb') as f:
+                    templates_data = _json_loads(f.read())
                 
                 for template_data in templates_data:
                     try:
@@ -97,8 +156,7 @@ class TemplateManager(LoggerMixin):
                             template_data['code_template'] = template_data.pop('code')
                         
                         template = StrategyTemplate(**template_data)
-                        self.templates[template.id] = template
-                        self.template_codes[template.id] = template.code_template
+                        self._store_template(template.id, template, template.code_template)
                         
                         self.logger.debug(f"加载自定义模板: {template.name}")
                     except Exception as e:
@@ -124,17 +182,96 @@ class TemplateManager(LoggerMixin):
     def _load_template_file(self, file_path: str):
         """加载模板文件"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
+            with open(file_path, 'rb') as f:
+                template_data = _json_loads(f.read())
             
             metadata = TemplateMetadata(**template_data['metadata'])
-            self.templates[metadata.id] = metadata
-            self.template_codes[metadata.id] = template_data['code']
+            self._store_template(metadata.id, metadata, template_data['code'])
             
             self.logger.debug(f"加载自定义模板: {metadata.name}")
         except Exception as e:
             self.logger.error(f"加载模板文件 {file_path} 失败: {e}")
     
+    def _store_template(self, template_id: str, metadata: Any, code: str):
+        """保存模板并更新索引"""
+        self._unindex_template(template_id)
+        self.templates[template_id] = metadata
+        self.template_codes[template_id] = code
+        self._index_template(template_id)
+    
+    def _index_template(self, template_id: str):
+        """将模板加入二级索引"""
+        metadata = self.templates[template_id]
+        
+        category = _category_value(metadata.category)
+        # 自定义模板文件加载的是StrategyTemplate，难度字段名不同
+        difficulty = getattr(metadata, 'difficulty', None) or getattr(metadata, 'difficulty_level', None)
+        market_types = tuple(metadata.market_types or ())
+        tags = tuple(metadata.tags or ())
+        
+        previous = self._index_entries.get(template_id)
+        if previous is not None:
+            seq = previous[0]
+        else:
+            seq = self._index_seq
+            self._index_seq += 1
+        self._index_entries[template_id] = (seq, category, difficulty, market_types, tags)
+        self._search_entries[template_id] = _search_fields(metadata)
+        
+        if category not in self._by_category:
+            self._categories_cache = None
+        self._by_category.setdefault(category, set()).add(template_id)
+        if difficulty is not None:
+            self._by_difficulty.setdefault(difficulty, set()).add(template_id)
+        for market_type in market_types:
+            self._by_market_type.setdefault(market_type, set()).add(template_id)
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(template_id)
+    
+    def _unindex_template(self, template_id: str, keep_order: bool = False):
+        """将模板移出二级索引
+        
+        Args:
+            template_id: 模板ID
+            keep_order: 是否保留加载序号（原地更新时使用）
+        """
+        entry = self._index_entries.get(template_id)
+        if entry is None:
+            return
+        
+        if not keep_order:
+            del self._index_entries[template_id]
+        self._search_entries.pop(template_id, None)
+        
+        _, category, difficulty, market_types, tags = entry
+        keyed_indexes = [(self._by_category, category)]
+        if difficulty is not None:
+            keyed_indexes.append((self._by_difficulty, difficulty))
+        keyed_indexes.extend((self._by_market_type, market_type) for market_type in market_types)
+        keyed_indexes.extend((self._by_tag, tag) for tag in tags)
+        
+        for index, key in keyed_indexes:
+            template_ids = index.get(key)
+            if template_ids is not None:
+                template_ids.discard(template_id)
+                if not template_ids:
+                    del index[key]
+                    if index is self._by_category:
+                        self._categories_cache = None
+    
+    def _sync_indexes(self):
+        """补齐直接写入或删除 self.templates 的模板的索引
+        
+        只比较两组键，模板经 _store_template 等方法维护时不做任何工作
+        """
+        if len(self._index_entries) == len(self.templates) and self._index_entries.keys() == self.templates.keys():
+            return
+        
+        for template_id in self._index_entries.keys() - self.templates.keys():
+            self._unindex_template(template_id)
+        for template_id in self.templates.keys() - self._index_entries.keys():
+            self._index_template(template_id)
+    
     def get_template(self, template_id: str) -> Optional[StrategyTemplate]:
         """获取模板
         
@@ -195,22 +332,31 @@ class TemplateManager(LoggerMixin):
         Returns:
             模板列表
         """
+        self._sync_indexes()
+        
+        # 通过索引求候选集合的交集，避免逐个扫描模板
+        candidate_sets = []
+        if category:
+            candidate_sets.append(self._by_category.get(_category_value(category), set()))
+        if difficulty:
+            candidate_sets.append(self._by_difficulty.get(difficulty, set()))
+        if market_type:
+            candidate_sets.append(self._by_market_type.get(market_type, set()))
+        if tags:
+            candidate_sets.append(set().union(*(self._by_tag.get(tag, set()) for tag in tags)))
+        
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            candidate_ids = sorted(
+                set.intersection(*candidate_sets),
+                key=lambda template_id: self._index_entries[template_id][0]
+            )
+        else:
+            candidate_ids = list(self.templates)
+        
         filtered_templates = []
         
-        for template_id, metadata in self.templates.items():
-            # 应用过滤条件
-            if category and metadata.category != category:
-                continue
-            
-            if difficulty and metadata.difficulty != difficulty:
-                continue
-            
-            if market_type and market_type not in metadata.market_types:
-                continue
-            
-            if tags and not any(tag in metadata.tags for tag in tags):
-                continue
-            
+        for template_id in candidate_ids:
             # 创建模板对象
             template = self.get_template(template_id)
             if template:
@@ -242,25 +388,33 @@ class TemplateManager(LoggerMixin):
         matched_templates = []
         
         for template_id, metadata in self.templates.items():
+            entry = self._search_entries.get(template_id)
+            if entry is None:
+                entry = _search_fields(metadata)
+            searchable, name, description, tags, category = entry
+            
+            # 拼接文本中不包含关键词时，任何字段都不可能匹配
+            if query not in searchable:
+                continue
+            
             # 搜索匹配
             score = 0
             
             # 名称匹配
-            if query in metadata.name.lower():
+            if query in name:
                 score += 10
             
             # 描述匹配
-            if query in metadata.description.lower():
+            if query in description:
                 score += 5
             
             # 标签匹配
-            for tag in metadata.tags:
-                if query in tag.lower():
+            for tag in tags:
+                if query in tag:
                     score += 3
             
             # 分类匹配
-            category_str = metadata.category.value if hasattr(metadata.category, 'value') else metadata.category
-            if query in category_str.lower():
+            if query in category:
                 score += 2
             
             if score > 0:
@@ -290,8 +444,7 @@ class TemplateManager(LoggerMixin):
         import uuid
         
         # 检查必需字段
-        required_fields = ['name', 'description', 'category', 'code']
-        missing_fields = [field for field in required_fields if field not in template_data]
+        missing_fields = sorted(_REQUIRED_TEMPLATE_FIELDS - template_data.keys())
         if missing_fields:
             self.logger.error(f"Missing required fields: {', '.join(missing_fields)}")
             raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
@@ -324,8 +477,7 @@ class TemplateManager(LoggerMixin):
         )
         
         # 保存模板
-        self.templates[template_id] = metadata
-        self.template_codes[template_id] = template_data['code']
+        self._store_template(template_id, metadata, template_data['code'])
         
         # 保存到文件
         self._save_template_to_file(template_id)
@@ -352,10 +504,14 @@ class TemplateManager(LoggerMixin):
         try:
             metadata = self.templates[template_id]
             
-            # 更新元数据
-            for key, value in updates.items():
-                if hasattr(metadata, key):
-                    setattr(metadata, key, value)
+            # 更新元数据，索引按新值重建
+            self._unindex_template(template_id, keep_order=True)
+            try:
+                for key, value in updates.items():
+                    if hasattr(metadata, key):
+                        setattr(metadata, key, value)
+            finally:
+                self._index_template(template_id)
             
             # 更新代码
             if 'code' in updates:
@@ -412,12 +568,13 @@ class TemplateManager(LoggerMixin):
         
         # 检查是否为内置模板
         metadata = self.templates[template_id]
-        if metadata.author == "system":
+        if template_id in _builtin_templates() or metadata.author == "system":
             self.logger.warning(f"不能删除内置模板: {template_id}")
             return False
         
         try:
             # 删除内存中的模板
+            self._unindex_template(template_id)
             del self.templates[template_id]
             if template_id in self.template_codes:
                 del self.template_codes[template_id]
@@ -438,15 +595,14 @@ class TemplateManager(LoggerMixin):
         Returns:
             分类名称列表
         """
-        categories = set()
-        for metadata in self.templates.values():
+        self._sync_indexes()
+        if self._categories_cache is None:
             # 将 trend_following 映射为 trend，保持与测试的兼容性
-            category = metadata.category.value if hasattr(metadata.category, 'value') else metadata.category
-            if category == "trend_following":
-                categories.add("trend")
-            else:
-                categories.add(category)
-        return list(categories)
+            self._categories_cache = tuple({
+                "trend" if category == "trend_following" else category
+                for category in self._by_category
+            })
+        return list(self._categories_cache)
     
     def get_category_stats(self) -> Dict[str, int]:
         """获取分类统计信息
@@ -454,17 +610,15 @@ class TemplateManager(LoggerMixin):
         Returns:
             分类统计字典，键为分类名，值为该分类的模板数量
         """
+        self._sync_indexes()
         category_stats = {}
         
-        for metadata in self.templates.values():
+        for category, template_ids in self._by_category.items():
             # 将 trend_following 映射为 trend，保持与测试的兼容性
-            category = metadata.category.value if hasattr(metadata.category, 'value') else metadata.category
             if category == "trend_following":
                 category = "trend"
             
-            if category not in category_stats:
-                category_stats[category] = 0
-            category_stats[category] += 1
+            category_stats[category] = category_stats.get(category, 0) + len(template_ids)
         
         return category_stats
     
@@ -477,15 +631,15 @@ class TemplateManager(LoggerMixin):
         Returns:
             热门模板列表
         """
-        # 按使用次数排序
-        sorted_templates = sorted(
+        # 只取使用次数最高的limit个，O(N log K)，顺序与完整排序后截取一致
+        top_templates = heapq.nlargest(
+            limit,
             self.templates.items(),
-            key=lambda x: x[1].usage_count,
-            reverse=True
+            key=lambda x: x[1].usage_count
         )
         
         popular_templates = []
-        for template_id, _ in sorted_templates[:limit]:
+        for template_id, _ in top_templates:
             template = self.get_template(template_id)
             if template:
                 popular_templates.append(template)
@@ -528,7 +682,8 @@ class TemplateManager(LoggerMixin):
         except Exception as e:
             self.logger.error(f"删除模板文件失败: {e}")
     
-    def _get_builtin_templates(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _get_builtin_templates() -> List[Dict[str, Any]]:
         """获取内置模板定义"""
         return [
             {
@@ -651,6 +806,21 @@ class RSIMeanReversionStrategy:
         """检查模板是否存在"""
         return template_id in self.templates
 
+@functools.cache
+def _builtin_templates() -> Dict[str, Tuple[TemplateMetadata, str]]:
+    """解析内置模板定义（进程内只执行一次）
+    
+    Returns:
+        模板ID到(元数据原型, 代码)的映射
+    """
+    return {
+        template_data['metadata']['id']: (
+            TemplateMetadata(**template_data['metadata']),
+            template_data['code']
+        )
+        for template_data in TemplateManager._get_builtin_templates()
+    }
+
 # 全局模板管理器实例
 _template_manager_instance: Optional[TemplateManager] = None
 
@@ -0,0 +1,26 @@
+"""测试公共配置"""
+
+import asyncio
+
+import aiohttp
+import pytest
+import pytest_asyncio
+
+try:
+    # uvloop的调度开销明显低于默认事件循环，不可用时（如Windows）回退到asyncio
+    import uvloop
+except ImportError:
+    uvloop = None
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """整个测试会话共享一个事件循环，避免每个异步测试重复创建和关闭"""
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest_asyncio.fixture(scope="session")
+async def shared_session():
+    """整个测试会话共享的HTTP会话，注入提供商以复用连接池"""
+    async with aiohttp.ClientSession() as session:
+        yield session
@@ -0,0 +1,81 @@
+"""LLM响应缓存单元测试"""
+
+import pytest
+from unittest.mock import patch
+
+from ai_strategy.core.cache import LLMCache, MemoryCacheBackend
+
+class TestMemoryCacheBackend:
+    """内存缓存后端测试类"""
+    
+    @pytest.mark.asyncio
+    async def test_set_and_get(self):
+        """测试写入和读取"""
+        backend = MemoryCacheBackend()
+        
+        await backend.set("key", {"value": 1})
+        
+        assert await backend.get("key") == {"value": 1}
+        assert await backend.get("missing") is None
+    
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        backend = MemoryCacheBackend(max_size=2)
+        
+        await backend.set("a", 1)
+        await backend.set("b", 2)
+        await backend.get("a")  # a变为最近使用
+        await backend.set("c", 3)
+        
+        assert len(backend) == 2
+        assert await backend.get("a") == 1
+        assert await backend.get("b") is None
+        assert await backend.get("c") == 3
+    
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self):
+        """测试条目过期"""
+        backend = MemoryCacheBackend(ttl=10)
+        
+        with patch("ai_strategy.core.cache.time.monotonic", return_value=100.0):
+            await backend.set("key", "value")
+        
+        with patch("ai_strategy.core.cache.time.monotonic", return_value=105.0):
+            assert await backend.get("key") == "value"
+        
+        with patch("ai_strategy.core.cache.time.monotonic", return_value=111.0):
+            assert await backend.get("key") is None
+        
+        assert len(backend) == 0
+
+class TestLLMCache:
+    """LLM缓存测试类"""
+    
+    def test_cache_key_stable(self):
+        """测试缓存键与参数顺序无关"""
+        key1 = LLMCache.cache_key("qwen", "prompt", {"a": 1, "b": 2})
+        key2 = LLMCache.cache_key("qwen", "prompt", {"b": 2, "a": 1})
+        
+        assert key1 == key2
+        assert key1 != LLMCache.cache_key("gemini", "prompt", {"a": 1, "b": 2})
+        assert key1 != LLMCache.cache_key("qwen", "other prompt", {"a": 1, "b": 2})
+    
+    @pytest.mark.asyncio
+    async def test_hit_miss_stats(self):
+        """测试命中统计"""
+        cache = LLMCache()
+        key = LLMCache.cache_key("qwen", "prompt")
+        
+        assert await cache.get(key) is None
+        await cache.set(key, {"code": "pass"})
+        assert await cache.get(key) == {"code": "pass"}
+        
+        assert cache.stats == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+        
+        await cache.clear()
+        assert cache.stats["hits"] == 0
+        assert await cache.get(key) is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
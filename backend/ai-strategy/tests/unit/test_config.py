@@ -1,16 +1,52 @@
 """配置管理器单元测试"""
 
 import pytest
-import tempfile
 import os
 from unittest.mock import patch, mock_open
 
 from ai_strategy.utils.config import ConfigManager, get_config
 
+@pytest.fixture(scope="module")
+def app_config():
+    """由内存字典构建的共享配置，无需解析YAML"""
+    return ConfigManager.from_dict({
+        "app": {
+            "database": {
+                "host": "localhost",
+                "port": 5432,
+                "credentials": {
+                    "username": "user",
+                    "password": "pass"
+                }
+            }
+        },
+        "llm_providers": {
+            "qwen": {
+                "enabled": True,
+                "api_key": "qwen_key",
+                "base_url": "https://api.qwen.com",
+                "model": "qwen-max",
+                "max_tokens": 2000,
+                "temperature": 0.7
+            },
+            "gemini": {
+                "enabled": False,
+                "api_key": "gemini_key",
+                "model": "gemini-pro"
+            }
+        }
+    })
+
+def _write_config(tmp_path, content):
+    """将配置内容写入临时目录下的配置文件"""
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(content, encoding="utf-8")
+    return config_file
+
 class TestConfigManager:
     """配置管理器测试类"""
     
-    def test_load_config_success(self):
+    def test_load_config_success(self, tmp_path):
         """测试成功加载配置"""
         config_content = """
 app:
@@ -25,57 +61,38 @@ llm_providers:
     model: "qwen-max"
 """
         
-        with patch("builtins.open", mock_open(read_data=config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                assert config_manager.get("app.host") == "0.0.0.0"
-                assert config_manager.get("app.port") == 8001
-                assert config_manager.get("app.debug") is True
-                assert config_manager.get("llm_providers.qwen.enabled") is True
+        config_manager = ConfigManager(str(_write_config(tmp_path, config_content)))
+        
+        assert config_manager.get("app.host") == "0.0.0.0"
+        assert config_manager.get("app.port") == 8001
+        assert config_manager.get("app.debug") is True
+        assert config_manager.get("llm_providers.qwen.enabled") is True
     
-    def test_load_config_file_not_found(self):
+    def test_load_config_file_not_found(self, tmp_path):
         """测试配置文件不存在"""
-        with patch("os.path.exists", return_value=False):
-            with pytest.raises(FileNotFoundError):
-                ConfigManager("nonexistent.yaml")
+        with pytest.raises(FileNotFoundError):
+            ConfigManager(str(tmp_path / "nonexistent.yaml"))
     
-    def test_get_nested_key(self):
+    def test_get_nested_key(self, app_config):
         """测试获取嵌套键值"""
-        config_content = """
-app:
-  database:
-    host: "localhost"
-    port: 5432
-    credentials:
-      username: "user"
-      password: "pass"
-"""
-        
-        with patch("builtins.open", mock_open(read_data=config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                assert config_manager.get("app.database.host") == "localhost"
-                assert config_manager.get("app.database.port") == 5432
-                assert config_manager.get("app.database.credentials.username") == "user"
+        assert app_config.get("app.database.host") == "localhost"
+        assert app_config.get("app.database.port") == 5432
+        assert app_config.get("app.database.credentials.username") == "user"
     
-    def test_get_with_default(self):
+    def test_get_with_default(self, tmp_path):
         """测试使用默认值获取配置"""
         config_content = "app:\n  host: '0.0.0.0'"
         
-        with patch("builtins.open", mock_open(read_data=config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                # 存在的键
-                assert config_manager.get("app.host", "default") == "0.0.0.0"
-                
-                # 不存在的键，返回默认值
-                assert config_manager.get("app.port", 8080) == 8080
-                assert config_manager.get("nonexistent.key", "default") == "default"
+        config_manager = ConfigManager(str(_write_config(tmp_path, config_content)))
+        
+        # 存在的键
+        assert config_manager.get("app.host", "default") == "0.0.0.0"
+        
+        # 不存在的键，返回默认值
+        assert config_manager.get("app.port", 8080) == 8080
+        assert config_manager.get("nonexistent.key", "default") == "default"
     
-    def test_environment_variable_substitution(self):
+    def test_environment_variable_substitution(self, tmp_path):
         """测试环境变量替换"""
         config_content = """
 app:
@@ -88,56 +105,53 @@ llm_providers:
     api_key: "${QWEN_API_KEY}"
 """
         
-        with patch("builtins.open", mock_open(read_data=config_content)):
-            with patch("os.path.exists", return_value=True):
-                with patch.dict(os.environ, {
-                    "HOST": "127.0.0.1",
-                    "PORT": "9000",
-                    "QWEN_API_KEY": "real_api_key"
-                }):
-                    config_manager = ConfigManager("test_config.yaml")
-                    
-                    assert config_manager.get("app.host") == "127.0.0.1"
-                    assert config_manager.get("app.port") == "9000"
-                    assert config_manager.get("app.debug") == "false"  # 使用默认值
-                    assert config_manager.get("llm_providers.qwen.api_key") == "real_api_key"
+        with patch.dict(os.environ, {
+            "HOST": "127.0.0.1",
+            "PORT": "9000",
+            "QWEN_API_KEY": "real_api_key"
+        }):
+            config_manager = ConfigManager(str(_write_config(tmp_path, config_content)))
+            
+            assert config_manager.get("app.host") == "127.0.0.1"
+            assert config_manager.get("app.port") == "9000"
+            assert config_manager.get("app.debug") == "false"  # 使用默认值
+            assert config_manager.get("llm_providers.qwen.api_key") == "real_api_key"
     
-    def test_get_llm_provider_config(self):
-        """测试获取LLM提供商配置"""
+    def test_environment_variables_resolved_on_load(self, tmp_path):
+        """测试环境变量在加载时一次性替换"""
         config_content = """
-llm_providers:
-  qwen:
-    enabled: true
-    api_key: "qwen_key"
-    base_url: "https://api.qwen.com"
-    model: "qwen-max"
-    max_tokens: 2000
-    temperature: 0.7
-  
-  gemini:
-    enabled: false
-    api_key: "gemini_key"
-    model: "gemini-pro"
+app:
+  host: "${HOST:0.0.0.0}"
+  secret: "${UNSET_SECRET}"
 """
         
-        with patch("builtins.open", mock_open(read_data=config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                qwen_config = config_manager.get_llm_provider_config("qwen")
-                assert qwen_config["enabled"] is True
-                assert qwen_config["api_key"] == "qwen_key"
-                assert qwen_config["model"] == "qwen-max"
-                assert qwen_config["max_tokens"] == 2000
-                
-                gemini_config = config_manager.get_llm_provider_config("gemini")
-                assert gemini_config["enabled"] is False
-                
-                # 不存在的提供商
-                unknown_config = config_manager.get_llm_provider_config("unknown")
-                assert unknown_config == {}
+        with patch.dict(os.environ, {"HOST": "127.0.0.1"}):
+            config_manager = ConfigManager(str(_write_config(tmp_path, config_content)))
+        
+        # 加载后修改环境变量不影响已解析的配置
+        with patch.dict(os.environ, {"HOST": "10.0.0.1"}):
+            assert config_manager.get("app.host") == "127.0.0.1"
+        
+        # 嵌套字典中的引用同样已替换，未设置的变量省略对应键
+        assert config_manager.get("app") == {"host": "127.0.0.1"}
+        assert config_manager.get("app.secret", "fallback") == "fallback"
+    
+    def test_get_llm_provider_config(self, app_config):
+        """测试获取LLM提供商配置"""
+        qwen_config = app_config.get_llm_provider_config("qwen")
+        assert qwen_config["enabled"] is True
+        assert qwen_config["api_key"] == "qwen_key"
+        assert qwen_config["model"] == "qwen-max"
+        assert qwen_config["max_tokens"] == 2000
+        
+        gemini_config = app_config.get_llm_provider_config("gemini")
+        assert gemini_config["enabled"] is False
+        
+        # 不存在的提供商
+        unknown_config = app_config.get_llm_provider_config("unknown")
+        assert unknown_config == {}
     
-    def test_get_app_config(self):
+    def test_get_app_config(self, tmp_path):
         """测试获取应用配置"""
         config_content = """
 app:
@@ -147,17 +161,15 @@ app:
   workers: 4
 """
         
-        with patch("builtins.open", mock_open(read_data=config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                app_config = config_manager.get_app_config()
-                assert app_config["host"] == "0.0.0.0"
-                assert app_config["port"] == 8001
-                assert app_config["debug"] is True
-                assert app_config["workers"] == 4
+        config_manager = ConfigManager(str(_write_config(tmp_path, config_content)))
+        
+        app_config = config_manager.get_app_config()
+        assert app_config["host"] == "0.0.0.0"
+        assert app_config["port"] == 8001
+        assert app_config["debug"] is True
+        assert app_config["workers"] == 4
     
-    def test_validate_config(self):
+    def test_validate_config(self, tmp_path):
         """测试配置验证"""
         # 有效配置
         valid_config_content = """
@@ -175,13 +187,11 @@ logging:
   level: "INFO"
 """
         
-        with patch("builtins.open", mock_open(read_data=valid_config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                is_valid, errors = config_manager.validate_config()
-                assert is_valid is True
-                assert len(errors) == 0
+        config_manager = ConfigManager(str(_write_config(tmp_path, valid_config_content)))
+        
+        is_valid, errors = config_manager.validate_config()
+        assert is_valid is True
+        assert len(errors) == 0
         
         # 无效配置（缺少必需字段）
         invalid_config_content = """
@@ -192,29 +202,27 @@ app:
 # 缺少llm_providers
 """
         
-        with patch("builtins.open", mock_open(read_data=invalid_config_content)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                
-                is_valid, errors = config_manager.validate_config()
-                assert is_valid is False
-                assert len(errors) > 0
+        config_manager = ConfigManager(str(_write_config(tmp_path, invalid_config_content)))
+        
+        is_valid, errors = config_manager.validate_config()
+        assert is_valid is False
+        assert len(errors) > 0
     
-    def test_reload_config(self):
+    def test_reload_config(self, tmp_path):
         """测试重新加载配置"""
         initial_config = "app:\n  port: 8001"
         updated_config = "app:\n  port: 9001"
         
-        with patch("builtins.open", mock_open(read_data=initial_config)):
-            with patch("os.path.exists", return_value=True):
-                config_manager = ConfigManager("test_config.yaml")
-                assert config_manager.get("app.port") == 8001
+        config_manager = ConfigManager(str(_write_config(tmp_path, initial_config)))
+        assert config_manager.get("app.port") == 8001
         
-        # 模拟配置文件更新
-        with patch("builtins.open", mock_open(read_data=updated_config)):
-            with patch("os.path.exists", return_value=True):
-                config_manager.reload()
-                assert config_manager.get("app.port") == 9001
+        # 更新配置文件，并推后修改时间以免落在同一时间戳内
+        config_file = _write_config(tmp_path, updated_config)
+        stat = config_file.stat()
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        
+        config_manager.reload()
+        assert config_manager.get("app.port") == 9001
 
 class TestGlobalConfig:
     """全局配置测试类"""
@@ -2,73 +2,85 @@
 
 import pytest
 import asyncio
-from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import MagicMock, patch
 from datetime import datetime
 
 from ai_strategy.core.generator import StrategyGenerator
+from ai_strategy.core.cache import LLMCache
 from ai_strategy.models.requests import StrategyRequest, ModelType, MarketType, RiskLevel, TimeFrame
 from ai_strategy.models.responses import StrategyResponse, ModelResponse
 from ai_strategy.models.strategy import Strategy, StrategyCode, PerformanceMetric, RiskMetric
-from ai_strategy.providers.base import BaseLLMProvider
+from ai_strategy.providers.base import BaseLLMProvider, LLMConfig
+
+def _default_response_data() -> dict:
+    """模拟提供商的默认响应"""
+    return {
+        "code": "# Mock strategy code\nclass MockStrategy:\n    pass",
+        "description": "Mock strategy description",
+        "parameters": {"param1": 10, "param2": 0.5}
+    }
+
+def _failing(message: str):
+    """构造总是抛出异常的_generate_content替身"""
+    async def _raise(*args, **kwargs):
+        raise Exception(message)
+    return _raise
 
 class MockLLMProvider(BaseLLMProvider):
-    """模拟LLM提供商"""
+    """模拟LLM提供商，实现基类抽象方法的真实子类，不依赖MagicMock"""
     
-    def __init__(self, name: str, response_data: dict = None):
+    def __init__(self, name: str, response_data: Optional[dict] = None, temperature: float = 0.7):
+        """初始化模拟提供商
+        
+        Args:
+            name: 提供商名称
+            response_data: 模拟的代码、描述和参数
+            temperature: 提供商配置的默认temperature
+        """
+        self.response_data = response_data or _default_response_data()
+        self.call_count = 0
+        super().__init__(LLMConfig(
+            api_key="test_key", api_url="https://mock.invalid/v1", model=name, temperature=temperature
+        ))
         self.name = name
-        self.response_data = response_data or {
-            "code": "# Mock strategy code\nclass MockStrategy:\n    pass",
-            "description": "Mock strategy description",
-            "parameters": {"param1": 10, "param2": 0.5}
-        }
-        self.client = MagicMock()
     
-    async def initialize_client(self):
-        """初始化客户端"""
+    def _initialize_client(self) -> None:
+        """模拟提供商不需要客户端"""
         pass
     
-    async def generate_content(self, prompt: str, **kwargs) -> dict:
-        """生成内容"""
-        return self.response_data
-    
-    def extract_code(self, content: str) -> str:
-        """提取代码"""
-        return self.response_data["code"]
+    async def _generate_content(self, prompt: str, **kwargs) -> str:
+        """返回包含代码块的模拟内容"""
+        self.call_count += 1
+        return f"{self.response_data['description']}\n\n```python\n{self.response_data['code']}\n```"
     
-    def extract_description(self, content: str) -> str:
+    def _extract_description(self, content: str) -> str:
         """提取描述"""
         return self.response_data["description"]
     
-    def extract_parameters(self, content: str) -> dict:
+    def _extract_parameters(self, code: str) -> dict:
         """提取参数"""
         return self.response_data["parameters"]
     
-    def calculate_confidence(self, content: str) -> float:
+    def _calculate_confidence(self, code: str, content: str) -> float:
         """计算置信度"""
         return 0.85
     
-    def calculate_risk_metrics(self, code: str) -> dict:
+    def _calculate_risk_metrics(self, code: str) -> dict:
         """计算风险指标"""
         return {
             "complexity_score": 0.3,
             "risk_score": 0.2,
             "maintainability_score": 0.8
         }
-    
-    async def verify_connection(self) -> bool:
-        """验证连接"""
-        return True
-    
-    async def get_model_info(self) -> dict:
-        """获取模型信息"""
-        return {"name": self.name, "version": "1.0"}
 
 class TestStrategyGenerator:
     """策略生成器测试类"""
     
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def mock_providers(self):
-        """模拟提供商"""
+        """模拟提供商，整个测试会话复用，测试中不要修改"""
         return {
             "qwen": MockLLMProvider("qwen", {
                 "code": "# Qwen strategy\nclass QwenStrategy:\n    def __init__(self):\n        self.name = 'qwen'",
@@ -82,7 +94,7 @@ class TestStrategyGenerator:
             })
         }
     
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def generator(self, mock_providers):
         """策略生成器实例"""
         return StrategyGenerator(mock_providers)
@@ -112,7 +124,6 @@ class TestStrategyGenerator:
         assert "qwen" in generator.providers
         assert "gemini" in generator.providers
     
-    @pytest.mark.asyncio
     async def test_generate_strategy_success(self, generator, sample_request):
         """测试成功生成策略"""
         response = await generator.generate_strategy(sample_request)
@@ -131,7 +142,6 @@ class TestStrategyGenerator:
         assert best_strategy.description is not None
         assert best_strategy.parameters is not None
     
-    @pytest.mark.asyncio
     async def test_generate_strategy_single_model(self, generator):
         """测试单模型生成策略"""
         request = StrategyRequest(
@@ -150,7 +160,6 @@ class TestStrategyGenerator:
         assert response.model_responses[0].model == "qwen"
         assert response.best_strategy is not None
     
-    @pytest.mark.asyncio
     async def test_generate_strategy_with_template(self, generator):
         """测试使用模板生成策略"""
         request = StrategyRequest(
@@ -178,12 +187,11 @@ class TestStrategyGenerator:
             assert response.success is True
             assert response.best_strategy is not None
     
-    @pytest.mark.asyncio
     async def test_generate_strategy_provider_failure(self, mock_providers):
         """测试提供商失败情况"""
         # 创建会失败的提供商
         failing_provider = MockLLMProvider("failing")
-        failing_provider.generate_content = AsyncMock(side_effect=Exception("Provider failed"))
+        failing_provider._generate_content = _failing("Provider failed")
         
         providers = {"failing": failing_provider}
         generator = StrategyGenerator(providers)
@@ -205,13 +213,14 @@ class TestStrategyGenerator:
         assert response.best_strategy is None
         assert response.error is not None
     
-    @pytest.mark.asyncio
     async def test_generate_strategy_partial_failure(self, mock_providers):
         """测试部分提供商失败"""
-        # 让一个提供商失败
-        mock_providers["gemini"].generate_content = AsyncMock(side_effect=Exception("Gemini failed"))
+        # 让一个提供商失败，不修改共享的fixture
+        failing_gemini = MockLLMProvider("gemini")
+        failing_gemini._generate_content = _failing("Gemini failed")
+        providers = {"qwen": mock_providers["qwen"], "gemini": failing_gemini}
         
-        generator = StrategyGenerator(mock_providers)
+        generator = StrategyGenerator(providers)
         
         request = StrategyRequest(
             description="Test strategy",
@@ -235,6 +244,88 @@ class TestStrategyGenerator:
         assert failed_response.model == "gemini"
         assert failed_response.error is not None
     
+    async def test_generate_strategy_cache_hit(self):
+        """测试相同请求命中缓存，不再调用提供商，且响应按请求方重新构建"""
+        providers = {
+            "qwen": MockLLMProvider("qwen", temperature=0),
+            "gemini": MockLLMProvider("gemini", temperature=0)
+        }
+        generator = StrategyGenerator(cache=LLMCache())
+        
+        def cache_request(user_id):
+            # 生成器读取的请求字段
+            return SimpleNamespace(
+                description="Generate a moving average crossover strategy",
+                user_id=user_id,
+                models=["qwen", "gemini"],
+                market_type=MarketType.STOCK,
+                time_frame=TimeFrame.DAY_1,
+                risk_level=RiskLevel.MEDIUM,
+                template_id=None,
+                use_ptrade_syntax=True,
+                custom_params={}
+            )
+        
+        built = []
+        
+        def build_response(request, model_responses, best_strategy, execution_time):
+            built.append((request, model_responses, best_strategy, execution_time))
+            return SimpleNamespace(success=True, user_id=request.user_id, execution_time=execution_time)
+        
+        with patch.object(generator.provider_factory, 'get_available_providers', return_value=list(providers)), \
+             patch.object(generator.provider_factory, 'get_or_create_provider',
+                          side_effect=lambda provider_type: providers[provider_type.value]), \
+             patch.object(generator, '_build_response', side_effect=build_response):
+            first = await generator.generate_strategy(cache_request("user_a"))
+            second = await generator.generate_strategy(cache_request("user_b"))
+        
+        assert first.success is True
+        assert providers["qwen"].call_count == 1
+        assert providers["gemini"].call_count == 1
+        assert generator.cache.stats["hits"] == 1
+        assert generator.cache.stats["misses"] == 1
+        
+        # 命中缓存时复用模型响应，但响应按本次请求的用户重新构建
+        (_, first_responses, first_best, _), (second_request, second_responses, second_best, _) = built
+        assert second.user_id == "user_b"
+        assert second_request.user_id == "user_b"
+        assert [r.dict() for r in second_responses] == [r.dict() for r in first_responses]
+        assert second_best.model_name == first_best.model_name
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("custom_params, provider_temperature, cacheable", [
+        ({}, 0, True),
+        ({"temperature": 0}, 0.7, True),
+        ({}, 0.7, False),
+        ({"temperature": 0.5}, 0, False),
+    ])
+    async def test_cache_requires_effective_zero_temperature(self, custom_params, provider_temperature, cacheable):
+        """测试只有实际temperature为0（请求指定值或提供商默认值）时才缓存"""
+        providers = {"qwen": MockLLMProvider("qwen", temperature=provider_temperature)}
+        generator = StrategyGenerator(cache=LLMCache())
+        request = SimpleNamespace(
+            description="Generate a moving average crossover strategy",
+            user_id="user_a",
+            models=["qwen"],
+            market_type=MarketType.STOCK,
+            time_frame=TimeFrame.DAY_1,
+            risk_level=RiskLevel.MEDIUM,
+            template_id=None,
+            use_ptrade_syntax=True,
+            custom_params=custom_params
+        )
+        
+        with patch.object(generator.provider_factory, 'get_available_providers', return_value=list(providers)), \
+             patch.object(generator.provider_factory, 'get_or_create_provider',
+                          side_effect=lambda provider_type: providers[provider_type.value]), \
+             patch.object(generator, '_build_response',
+                          side_effect=lambda **kwargs: SimpleNamespace(success=True, execution_time=0.0)):
+            await generator.generate_strategy(request)
+            await generator.generate_strategy(request)
+        
+        assert providers["qwen"].call_count == (1 if cacheable else 2)
+        assert generator.cache.stats["hits"] == (1 if cacheable else 0)
+    
     def test_build_prompt_basic(self, generator, sample_request):
         """测试基本提示词构建"""
         prompt = generator._build_prompt(sample_request)
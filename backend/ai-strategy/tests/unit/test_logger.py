@@ -1,7 +1,6 @@
 """日志模块单元测试"""
 
 import pytest
-import tempfile
 import os
 import logging
 from unittest.mock import patch, MagicMock
@@ -49,6 +48,11 @@ class TestParseFileSize:
 class TestSetupLogger:
     """日志设置测试类"""
     
+    @pytest.fixture
+    def log_dir(self, tmp_path_factory):
+        """日志目录，由pytest在会话结束时统一清理"""
+        return tmp_path_factory.mktemp("logs", numbered=True)
+    
     def test_setup_logger_console_only(self):
         """测试仅控制台日志"""
         logger = setup_logger(
@@ -66,55 +70,53 @@ class TestSetupLogger:
         console_handlers = [h for h in handlers if isinstance(h, logging.StreamHandler) and not hasattr(h, 'baseFilename')]
         assert len(console_handlers) > 0
     
-    def test_setup_logger_file_only(self):
+    def test_setup_logger_file_only(self, log_dir):
         """测试仅文件日志"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_file = os.path.join(temp_dir, "test.log")
-            
-            logger = setup_logger(
-                name="test_file_logger",
-                level="DEBUG",
-                console_output=False,
-                file_output=True,
-                log_file=log_file
-            )
-            
-            assert logger.name == "test_file_logger"
-            assert logger.level == logging.DEBUG
-            
-            # 检查文件处理器
-            file_handlers = [h for h in logger.handlers if hasattr(h, 'baseFilename')]
-            assert len(file_handlers) > 0
-            assert file_handlers[0].baseFilename == log_file
+        log_file = str(log_dir / "test.log")
+        
+        logger = setup_logger(
+            name="test_file_logger",
+            level="DEBUG",
+            console_output=False,
+            file_output=True,
+            log_file=log_file
+        )
+        
+        assert logger.name == "test_file_logger"
+        assert logger.level == logging.DEBUG
+        
+        # 检查文件处理器
+        file_handlers = [h for h in logger.handlers if hasattr(h, 'baseFilename')]
+        assert len(file_handlers) > 0
+        assert file_handlers[0].baseFilename == log_file
     
-    def test_setup_logger_both_outputs(self):
+    def test_setup_logger_both_outputs(self, log_dir):
         """测试控制台和文件日志"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_file = os.path.join(temp_dir, "test_both.log")
-            
-            logger = setup_logger(
-                name="test_both_logger",
-                level="WARNING",
-                console_output=True,
-                file_output=True,
-                log_file=log_file,
-                max_file_size="1MB",
-                backup_count=3
-            )
-            
-            assert logger.name == "test_both_logger"
-            assert logger.level == logging.WARNING
-            
-            # 检查处理器数量
-            assert len(logger.handlers) >= 2
-            
-            # 检查控制台处理器
-            console_handlers = [h for h in logger.handlers if isinstance(h, logging.StreamHandler) and not hasattr(h, 'baseFilename')]
-            assert len(console_handlers) > 0
-            
-            # 检查文件处理器
-            file_handlers = [h for h in logger.handlers if hasattr(h, 'baseFilename')]
-            assert len(file_handlers) > 0
+        log_file = str(log_dir / "test_both.log")
+        
+        logger = setup_logger(
+            name="test_both_logger",
+            level="WARNING",
+            console_output=True,
+            file_output=True,
+            log_file=log_file,
+            max_file_size="1MB",
+            backup_count=3
+        )
+        
+        assert logger.name == "test_both_logger"
+        assert logger.level == logging.WARNING
+        
+        # 检查处理器数量
+        assert len(logger.handlers) >= 2
+        
+        # 检查控制台处理器
+        console_handlers = [h for h in logger.handlers if isinstance(h, logging.StreamHandler) and not hasattr(h, 'baseFilename')]
+        assert len(console_handlers) > 0
+        
+        # 检查文件处理器
+        file_handlers = [h for h in logger.handlers if hasattr(h, 'baseFilename')]
+        assert len(file_handlers) > 0
     
     def test_setup_logger_custom_format(self):
         """测试自定义日志格式"""
@@ -145,27 +147,26 @@ class TestSetupLogger:
         
         assert logger.level == logging.INFO
     
-    def test_setup_logger_file_creation(self):
+    def test_setup_logger_file_creation(self, log_dir):
         """测试日志文件创建"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_file = os.path.join(temp_dir, "subdir", "test.log")
-            
-            logger = setup_logger(
-                name="test_file_creation",
-                level="INFO",
-                console_output=False,
-                file_output=True,
-                log_file=log_file
-            )
-            
-            # 记录一条日志
-            logger.info("Test message")
-            
-            # 检查文件是否创建
-            assert os.path.exists(log_file)
-            
-            # 检查目录是否创建
-            assert os.path.exists(os.path.dirname(log_file))
+        log_file = str(log_dir / "subdir" / "test.log")
+        
+        logger = setup_logger(
+            name="test_file_creation",
+            level="INFO",
+            console_output=False,
+            file_output=True,
+            log_file=log_file
+        )
+        
+        # 记录一条日志
+        logger.info("Test message")
+        
+        # 检查文件是否创建
+        assert Path(log_file).exists()
+        
+        # 检查目录是否创建
+        assert Path(log_file).parent.exists()
 
 class TestGetLogger:
     """获取日志器测试类"""
@@ -1,16 +1,36 @@
 """策略优化器单元测试"""
 
+import multiprocessing
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
 import pytest
 import numpy as np
+import pandas as pd
+from types import SimpleNamespace
 from unittest.mock import Mock, patch, AsyncMock
 
+from ai_strategy.core import optimizer as optimizer_module
 from ai_strategy.core.optimizer import (
     StrategyOptimizer, 
     OptimizationMethod, 
-    OptimizationObjective
+    OptimizationObjective,
+    OptimizationConfig,
+    get_optimizer,
+    close_optimizer
 )
 
 
+def _deterministic_backtest(strategy, historical_data, rng):
+    """只依赖参数的确定性回测，使进程池与进程内两条路径的结果可以直接比较"""
+    period = strategy.parameters["period"]
+    threshold = strategy.parameters["threshold"]
+    sharpe = 2.0 - abs(period - 20) / 10 - abs(threshold - 0.5)
+    return optimizer_module.BacktestMetrics(
+        total_return=0.1, sharpe_ratio=sharpe, max_drawdown=0.1, win_rate=0.5, profit_factor=1.5
+    )
+
+
 class TestStrategyOptimizer:
     """StrategyOptimizer 测试类"""
     
@@ -358,6 +378,369 @@ class TestStrategy:
         assert 0 <= metrics["win_rate"] <= 1  # 胜率应该在0-1之间
         assert metrics["max_drawdown"] <= 0  # 最大回撤应该为负或零
     
+    @pytest.mark.asyncio
+    async def test_parameter_batch_isolates_failures(self):
+        """测试批量评估中单个参数组合失败不影响其他组合"""
+        param_grid = [{"period": 10}, {"period": 20}, {"period": 30}]
+        
+        def create_strategy(strategy, parameters):
+            if parameters["period"] == 20:
+                raise ValueError("invalid period")
+            return strategy
+        
+        with patch.object(self.optimizer, '_create_strategy_with_parameters', side_effect=create_strategy):
+            results = await self.optimizer._evaluate_parameter_batch(
+                Mock(), pd.DataFrame(), param_grid, OptimizationObjective.SHARPE_RATIO
+            )
+        
+        assert [result["parameters"] for result in results] == param_grid
+        assert results[1]["score"] == float("-inf")
+        assert "invalid period" in results[1]["error"]
+        assert np.isfinite(results[0]["score"]) and results[0]["error"] is None
+        assert np.isfinite(results[2]["score"]) and results[2]["error"] is None
+    
+    @pytest.mark.asyncio
+    async def test_parameter_batch_isolates_backtest_failures(self):
+        """测试批量回测中单个组合回测失败时只影响该组合"""
+        param_grid = [{"period": 10}, {"period": 20}, {"period": 30}]
+        real_backtest = optimizer_module._backtest_strategy
+        calls = []
+        
+        def flaky_backtest(strategy, historical_data, rng):
+            calls.append(strategy)
+            if len(calls) == 2:
+                raise RuntimeError("backtest crashed")
+            return real_backtest(strategy, historical_data, rng)
+        
+        with patch.object(optimizer_module, '_backtest_strategy', side_effect=flaky_backtest):
+            results = await self.optimizer._evaluate_parameter_batch(
+                Mock(), pd.DataFrame(), param_grid, OptimizationObjective.SHARPE_RATIO
+            )
+        
+        assert len(calls) == 3
+        assert results[1]["score"] == float("-inf")
+        assert "backtest crashed" in results[1]["error"]
+        assert np.isfinite(results[0]["score"]) and np.isfinite(results[2]["score"])
+    
+    @pytest.mark.asyncio
+    async def test_single_backtest_uses_shared_backtest(self):
+        """测试单次回测与批量回测经由同一个回测函数"""
+        with patch.object(optimizer_module, '_backtest_strategy',
+                          side_effect=RuntimeError("backtest crashed")) as mock_backtest:
+            with pytest.raises(RuntimeError):
+                await self.optimizer._run_backtest(Mock(), pd.DataFrame())
+        
+        mock_backtest.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_bayesian_initial_sampling_fails_when_no_candidate_satisfies_constraints(self):
+        """测试贝叶斯初始采样在所有候选都不满足约束时报错，与其他优化方法一致"""
+        optimizable_params = {"period": SimpleNamespace(type="int", min_value=5, max_value=50, default_value=20)}
+        config = OptimizationConfig(
+            method=OptimizationMethod.BAYESIAN,
+            objective=OptimizationObjective.SHARPE_RATIO,
+            max_iterations=8,
+            constraints={"min_sharpe": 10.0}
+        )
+        
+        with pytest.raises(ValueError, match="没有满足约束条件的参数组合"):
+            await self.optimizer._bayesian_initial_sampling(Mock(), pd.DataFrame(), optimizable_params, config)
+    
+    @pytest.mark.asyncio
+    async def test_random_search_convergence_ignores_infeasible_scores(self):
+        """测试收敛检查不对负无穷得分做减法"""
+        optimizable_params = {"period": SimpleNamespace(type="int", min_value=5, max_value=50, default_value=20)}
+        config = OptimizationConfig(
+            method=OptimizationMethod.RANDOM_SEARCH,
+            objective=OptimizationObjective.SHARPE_RATIO,
+            max_iterations=15,
+            constraints={"min_sharpe": 10.0}
+        )
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            with pytest.raises(ValueError, match="随机搜索未找到有效的参数组合"):
+                await self.optimizer._random_search_optimization(Mock(), pd.DataFrame(), optimizable_params, config)
+    
+    @pytest.mark.asyncio
+    async def test_pruned_candidates_marked_in_history(self):
+        """测试预筛选淘汰的组合在历史中标记为pruned"""
+        optimizable_params = {"period": SimpleNamespace(type="int", min_value=5, max_value=50, default_value=20)}
+        config = OptimizationConfig(
+            method=OptimizationMethod.RANDOM_SEARCH,
+            objective=OptimizationObjective.SHARPE_RATIO,
+            max_iterations=3,
+            constraints={"min_sharpe": 1.0}
+        )
+        
+        async def evaluate(strategy, historical_data, parameters, objective, iteration, constraints=None):
+            if iteration == 0:
+                return {"parameters": parameters, "score": float("-inf"), "metrics": {"sharpe_ratio": 0.1}, "pruned": True}
+            return {"parameters": parameters, "score": 1.5, "metrics": {"sharpe_ratio": 1.5}, "pruned": False}
+        
+        with patch.object(self.optimizer, '_evaluate_parameter_combination', side_effect=evaluate):
+            result = await self.optimizer._random_search_optimization(
+                Mock(), pd.DataFrame(), optimizable_params, config
+            )
+        
+        assert [record["pruned"] for record in result.optimization_history] == [True, False, False]
+        assert result.best_score == 1.5
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_candidates_evaluated_once(self):
+        """测试同一缓存下重复的参数组合只评估一次"""
+        param_list = [
+            {"period": 10, "threshold": 0.5},
+            {"period": 10, "threshold": 0.5 + 1e-9},
+            {"period": 20, "threshold": 0.5},
+        ]
+        
+        async def evaluate(strategy, historical_data, parameters, objective, iteration, constraints=None):
+            return {"parameters": parameters, "score": 1.0, "metrics": {}, "pruned": False}
+        
+        with patch.object(self.optimizer, '_evaluate_parameter_combination', side_effect=evaluate) as mock_eval:
+            results = await self.optimizer._evaluate_concurrently(
+                Mock(), pd.DataFrame(), param_list, OptimizationObjective.SHARPE_RATIO, 0, 4, cache={}
+            )
+        
+        assert mock_eval.call_count == 2
+        assert results[0] is results[1]
+        assert results[2]["parameters"] == {"period": 20, "threshold": 0.5}
+    
+    @pytest.mark.asyncio
+    async def test_evaluation_cache_is_per_run(self):
+        """测试评估缓存不在两次优化之间共享"""
+        optimizable_params = {"period": SimpleNamespace(type="int", min_value=10, max_value=10, default_value=10)}
+        config = OptimizationConfig(
+            method=OptimizationMethod.RANDOM_SEARCH,
+            objective=OptimizationObjective.SHARPE_RATIO,
+            max_iterations=4
+        )
+        
+        async def evaluate(strategy, historical_data, parameters, objective, iteration, constraints=None):
+            return {"parameters": parameters, "score": 1.0, "metrics": {}, "pruned": False}
+        
+        with patch.object(self.optimizer, '_evaluate_parameter_combination', side_effect=evaluate) as mock_eval:
+            for _ in range(2):
+                await self.optimizer._random_search_optimization(Mock(), pd.DataFrame(), optimizable_params, config)
+        
+        # 每次优化内重复组合只评估一次，第二次优化重新评估
+        assert mock_eval.call_count == 2
+        assert not hasattr(config, "evaluation_cache")
+    
+    @pytest.mark.asyncio
+    async def test_genetic_process_pool_matches_in_process(self):
+        """测试遗传算法使用进程池批量回测时结果与进程内评估一致"""
+        optimizable_params = {
+            "period": SimpleNamespace(type="int", min_value=5, max_value=50, default_value=20),
+            "threshold": SimpleNamespace(type="float", min_value=0.1, max_value=0.9, default_value=0.5),
+        }
+        
+        def create_strategy(strategy, parameters):
+            return SimpleNamespace(parameters=dict(parameters))
+        
+        # fork启动的子进程继承被替换的回测函数
+        pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork"))
+        results = []
+        try:
+            with patch.object(optimizer_module, '_backtest_strategy', _deterministic_backtest), \
+                 patch.object(self.optimizer, '_create_strategy_with_parameters', side_effect=create_strategy), \
+                 patch.object(self.optimizer, '_next_backtest_seed', return_value=0), \
+                 patch.object(self.optimizer, '_get_process_pool', return_value=pool):
+                for use_process_pool in (False, True):
+                    config = OptimizationConfig(
+                        method=OptimizationMethod.GENETIC,
+                        objective=OptimizationObjective.SHARPE_RATIO,
+                        max_iterations=5,
+                        population_size=8,
+                        random_seed=42,
+                        use_process_pool=use_process_pool
+                    )
+                    results.append(await self.optimizer._genetic_optimization(
+                        Mock(), pd.DataFrame(), optimizable_params, config
+                    ))
+        finally:
+            pool.shutdown()
+        
+        in_process, process_pool = results
+        assert process_pool.best_parameters == in_process.best_parameters
+        assert process_pool.best_score == pytest.approx(in_process.best_score)
+        assert [record["population_best"] for record in process_pool.optimization_history] == pytest.approx(
+            [record["population_best"] for record in in_process.optimization_history]
+        )
+    
+    @pytest.mark.parametrize("mutation_rate", [0.0, 0.5, 1.0])
+    def test_genetic_operations_respect_bounds_and_types(self, mutation_rate):
+        """测试遗传操作产生的子代在参数范围内且保持参数类型"""
+        optimizable_params = {
+            "period": SimpleNamespace(type="int", min_value=5, max_value=50, default_value=20),
+            "threshold": SimpleNamespace(type="float", min_value=0.1, max_value=0.9, default_value=0.5),
+            "mode": SimpleNamespace(type="str", min_value=None, max_value=None, default_value="fast"),
+        }
+        np.random.seed(0)
+        population = [
+            {"period": period, "threshold": threshold, "mode": "fast"}
+            for period, threshold in zip([5, 12, 20, 33, 41, 50, 27], [0.1, 0.25, 0.4, 0.55, 0.7, 0.9, 0.6])
+        ]
+        fitness_scores = np.array([0.5, 1.2, float("-inf"), 0.8, 1.9, 0.1, 1.4])
+        
+        for _ in range(20):
+            children = self.optimizer._genetic_operations(
+                population, fitness_scores, optimizable_params, mutation_rate=mutation_rate
+            )
+            
+            assert len(children) == len(population)
+            for child in children:
+                assert type(child["period"]) is int
+                assert 5 <= child["period"] <= 50
+                assert type(child["threshold"]) is float
+                assert 0.1 <= child["threshold"] <= 0.9
+                assert child["mode"] == "fast"
+                if mutation_rate == 0.0:
+                    # 不变异时子代基因都来自父代
+                    assert child["period"] in {individual["period"] for individual in population}
+                    assert child["threshold"] in {individual["threshold"] for individual in population}
+    
+    def test_parameter_sensitivity_matches_previous_loop(self):
+        """测试向量化的参数敏感性与原先逐参数循环的结果一致"""
+        history = [
+            {"parameters": {"period": 10, "threshold": 0.3, "window": 5, "lag": 1}, "score": 0.8},
+            {"parameters": {"period": 20, "threshold": 0.5, "window": 5}, "score": 1.4},
+            {"parameters": {"period": 30, "window": 5}, "score": 1.1},
+            {"parameters": {"period": 40, "threshold": 0.9, "window": 5}, "score": 0.2},
+            {"parameters": {"period": 50, "threshold": 0.7, "window": 5}, "score": 0.9},
+        ]
+        
+        sensitivity = self.optimizer._calculate_parameter_sensitivity(history)
+        
+        # 期望值由原先逐参数调用np.corrcoef的实现在同一历史上算出
+        assert sensitivity == pytest.approx({
+            "period": 0.35623524993954825,
+            "threshold": 0.6029708808570378,
+            "window": 0.0,
+            "lag": 0.0,
+        })
+    
+    def test_parameter_cache_key(self):
+        """测试缓存键与参数顺序无关，浮点数保留6位小数，不可哈希的参数值返回None"""
+        key = optimizer_module._parameter_cache_key({"threshold": 0.5, "period": 10})
+        
+        assert key == (("period", 10), ("threshold", 0.5))
+        assert optimizer_module._parameter_cache_key({"period": 10, "threshold": 0.5 + 1e-9}) == key
+        assert optimizer_module._parameter_cache_key({"period": 10, "threshold": 0.5 + 1e-5}) != key
+        assert optimizer_module._parameter_cache_key({"period": 10, "windows": [5, 10]}) is None
+    
+    def test_deduplicate_parameters(self):
+        """测试参数组合去重及下标映射，不可哈希的组合不参与去重"""
+        param_list = [
+            {"period": 10, "threshold": 0.5},
+            {"period": 20, "threshold": 0.5},
+            {"threshold": 0.5 + 1e-9, "period": 10},
+            {"period": 10, "windows": [5, 10]},
+            {"period": 10, "windows": [5, 10]},
+            {"period": 20, "threshold": 0.5},
+        ]
+        
+        unique_params, inverse = optimizer_module._deduplicate_parameters(param_list)
+        
+        assert unique_params == [param_list[0], param_list[1], param_list[3], param_list[4]]
+        assert inverse == [0, 1, 0, 2, 3, 1]
+    
+    def test_parameter_grid_matches_nested_expansion(self):
+        """测试meshgrid生成的 2x3 网格与原先逐参数嵌套展开的组合及顺序一致"""
+        optimizable_params = {
+            "period": SimpleNamespace(type="int", min_value=1, max_value=2, default_value=1),
+            "mode": SimpleNamespace(type="str", min_value=None, max_value=None, default_value="fast"),
+            "threshold": SimpleNamespace(type="float", min_value=0.0, max_value=0.02, default_value=0.01),
+        }
+        
+        grid = self.optimizer._generate_parameter_grid(optimizable_params)
+        
+        expected = [
+            {"period": period, "mode": "fast", "threshold": threshold}
+            for period in [1, 2]
+            for threshold in np.linspace(0.0, 0.02, 3).tolist()
+        ]
+        assert grid == expected
+        assert all(type(combination["period"]) is int for combination in grid)
+        assert all(type(combination["threshold"]) is float for combination in grid)
+    
+    @pytest.mark.parametrize("constraints, expected", [
+        (None, True),
+        ({"min_sharpe": 1.0}, True),
+        ({"min_sharpe": 1.5}, False),
+        ({"min_return": 0.2}, False),
+        ({"min_win_rate": 0.5}, True),
+        ({"min_profit_factor": 2.0}, False),
+        ({"max_drawdown": 0.1}, True),
+        ({"max_drawdown": 0.05}, False),
+        ({"unknown_constraint": 100}, True),
+    ])
+    def test_satisfies_constraints(self, constraints, expected):
+        """测试各约束项按 _CONSTRAINT_RULES 的上下界检查"""
+        metrics = optimizer_module.BacktestMetrics(
+            total_return=0.1, sharpe_ratio=1.2, max_drawdown=0.08, win_rate=0.55, profit_factor=1.5
+        )
+        
+        assert self.optimizer._satisfies_constraints(metrics, constraints) is expected
+    
+    @pytest.mark.asyncio
+    async def test_constraint_violation_scores_negative_infinity(self):
+        """测试完整回测不满足约束时得分为负无穷"""
+        metrics = {"sharpe_ratio": 1.2, "max_drawdown": 0.15}
+        
+        with patch.object(self.optimizer, '_run_backtest', new_callable=AsyncMock, return_value=metrics):
+            result = await self.optimizer._evaluate_parameter_combination(
+                Mock(), pd.DataFrame(), {"period": 10}, OptimizationObjective.SHARPE_RATIO, 0,
+                constraints={"max_drawdown": 0.1}
+            )
+        
+        assert result["score"] == float("-inf")
+        assert result["pruned"] is False
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("preview_sharpe, pruned", [(0.2, True), (0.5, False)])
+    async def test_prescreen_prunes_low_sharpe_candidates(self, preview_sharpe, pruned):
+        """测试预回测夏普比率低于 min_sharpe * _PRESCREEN_SHARPE_RATIO 的组合不再做完整回测"""
+        bars = optimizer_module._PRESCREEN_MIN_BARS * 2
+        historical_data = pd.DataFrame({"close": np.linspace(100, 120, bars)})
+        
+        async def backtest(strategy, data, bars_limit=None):
+            sharpe = preview_sharpe if bars_limit is not None else 1.5
+            return {"sharpe_ratio": sharpe}
+        
+        with patch.object(self.optimizer, '_run_backtest', side_effect=backtest) as mock_backtest:
+            result = await self.optimizer._evaluate_parameter_combination(
+                Mock(), historical_data, {"period": 10}, OptimizationObjective.SHARPE_RATIO, 0,
+                constraints={"min_sharpe": 1.0}
+            )
+        
+        assert mock_backtest.call_args_list[0].kwargs == {"bars_limit": bars // 10}
+        assert result["pruned"] is pruned
+        if pruned:
+            assert mock_backtest.call_count == 1
+            assert result["score"] == float("-inf")
+        else:
+            assert mock_backtest.call_count == 2
+            assert result["score"] == 1.5
+    
+    @pytest.mark.asyncio
+    async def test_prescreen_skipped_for_short_history(self):
+        """测试K线数少于 _PRESCREEN_MIN_BARS 时不做预回测"""
+        historical_data = pd.DataFrame({"close": np.linspace(100, 120, optimizer_module._PRESCREEN_MIN_BARS - 1)})
+        
+        with patch.object(self.optimizer, '_run_backtest', new_callable=AsyncMock,
+                          return_value={"sharpe_ratio": 0.1}) as mock_backtest:
+            result = await self.optimizer._evaluate_parameter_combination(
+                Mock(), historical_data, {"period": 10}, OptimizationObjective.SHARPE_RATIO, 0,
+                constraints={"min_sharpe": 1.0}
+            )
+        
+        mock_backtest.assert_awaited_once()
+        assert "bars_limit" not in mock_backtest.call_args.kwargs
+        assert result["pruned"] is False
+        assert result["score"] == float("-inf")
+    
     @pytest.mark.asyncio
     async def test_optimization_with_constraints(self):
         """测试带约束的优化"""
@@ -417,6 +800,22 @@ class TestGlobalOptimizer:
         """测试全局优化器类型"""
         optimizer = get_global_optimizer()
         assert isinstance(optimizer, StrategyOptimizer)
+    
+    def test_close_optimizer_shuts_down_executors(self):
+        """测试关闭全局优化器时释放执行器"""
+        optimizer = get_optimizer()
+        process_pool = optimizer._get_process_pool()
+        
+        close_optimizer()
+        
+        assert optimizer.executor._shutdown
+        assert process_pool._shutdown_thread
+        assert optimizer._process_pool is None
+        assert get_optimizer() is not optimizer
+        
+        # 未创建实例时重复关闭不报错
+        close_optimizer()
+        close_optimizer()
 
 
 class TestOptimizationEnums:
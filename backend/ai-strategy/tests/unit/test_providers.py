@@ -1,14 +1,31 @@
 """LLM提供商单元测试"""
 
+import asyncio
+import gc
+import time
+
 import pytest
 from unittest.mock import AsyncMock, Mock, patch
 import aiohttp
 from aiohttp import ClientSession
+from aioresponses import aioresponses
 
 from ai_strategy.providers.base import BaseLLMProvider, LLMConfig
 from ai_strategy.providers.qwen import QwenProvider
 from ai_strategy.providers.gemini import GeminiProvider
-from ai_strategy.providers.factory import ProviderFactory, get_provider_factory
+from ai_strategy.providers.factory import ProviderFactory, ProviderType, get_provider_factory
+from ai_strategy.core.cache import LLMCache
+
+
+QWEN_API_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+
+
+@pytest.fixture
+def mocked_api():
+    """在aiohttp层拦截HTTP请求，测试走真实的会话和请求路径"""
+    with aioresponses() as mocked:
+        yield mocked
 
 
 class TestLLMConfig:
@@ -42,6 +59,41 @@ class TestLLMConfig:
         assert config.temperature == 0.7
         assert config.timeout == 30
         assert config.max_retries == 3
+    
+    def test_llm_config_pool_defaults(self):
+        """测试连接池配置默认值"""
+        config = LLMConfig(
+            api_key="test_key",
+            api_url="https://api.test.com",
+            model="test-model"
+        )
+        
+        assert config.max_connections == 100
+        assert config.max_keepalive_connections == 50
+        assert config.connect_timeout == 10
+    
+    def test_llm_config_keepalive_clamped_to_max_connections(self):
+        """测试只配置较小的最大连接数时单主机连接数随之收敛"""
+        config = LLMConfig(
+            api_key="test_key",
+            api_url="https://api.test.com",
+            model="test-model",
+            max_connections=20
+        )
+        
+        assert config.max_connections == 20
+        assert config.max_keepalive_connections == 20
+    
+    def test_llm_config_invalid_pool_limits(self):
+        """测试无效的连接池配置"""
+        with pytest.raises(ValueError):
+            LLMConfig(
+                api_key="test_key",
+                api_url="https://api.test.com",
+                model="test-model",
+                max_connections=10,
+                max_keepalive_connections=20
+            )
 
 
 class TestBaseLLMProvider:
@@ -51,7 +103,7 @@ class TestBaseLLMProvider:
         """测试前设置"""
         self.config = LLMConfig(
             api_key="test_key",
-            base_url="https://api.test.com",
+            api_url="https://api.test.com",
             model="test-model"
         )
     
@@ -120,6 +172,39 @@ class TestBaseLLMProvider:
         assert "双均线交叉策略" in description
         assert "参数说明" in description
     
+    def test_extract_code_and_parameters_fast(self):
+        """测试代码和参数提取的性能回归"""
+        class TestProvider(BaseLLMProvider):
+            def _initialize_client(self):
+                pass
+            
+            async def _generate_content(self, prompt, **kwargs):
+                pass
+        
+        provider = TestProvider(LLMConfig(
+            api_key="test_key",
+            api_url="https://api.test.com",
+            model="test-model"
+        ))
+        
+        content = "策略说明\n" * 200 + (
+            "```python\n"
+            "class MAStrategy:\n"
+            "    def __init__(self, short_period=5, long_period=20.5, enabled=True):\n"
+            "        pass\n"
+            "```\n"
+        )
+        
+        start = time.perf_counter()
+        for _ in range(1000):
+            code = provider._extract_code(content)
+            parameters = provider._extract_parameters(code)
+        elapsed = time.perf_counter() - start
+        
+        assert code.startswith("class MAStrategy:")
+        assert parameters == {"short_period": 5, "long_period": 20.5, "enabled": True}
+        assert elapsed < 1.0
+    
     def test_calculate_confidence_score(self):
         """测试置信度计算"""
         class TestProvider(BaseLLMProvider):
@@ -169,8 +254,9 @@ class TestQwenProvider:
         """测试前设置"""
         self.config = LLMConfig(
             api_key="test_qwen_key",
-            base_url="https://dashscope.aliyuncs.com/api/v1",
-            model="qwen-turbo"
+            api_url=QWEN_API_URL,
+            model="qwen-turbo",
+            retry_attempts=1
         )
     
     @pytest.mark.asyncio
@@ -181,7 +267,7 @@ class TestQwenProvider:
         assert provider.provider_name == "qwen"
     
     @pytest.mark.asyncio
-    async def test_generate_content_success(self):
+    async def test_generate_content_success(self, mocked_api):
         """测试成功生成内容"""
         provider = QwenProvider(self.config)
         
@@ -197,30 +283,197 @@ class TestQwenProvider:
                 "total_tokens": 100
             }
         }
+        mocked_api.post(QWEN_API_URL, payload=mock_response)
         
-        with patch.object(provider, '_make_request', new_callable=AsyncMock) as mock_request:
-            mock_request.return_value = mock_response
-            
-            result = await provider.generate_content("Generate a strategy")
-            
-            assert result is not None
-            assert "code" in result
-            assert "class TestStrategy:" in result["code"]
-            assert result["confidence_score"] > 0
+        result = await provider.generate("Generate a strategy")
+        
+        assert result.error is None
+        assert "class TestStrategy:" in result.code
+        assert result.confidence_score > 0
+        
+        await provider.close()
     
     @pytest.mark.asyncio
-    async def test_generate_content_failure(self):
+    async def test_generate_content_failure(self, mocked_api):
         """测试生成内容失败"""
         provider = QwenProvider(self.config)
+        mocked_api.post(QWEN_API_URL, status=500, body="API Error")
+        
+        result = await provider.generate("Generate a strategy")
+        
+        assert result.error is not None
+        assert result.code == ""
+        
+        await provider.close()
+    
+    @pytest.mark.asyncio
+    async def test_deterministic_response_cached(self):
+        """测试temperature为0时重复请求命中响应缓存"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url="https://dashscope.aliyuncs.com/api/v1",
+            model="qwen-turbo",
+            temperature=0
+        ), cache=LLMCache())
+        
+        with patch.object(provider, '_generate_content', new_callable=AsyncMock) as mock_generate:
+            mock_generate.return_value = "```python\nclass TestStrategy:\n    pass\n```"
+            
+            await provider.generate("Generate a strategy")
+            await provider.generate("Generate a strategy")
+            
+            assert mock_generate.call_count == 1
+        
+        assert provider.get_model_info()["cache"]["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_sampled_response_not_cached(self):
+        """测试temperature大于0时不使用响应缓存"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url="https://dashscope.aliyuncs.com/api/v1",
+            model="qwen-turbo",
+            temperature=0.7
+        ), cache=LLMCache())
         
-        with patch.object(provider, '_make_request', new_callable=AsyncMock) as mock_request:
-            mock_request.side_effect = Exception("API Error")
+        with patch.object(provider, '_generate_content', new_callable=AsyncMock) as mock_generate:
+            mock_generate.return_value = "```python\nclass TestStrategy:\n    pass\n```"
+            
+            await provider.generate("Generate a strategy")
+            await provider.generate("Generate a strategy")
+            
+            assert mock_generate.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_retry_with_jittered_backoff(self):
+        """测试失败后按带抖动的指数退避重试"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url=QWEN_API_URL,
+            model="qwen-turbo",
+            retry_attempts=3,
+            retry_delay=2
+        ))
+        
+        with patch.object(provider, '_generate_content', new_callable=AsyncMock) as mock_generate, \
+             patch("ai_strategy.providers.base.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            mock_generate.side_effect = [Exception("429"), Exception("429"), "content"]
             
-            result = await provider.generate_content("Generate a strategy")
-            assert result is None
+            content = await provider._generate_with_retry("Generate a strategy")
+        
+        assert content == "content"
+        assert mock_generate.call_count == 3
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        assert len(delays) == 2
+        assert 0 <= delays[0] <= 2
+        assert 0 <= delays[1] <= 4
+    
+    def test_model_info_cached(self):
+        """测试静态模型信息只构建一次且只读"""
+        provider = QwenProvider(self.config)
+        
+        with patch.object(QwenProvider, '_build_model_info', wraps=provider._build_model_info) as mock_build:
+            info1 = provider.get_model_info()
+            info2 = provider.get_model_info()
+        
+        assert mock_build.call_count == 1
+        assert info1 == info2
+        assert info1["model"] == "qwen-turbo"
+        with pytest.raises(TypeError):
+            provider.model_info["model"] = "other"
+    
+    @pytest.mark.asyncio
+    async def test_generate_batch(self):
+        """测试批量生成按顺序返回且确定性调用去重"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url=QWEN_API_URL,
+            model="qwen-turbo",
+            temperature=0
+        ))
+        
+        async def fake_generate(prompt, **kwargs):
+            await asyncio.sleep(0.05)
+            return f"```python\nclass Strategy:\n    def __init__(self):\n        self.name = '{prompt}'\n```"
+        
+        with patch.object(provider, '_generate_content', side_effect=fake_generate) as mock_generate:
+            start = time.perf_counter()
+            results = await provider.generate_batch(["p1", "p2", "p1", "p3"])
+            elapsed = time.perf_counter() - start
+        
+        assert mock_generate.call_count == 3
+        assert ["p1" in results[0].code, "p2" in results[1].code, "p1" in results[2].code, "p3" in results[3].code] == [True] * 4
+        assert elapsed < 0.15
     
     @pytest.mark.asyncio
-    async def test_verify_connection_success(self):
+    async def test_http_session_reused(self, mocked_api):
+        """测试多次请求复用同一个HTTP会话和连接器"""
+        provider = QwenProvider(self.config)
+        mocked_api.post(
+            QWEN_API_URL,
+            payload={"output": {"choices": [{"message": {"content": "ok"}}]}},
+            repeat=True
+        )
+        
+        with patch("aiohttp.TCPConnector", wraps=aiohttp.TCPConnector) as mock_connector:
+            for _ in range(10):
+                await provider._generate_content("Generate a strategy")
+        
+        assert mock_connector.call_count == 1
+        assert sum(len(calls) for calls in mocked_api.requests.values()) == 10
+        
+        await provider.close()
+        assert provider._session is None
+    
+    @pytest.mark.asyncio
+    async def test_session_closed_when_provider_collected(self):
+        """测试未显式关闭的提供商被回收后会话随之关闭"""
+        provider = QwenProvider(self.config)
+        session = await provider._get_session()
+        
+        del provider
+        gc.collect()
+        # 关闭任务经call_soon_threadsafe调度，让出事件循环使其执行
+        await asyncio.sleep(0.01)
+        
+        assert session.closed
+    
+    @pytest.mark.asyncio
+    async def test_injected_session_not_closed(self, shared_session):
+        """测试注入的外部会话被直接复用且不随提供商关闭"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url="https://dashscope.aliyuncs.com/api/v1",
+            model="qwen-turbo"
+        ), session=shared_session)
+        
+        assert await provider._get_session() is shared_session
+        
+        await provider.close()
+        assert not shared_session.closed
+    
+    @pytest.mark.asyncio
+    async def test_http_session_pool_limits(self):
+        """测试连接池上限来自LLM配置"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url="https://dashscope.aliyuncs.com/api/v1",
+            model="qwen-turbo",
+            max_connections=2000,
+            max_keepalive_connections=500
+        ))
+        
+        with patch("aiohttp.TCPConnector", wraps=aiohttp.TCPConnector) as mock_connector:
+            await provider._get_session()
+        
+        _, kwargs = mock_connector.call_args
+        assert kwargs["limit"] == 2000
+        assert kwargs["limit_per_host"] == 500
+        
+        await provider.close()
+    
+    @pytest.mark.asyncio
+    async def test_verify_connection_success(self, mocked_api):
         """测试连接验证成功"""
         provider = QwenProvider(self.config)
         
@@ -233,23 +486,23 @@ class TestQwenProvider:
                 }]
             }
         }
+        mocked_api.post(QWEN_API_URL, payload=mock_response)
         
-        with patch.object(provider, '_make_request', new_callable=AsyncMock) as mock_request:
-            mock_request.return_value = mock_response
-            
-            is_connected = await provider.verify_connection()
-            assert is_connected is True
+        is_connected = await provider.validate_connection()
+        assert is_connected is True
+        
+        await provider.close()
     
     @pytest.mark.asyncio
-    async def test_verify_connection_failure(self):
+    async def test_verify_connection_failure(self, mocked_api):
         """测试连接验证失败"""
         provider = QwenProvider(self.config)
+        mocked_api.post(QWEN_API_URL, exception=aiohttp.ClientConnectionError("Connection Error"))
         
-        with patch.object(provider, '_make_request', new_callable=AsyncMock) as mock_request:
-            mock_request.side_effect = Exception("Connection Error")
-            
-            is_connected = await provider.verify_connection()
-            assert is_connected is False
+        is_connected = await provider.validate_connection()
+        assert is_connected is False
+        
+        await provider.close()
     
     def test_get_model_info(self):
         """测试获取模型信息"""
@@ -269,9 +522,11 @@ class TestGeminiProvider:
         """测试前设置"""
         self.config = LLMConfig(
             api_key="test_gemini_key",
-            base_url="https://generativelanguage.googleapis.com/v1beta",
-            model="gemini-pro"
+            api_url=GEMINI_API_URL,
+            model="gemini-pro",
+            retry_attempts=1
         )
+        self.api_url = f"{GEMINI_API_URL}?key=test_gemini_key"
     
     @pytest.mark.asyncio
     async def test_gemini_provider_initialization(self):
@@ -281,7 +536,7 @@ class TestGeminiProvider:
         assert provider.provider_name == "gemini"
     
     @pytest.mark.asyncio
-    async def test_generate_content_success(self):
+    async def test_generate_content_success(self, mocked_api):
         """测试成功生成内容"""
         provider = GeminiProvider(self.config)
         
@@ -297,19 +552,18 @@ class TestGeminiProvider:
                 "totalTokenCount": 150
             }
         }
+        mocked_api.post(self.api_url, payload=mock_response)
         
-        with patch.object(provider, '_make_request', new_callable=AsyncMock) as mock_request:
-            mock_request.return_value = mock_response
-            
-            result = await provider.generate_content("Generate a strategy")
-            
-            assert result is not None
-            assert "code" in result
-            assert "class GeminiStrategy:" in result["code"]
-            assert result["confidence_score"] > 0
+        result = await provider.generate("Generate a strategy")
+        
+        assert result.error is None
+        assert "class GeminiStrategy:" in result.code
+        assert result.confidence_score > 0
+        
+        await provider.close()
     
     @pytest.mark.asyncio
-    async def test_verify_connection_success(self):
+    async def test_verify_connection_success(self, mocked_api):
         """测试连接验证成功"""
         provider = GeminiProvider(self.config)
         
@@ -322,12 +576,12 @@ class TestGeminiProvider:
                 }
             }]
         }
+        mocked_api.post(self.api_url, payload=mock_response)
         
-        with patch.object(provider, '_make_request', new_callable=AsyncMock) as mock_request:
-            mock_request.return_value = mock_response
-            
-            is_connected = await provider.verify_connection()
-            assert is_connected is True
+        is_connected = await provider.validate_connection()
+        assert is_connected is True
+        
+        await provider.close()
     
     def test_get_model_info(self):
         """测试获取模型信息"""
@@ -348,12 +602,12 @@ class TestProviderFactory:
         self.factory = ProviderFactory()
         self.qwen_config = LLMConfig(
             api_key="test_qwen_key",
-            base_url="https://dashscope.aliyuncs.com/api/v1",
+            api_url="https://dashscope.aliyuncs.com/api/v1",
             model="qwen-turbo"
         )
         self.gemini_config = LLMConfig(
             api_key="test_gemini_key",
-            base_url="https://generativelanguage.googleapis.com/v1beta",
+            api_url="https://generativelanguage.googleapis.com/v1beta",
             model="gemini-pro"
         )
     
@@ -380,6 +634,23 @@ class TestProviderFactory:
         provider2 = self.factory.get_provider("qwen", self.qwen_config)
         assert provider1 is provider2
     
+    def test_get_or_create_provider_equal_configs(self):
+        """测试等价配置复用同一提供商实例"""
+        base_config = {
+            "api_key": "test_qwen_key",
+            "api_url": "https://dashscope.aliyuncs.com/api/v1",
+            "model": "qwen-turbo",
+            "timeout": 30
+        }
+        
+        with patch.object(self.factory._config, 'get_llm_provider_config', return_value=base_config):
+            provider1 = self.factory.get_or_create_provider(ProviderType.QWEN)
+            provider2 = self.factory.get_or_create_provider(ProviderType.QWEN, timeout=30)
+            provider3 = self.factory.get_or_create_provider(ProviderType.QWEN, timeout=60)
+        
+        assert provider1 is provider2
+        assert provider1 is not provider3
+    
     def test_create_multiple_providers(self):
         """测试批量创建提供商"""
         configs = {
@@ -395,6 +666,66 @@ class TestProviderFactory:
         assert isinstance(providers["qwen"], QwenProvider)
         assert isinstance(providers["gemini"], GeminiProvider)
     
+    @pytest.mark.asyncio
+    async def test_create_multiple_providers_async_warms_in_parallel(self):
+        """测试批量创建提供商时并发预热连接"""
+        async def slow_warmup():
+            await asyncio.sleep(0.1)
+            return True
+        
+        providers = []
+        for _ in range(3):
+            provider = Mock()
+            provider.warmup = slow_warmup
+            providers.append(provider)
+        
+        with patch.object(self.factory, 'get_or_create_provider', side_effect=providers):
+            start = time.perf_counter()
+            result = await self.factory.create_multiple_providers_async(
+                [ProviderType.QWEN, ProviderType.GEMINI, ProviderType.OPENAI]
+            )
+            elapsed = time.perf_counter() - start
+        
+        assert result == providers
+        assert elapsed < 0.2
+    
+    @pytest.mark.asyncio
+    async def test_warmed_providers_are_cached_until_clear(self):
+        """测试预热的是缓存实例，clear_cache会关闭并移除它们"""
+        base_config = {
+            "api_key": "test_qwen_key",
+            "api_url": "https://dashscope.aliyuncs.com/api/v1",
+            "model": "qwen-turbo"
+        }
+        
+        with patch.object(self.factory._config, 'get_llm_provider_config', return_value=base_config), \
+                patch.object(QwenProvider, 'warmup', new_callable=AsyncMock, return_value=True), \
+                patch.object(QwenProvider, 'close', new_callable=AsyncMock) as mock_close:
+            [warmed] = await self.factory.create_multiple_providers_async([ProviderType.QWEN])
+            assert self.factory.get_or_create_provider(ProviderType.QWEN) is warmed
+            
+            await self.factory.clear_cache()
+            
+            assert len(self.factory) == 0
+            mock_close.assert_awaited_once()
+            assert self.factory.get_or_create_provider(ProviderType.QWEN) is not warmed
+        
+        await self.factory.clear_cache()
+    
+    @pytest.mark.asyncio
+    async def test_provider_warmup(self, mocked_api):
+        """测试预热请求经由提供商的连接池发送"""
+        provider = QwenProvider(LLMConfig(
+            api_key="test_qwen_key",
+            api_url=QWEN_API_URL,
+            model="qwen-turbo"
+        ))
+        mocked_api.head(QWEN_API_URL, status=405)
+        
+        assert await provider.warmup() is True
+        
+        await provider.close()
+    
     def test_get_supported_providers(self):
         """测试获取支持的提供商列表"""
         supported = self.factory.get_supported_providers()
@@ -403,14 +734,15 @@ class TestProviderFactory:
         assert "openai" in supported  # 预留的
         assert "claude" in supported  # 预留的
     
-    def test_clear_cache(self):
+    @pytest.mark.asyncio
+    async def test_clear_cache(self):
         """测试清除缓存"""
         # 创建一个提供商实例
         provider1 = self.factory.get_provider("qwen", self.qwen_config)
         assert len(self.factory._instances) == 1
         
         # 清除缓存
-        self.factory.clear_cache()
+        await self.factory.clear_cache()
         assert len(self.factory._instances) == 0
         
         # 再次获取应该是新实例
@@ -435,6 +767,48 @@ class TestProviderFactory:
                 assert results["qwen"] is True
                 assert results["gemini"] is False
     
+    @pytest.mark.asyncio
+    async def test_validate_providers_is_concurrent(self):
+        """测试提供商验证并发执行"""
+        async def slow_validate():
+            await asyncio.sleep(0.1)
+            return True
+        
+        mock_provider = Mock()
+        mock_provider.validate_connection = slow_validate
+        
+        with patch.object(self.factory, 'get_or_create_provider', return_value=mock_provider):
+            start = time.perf_counter()
+            results = await self.factory.validate_providers(
+                [ProviderType.QWEN, ProviderType.GEMINI, ProviderType.OPENAI, ProviderType.CLAUDE]
+            )
+            elapsed = time.perf_counter() - start
+        
+        assert all(results.values())
+        assert elapsed < 0.2
+    
+    @pytest.mark.asyncio
+    async def test_validate_providers_reuses_cached_instance(self):
+        """测试重复验证复用按配置缓存的提供商实例"""
+        base_config = {
+            "api_key": "test_qwen_key",
+            "api_url": "https://dashscope.aliyuncs.com/api/v1",
+            "model": "qwen-turbo"
+        }
+        
+        with patch.object(self.factory._config, 'get_llm_provider_config', return_value=base_config), \
+                patch.object(QwenProvider, 'validate_connection', new_callable=AsyncMock, return_value=True) as mock_validate:
+            first = await self.factory.validate_providers([ProviderType.QWEN])
+            provider = self.factory.get_or_create_provider(ProviderType.QWEN)
+            second = await self.factory.validate_providers([ProviderType.QWEN])
+        
+        assert first == second == {"qwen": True}
+        assert len(self.factory) == 1
+        assert isinstance(provider, QwenProvider)
+        assert mock_validate.await_count == 2
+        
+        await self.factory.clear_cache()
+    
     def test_get_all_model_info(self):
         """测试获取所有模型信息"""
         configs = {
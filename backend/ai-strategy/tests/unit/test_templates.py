@@ -108,6 +108,27 @@ class TestTemplateManager:
         assert "dual_ma_crossover" in template_ids
         assert "rsi_mean_reversion" in template_ids
     
+    def test_builtin_templates_parsed_once(self):
+        """测试内置模板只解析一次且实例间互不影响"""
+        manager1 = TemplateManager()
+        manager2 = TemplateManager()
+        
+        assert manager1.template_codes["dual_ma_crossover"] is manager2.template_codes["dual_ma_crossover"]
+        assert manager1.templates["dual_ma_crossover"] is not manager2.templates["dual_ma_crossover"]
+        
+        manager1.get_template("dual_ma_crossover")
+        assert manager2.templates["dual_ma_crossover"].usage_count == 0
+    
+    def test_template_metadata_slots(self):
+        """测试模板元数据使用__slots__存储"""
+        metadata = self.manager.templates["dual_ma_crossover"]
+        
+        with pytest.raises(AttributeError):
+            metadata.__dict__
+        
+        metadata.usage_count += 1
+        assert metadata.usage_count == 1
+    
     def test_get_template_existing(self):
         """测试获取存在的模板"""
         # 添加测试模板
@@ -197,6 +218,14 @@ class TestTemplateManager:
         assert len(results1) == len(results2)
         assert len(results1) >= 1
     
+    def test_search_templates_after_update(self):
+        """测试更新模板后搜索结果同步"""
+        with patch.object(self.manager, '_save_template_to_file'):
+            self.manager.update_template("rsi_mean_reversion", {"name": "Oscillator Reversal"})
+        
+        assert [t.id for t in self.manager.search_templates("oscillator")] == ["rsi_mean_reversion"]
+        assert self.manager.search_templates("RSI均值回归策略") == []
+    
     def test_create_template(self):
         """测试创建模板"""
         template_data = {
@@ -217,6 +246,37 @@ class TestTemplateManager:
         assert template.category == "momentum"
         assert template.id in self.manager.templates
     
+    def test_template_indexes_follow_mutations(self):
+        """测试创建、更新、删除模板时索引同步更新"""
+        template_data = {
+            "name": "索引测试模板",
+            "description": "用于测试索引",
+            "category": "momentum",
+            "difficulty": "advanced",
+            "market_type": "forex",
+            "code": "class IndexStrategy: pass",
+            "tags": ["index"]
+        }
+        
+        # 模板目录中可能已有其他测试留下的自定义模板，按增量断言
+        momentum_before = self.manager.get_category_stats().get("momentum", 0)
+        volatility_before = {t.id for t in self.manager.list_templates(category="volatility")}
+        
+        with patch.object(self.manager, '_save_template_to_file'), \
+             patch.object(self.manager, '_delete_template_file'):
+            template = self.manager.create_template(template_data)
+            assert [t.id for t in self.manager.list_templates(market_type="forex", tags=["index"])] == [template.id]
+            assert self.manager.get_category_stats()["momentum"] == momentum_before + 1
+            
+            self.manager.update_template(template.id, {"category": "volatility", "tags": ["renamed"]})
+            assert self.manager.list_templates(tags=["index"]) == []
+            assert self.manager.get_category_stats().get("momentum", 0) == momentum_before
+            assert {t.id for t in self.manager.list_templates(category="volatility")} == volatility_before | {template.id}
+            
+            assert self.manager.delete_template(template.id) is True
+            assert {t.id for t in self.manager.list_templates(category="volatility")} == volatility_before
+            assert ("volatility" in self.manager.get_categories()) == bool(volatility_before)
+    
     def test_create_template_missing_required_fields(self):
         """测试创建缺少必需字段的模板"""
         incomplete_data = {
@@ -292,8 +352,8 @@ class TestTemplateManager:
         assert stats["trend"] >= 1  # 至少有一个趋势模板
         assert stats["mean_reversion"] >= 1  # 至少有一个均值回归模板
     
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("json.load")
+    @patch("builtins.open", new_callable=mock_open, read_data=b"[]")
+    @patch("ai_strategy.templates.manager._json_loads")
     def test_load_custom_templates_success(self, mock_json_load, mock_file):
         """测试成功加载自定义模板"""
         custom_templates_data = [
@@ -315,6 +375,7 @@ class TestTemplateManager:
         manager = TemplateManager()
         manager._load_custom_templates("custom_templates.json")
         
+        mock_json_load.assert_called_with(b"[]")
         assert "custom_template_1" in manager.templates
         custom_template = manager.templates["custom_template_1"]
         assert custom_template.name == "自定义模板1"
@@ -331,8 +392,8 @@ class TestTemplateManager:
         builtin_count = len([t for t in manager.templates.values() if t.id.startswith(("dual_ma", "rsi_"))])
         assert len(manager.templates) == builtin_count
     
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("json.load", side_effect=json.JSONDecodeError("Invalid JSON", "", 0))
+    @patch("builtins.open", new_callable=mock_open, read_data=b"{")
+    @patch("ai_strategy.templates.manager._json_loads", side_effect=json.JSONDecodeError("Invalid JSON", "", 0))
     def test_load_custom_templates_invalid_json(self, mock_json_load, mock_file):
         """测试无效的JSON文件"""
         manager = TemplateManager()
@@ -1,18 +1,33 @@
 """策略验证器单元测试"""
 
 import pytest
-import ast
 from unittest.mock import patch, MagicMock
 
-from ai_strategy.core.validator import StrategyValidator, ValidationLevel
+from ai_strategy.core.validator import StrategyValidator, ValidationLevel, _parse_code
 from ai_strategy.models.responses import ValidationResult, ValidationStatus
 
+# 多个结构检查共用的有效策略代码，语法树在模块导入时解析一次
+VALID_STRATEGY_CODE = """
+class ValidStrategy:
+    def __init__(self, param1=10, param2=0.5):
+        self.param1 = param1
+        self.param2 = param2
+    
+    def generate_signals(self, data):
+        return [1, 0, 1, 0]
+    
+    def calculate_returns(self, data, signals):
+        return [0.01, 0.02, -0.01, 0.03]
+"""
+
+_VALID_TREE = _parse_code(VALID_STRATEGY_CODE)
+
 class TestStrategyValidator:
     """策略验证器测试类"""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def validator(self):
-        """验证器实例"""
+        """验证器实例，验证器无状态，整个模块共用一个"""
         return StrategyValidator()
     
     def test_validator_initialization(self, validator):
@@ -206,21 +221,7 @@ class DangerousStrategy:
     
     def test_check_class_structure_valid(self, validator):
         """测试类结构检查 - 有效结构"""
-        valid_code = """
-class ValidStrategy:
-    def __init__(self, param1=10, param2=0.5):
-        self.param1 = param1
-        self.param2 = param2
-    
-    def generate_signals(self, data):
-        return [1, 0, 1, 0]
-    
-    def calculate_returns(self, data, signals):
-        return [0.01, 0.02, -0.01, 0.03]
-"""
-        
-        tree = ast.parse(valid_code)
-        errors = validator._check_class_structure(tree)
+        errors = validator._check_class_structure(_VALID_TREE)
         assert len(errors) == 0
     
     def test_check_class_structure_no_class(self, validator):
@@ -232,27 +233,14 @@ def function():
 value = 42
 """
         
-        tree = ast.parse(no_class_code)
+        tree = _parse_code(no_class_code)
         errors = validator._check_class_structure(tree)
         assert len(errors) > 0
         assert any("class" in error.lower() for error in errors)
     
     def test_check_method_signatures_valid(self, validator):
         """测试方法签名检查 - 有效签名"""
-        valid_code = """
-class ValidStrategy:
-    def __init__(self, param1=10):
-        self.param1 = param1
-    
-    def generate_signals(self, data):
-        return []
-    
-    def calculate_returns(self, data, signals):
-        return []
-"""
-        
-        tree = ast.parse(valid_code)
-        errors = validator._check_method_signatures(tree)
+        errors = validator._check_method_signatures(_VALID_TREE)
         assert len(errors) == 0
     
     def test_check_method_signatures_invalid(self, validator):
@@ -266,7 +254,7 @@ class InvalidStrategy:
         return []
 """
         
-        tree = ast.parse(invalid_code)
+        tree = _parse_code(invalid_code)
         errors = validator._check_method_signatures(tree)
         # 根据具体实现，可能会有错误
         # assert len(errors) > 0
@@ -285,7 +273,7 @@ class SafeStrategy:
         return result
 """
         
-        tree = ast.parse(safe_code)
+        tree = _parse_code(safe_code)
         errors = validator._check_dangerous_operations(tree)
         assert len(errors) == 0
     
@@ -305,7 +293,7 @@ class UnsafeStrategy:
             return f.read()
 """
         
-        tree = ast.parse(unsafe_code)
+        tree = _parse_code(unsafe_code)
         errors = validator._check_dangerous_operations(tree)
         assert len(errors) > 0
     
@@ -511,14 +499,19 @@ class AdvancedMovingAverageStrategy:
         mas = self.calculate_moving_averages(data)
         signals = []
         
-        for i in range(len(data)):
+        # Convert to ndarrays once; .iloc lookups inside the loop are slow
+        prices = data.values
+        short_mas = mas['short_ma'].values
+        long_mas = mas['long_ma'].values
+        
+        for i in range(len(prices)):
             if i < self.long_period:
                 signals.append(0)
                 continue
             
-            current_price = data.iloc[i]
-            short_ma = mas['short_ma'].iloc[i]
-            long_ma = mas['long_ma'].iloc[i]
+            current_price = prices[i]
+            short_ma = short_mas[i]
+            long_ma = long_mas[i]
             
             # Risk management
             if self.position != 0:
@@ -562,17 +555,15 @@ class AdvancedMovingAverageStrategy:
         Returns:
             List of returns
         \"\"\"
-        returns = [0.0]  # First return is always 0
+        prices = np.asarray(data, dtype=float)
+        returns = np.zeros_like(prices)  # First return is always 0
         
-        for i in range(1, len(data)):
-            if i-1 < len(signals) and signals[i-1] != 0:
-                price_return = (data.iloc[i] - data.iloc[i-1]) / data.iloc[i-1]
-                strategy_return = signals[i-1] * price_return
-                returns.append(strategy_return)
-            else:
-                returns.append(0.0)
+        # Signal i applies to the price change from bar i to bar i+1
+        n = min(len(signals), len(prices) - 1)
+        if n > 0:
+            returns[1:n + 1] = np.asarray(signals[:n]) * np.diff(prices[:n + 1]) / prices[:n]
         
-        return returns
+        return returns.tolist()
     
     def get_performance_metrics(self, returns: List[float]) -> Dict[str, float]:
         \"\"\"Calculate performance metrics.
@@ -609,6 +600,153 @@ class AdvancedMovingAverageStrategy:
         assert result.is_valid is True
         assert len(result.errors) == 0
         assert result.quality_score > 0.8  # 应该是高质量分数
+    
+    @pytest.mark.asyncio
+    async def test_perform_validation_parses_once(self, validator):
+        """测试全面验证只解析一次代码"""
+        code = """
+import pandas as pd
+
+class SingleParseStrategy:
+    def __init__(self):
+        self.period = 10
+    
+    def generate_signals(self, data):
+        return data.rolling(self.period).mean()
+"""
+        _parse_code.cache_clear()
+        
+        await validator._perform_validation(code, ValidationLevel.COMPREHENSIVE)
+        await validator._perform_validation(code, ValidationLevel.COMPREHENSIVE)
+        
+        info = _parse_code.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
+    
+    @pytest.mark.asyncio
+    async def test_perform_validation_reports_syntax_error_once(self, validator):
+        """测试解析失败时仍由语法检查报告错误"""
+        issues = await validator._perform_validation("class Broken(:\n    pass", ValidationLevel.STANDARD)
+        
+        syntax_issues = [issue for issue in issues if issue["rule"] == "syntax_check"]
+        assert len(syntax_issues) == 1
+        assert syntax_issues[0]["type"] == "syntax_error"
+    
+    @pytest.mark.asyncio
+    async def test_check_dangerous_imports_uses_ast(self, validator):
+        """测试危险导入检查基于语法树而非子串匹配"""
+        code = """
+import pandas as pd
+import os.path
+from subprocess import Popen
+
+class SecurityStrategy:
+    def __init__(self):
+        self.pattern = re.compile("sys")  # 注释中的 os 不应被误报
+    
+    def generate_signals(self, data):
+        eval("1 + 1")
+        os.system("ls")
+        return data
+"""
+        issues = await validator._check_dangerous_imports(code)
+        
+        found = {(issue["type"], issue["message"], issue["line"]) for issue in issues}
+        assert found == {
+            ("dangerous_import", "检测到危险导入: os", 3),
+            ("dangerous_import", "检测到危险导入: subprocess", 4),
+            ("dangerous_call", "检测到危险调用: eval", 11),
+            ("dangerous_call", "检测到危险调用: system", 12),
+        }
+    
+    @pytest.mark.asyncio
+    async def test_check_dangerous_imports_call_only_on_subprocess(self, validator):
+        """测试只有 subprocess.call 被视为危险调用，其他对象的call方法不误报"""
+        code = """
+class CallStrategy:
+    def generate_signals(self, data):
+        self.broker.call("order", data)
+        subprocess.call(["ls"])
+        return data
+"""
+        issues = await validator._check_dangerous_imports(code)
+        
+        assert [(issue["message"], issue["line"]) for issue in issues] == [
+            ("检测到危险调用: subprocess.call", 5),
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_check_dangerous_imports_syntax_error(self, validator):
+        """测试无法解析的代码交由语法检查处理"""
+        issues = await validator._check_dangerous_imports("import os\nclass Broken(:")
+        assert issues == []
+    
+    @pytest.mark.asyncio
+    async def test_check_method_signature_top_level_only(self, validator):
+        """测试方法签名检查只检查顶层类"""
+        code = """
+class OuterStrategy:
+    class Params:
+        period = 10
+    
+    def __init__(self):
+        self.params = self.Params()
+"""
+        issues = await validator._check_method_signature(code)
+        
+        assert [issue["message"] for issue in issues] == ["缺少必需方法: generate_signals"]
+        assert issues[0]["line"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_check_performance_check_elementwise_loop(self, validator):
+        """测试性能检查识别逐元素遍历pandas对象的循环"""
+        code = """
+class LoopStrategy:
+    def __init__(self):
+        self.period = 10
+    
+    def generate_signals(self, data):
+        signals = []
+        for i in range(len(data)):
+            signals.append(1 if data.iloc[i] > data.iloc[i - 1] else 0)
+        for index, row in data.iterrows():
+            pass
+        for i in range(len(signals)):
+            signals[i] = -signals[i]
+        return signals
+"""
+        issues = await validator._check_performance_check(code)
+        
+        assert [(issue["type"], issue["line"]) for issue in issues] == [("python_loop", 8), ("python_loop", 10)]
+        assert validator._generate_suggestions(issues)
+    
+    @pytest.mark.asyncio
+    async def test_check_operations_single_scan(self, validator):
+        """测试文件和网络操作检查的行列定位"""
+        code = "x = 1\n    with open('f') as f:\n        f.read(); f.read()\nr = requests.get(u); s.send(b)\n"
+        
+        file_issues = await validator._check_file_operations(code)
+        network_issues = await validator._check_network_operations(code)
+        
+        assert [(i["line"], i["column"], i["message"]) for i in file_issues] == [
+            (2, 4, "检测到文件操作: with open"),
+            (2, 9, "检测到文件操作: open"),
+            (3, 10, "检测到文件操作: read"),
+        ]
+        assert [(i["line"], i["column"], i["message"]) for i in network_issues] == [
+            (4, 4, "检测到网络操作: requests."),
+            (4, 23, "检测到网络操作: send("),
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_check_file_operations_with_open(self, validator):
+        """测试 with open(...) 同时报告 with open 和 open"""
+        issues = await validator._check_file_operations("with open('data.csv') as f:\n    pass\n")
+        
+        assert [(i["line"], i["column"], i["message"]) for i in issues] == [
+            (1, 0, "检测到文件操作: with open"),
+            (1, 5, "检测到文件操作: open"),
+        ]
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -1,14 +1,73 @@
 """配置管理模块"""
 
 import os
+import re
+import functools
 import yaml
 from typing import Dict, Any, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    # 优先使用libyaml的C实现，解析速度快数倍
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # libyaml不可用时回退到纯Python实现
+    from yaml import SafeLoader
+
 # 加载环境变量
 load_dotenv()
 
+# 表示配置项缺失的哨兵对象，用于区分"键不存在"与"值为None"
+_MISSING = object()
+
+# 环境变量引用，支持 ${VAR} 和 ${VAR:默认值} 两种写法
+_ENV_VAR_PATTERN = re.compile(r'\$\{([^:}]+)(?::([^}]*))?\}')
+
+def _substitute_env_vars(value: str, default: Any = None) -> Any:
+    """替换字符串中的环境变量引用
+    
+    Args:
+        value: 配置字符串
+        default: 整个值为 ${VAR} 且环境变量不存在时返回的默认值
+    
+    Returns:
+        替换后的值
+    """
+    match = _ENV_VAR_PATTERN.fullmatch(value)
+    if match:
+        env_key, fallback = match.groups()
+        return os.getenv(env_key, default if fallback is None else fallback)
+    
+    return _ENV_VAR_PATTERN.sub(lambda m: os.getenv(m.group(1), m.group(2) or ''), value)
+
+def _resolve_env(node: Any) -> Any:
+    """递归替换配置树中的环境变量引用，返回新的配置树
+    
+    整个值为 ${VAR} 且环境变量不存在、也没有默认值时，字典中省略该键，
+    列表中以None占位
+    
+    Args:
+        node: 配置节点
+    
+    Returns:
+        替换后的配置节点，需要省略时返回 _MISSING
+    """
+    if isinstance(node, dict):
+        resolved = {}
+        for k, v in node.items():
+            v = _resolve_env(v)
+            if v is not _MISSING:
+                resolved[k] = v
+        return resolved
+    
+    if isinstance(node, list):
+        return [None if (item := _resolve_env(v)) is _MISSING else item for v in node]
+    
+    if type(node) is str and '${' in node:
+        return _substitute_env_vars(node, _MISSING)
+    
+    return node
+
 class ConfigManager:
     """配置管理器"""
     
@@ -23,19 +82,77 @@ class ConfigManager:
         
         self.config_path = Path(config_path)
         self._config: Dict[str, Any] = {}
+        self._flat: Dict[str, Any] = {}
+        self._providers: Dict[str, Any] = {}
+        self._app: Dict[str, Any] = {}
+        self._mtime_ns: Optional[int] = None
         self._load_config()
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConfigManager":
+        """由内存中的配置字典构建配置管理器，不读取配置文件
+        
+        Args:
+            data: 配置字典
+        
+        Returns:
+            配置管理器实例
+        """
+        instance = cls.__new__(cls)
+        instance.config_path = None
+        instance._config = _resolve_env(data)
+        instance._mtime_ns = None
+        instance._build_indexes()
+        return instance
+    
     def _load_config(self) -> None:
         """加载配置文件"""
         try:
             if self.config_path.exists():
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self._config = yaml.safe_load(f) or {}
+                mtime_ns = self._get_mtime_ns()
+                # 以二进制流交给解析器，由libyaml直接解码UTF-8并流式读取
+                with open(self.config_path, 'rb') as f:
+                    self._config = yaml.load(f, Loader=SafeLoader) or {}
+                # 环境变量只在加载时替换一次，get() 直接返回结果
+                self._config = _resolve_env(self._config)
+                self._build_indexes()
+                self._mtime_ns = mtime_ns
             else:
                 raise FileNotFoundError(f"配置文件不存在: {self.config_path}")
         except Exception as e:
             raise RuntimeError(f"加载配置文件失败: {e}")
     
+    def _build_indexes(self) -> None:
+        """根据当前配置树重建查找索引"""
+        self._build_flat_index()
+        self._providers = self._config.get('llm_providers', {})
+        self._app = self._config.get('app', {})
+    
+    def _build_flat_index(self) -> None:
+        """将嵌套配置展开为点号分隔键的扁平字典
+        
+        中间节点同样保留，如 'app' 和 'app.name' 都可直接查找
+        """
+        flat: Dict[str, Any] = {}
+        stack = [("", self._config)]
+        
+        while stack:
+            prefix, node = stack.pop()
+            for k, v in node.items():
+                full_key = f"{prefix}{k}"
+                flat[full_key] = v
+                if isinstance(v, dict):
+                    stack.append((f"{full_key}.", v))
+        
+        self._flat = flat
+    
+    def _get_mtime_ns(self) -> Optional[int]:
+        """获取配置文件的修改时间（纳秒），文件不可访问时返回None"""
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+    
     def get(self, key: str, default: Any = None) -> Any:
         """获取配置值
         
@@ -46,21 +163,7 @@ class ConfigManager:
         Returns:
             配置值
         """
-        keys = key.split('.')
-        value = self._config
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        
-        # 如果值是字符串且包含环境变量引用，则替换
-        if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
-            env_key = value[2:-1]
-            return os.getenv(env_key, default)
-        
-        return value
+        return self._flat.get(key, default)
     
     def get_llm_config(self, provider: str) -> Dict[str, Any]:
         """获取LLM提供商配置
@@ -75,6 +178,9 @@ class ConfigManager:
         if not config:
             raise ValueError(f"未找到LLM提供商配置: {provider}")
         
+        # 复制一份，避免写入api_key污染共享的配置树
+        config = dict(config)
+        
         # 从环境变量获取API密钥
         api_key_env = f"{provider.upper()}_API_KEY"
         config['api_key'] = os.getenv(api_key_env)
@@ -84,9 +190,22 @@ class ConfigManager:
         
         return config
     
+    def get_llm_provider_config(self, provider: str) -> Dict[str, Any]:
+        """获取LLM提供商的原始配置
+        
+        与 get_llm_config 不同，不注入API密钥，提供商不存在时返回空字典
+        
+        Args:
+            provider: 提供商名称
+        
+        Returns:
+            提供商配置
+        """
+        return self._providers.get(provider, {})
+    
     def get_app_config(self) -> Dict[str, Any]:
         """获取应用配置"""
-        return self.get('app', {})
+        return self._app
     
     def get_logging_config(self) -> Dict[str, Any]:
         """获取日志配置"""
@@ -126,8 +245,23 @@ class ConfigManager:
         
         return providers
     
-    def reload(self) -> None:
-        """重新加载配置"""
+    def reload(self, force: bool = False) -> None:
+        """重新加载配置
+        
+        配置文件的修改时间未变化时跳过解析，只需一次stat调用
+        
+        Args:
+            force: 是否忽略修改时间强制重新解析
+        """
+        if self.config_path is None:
+            # 由字典构建的配置没有可重新加载的文件
+            return
+        
+        if not force:
+            mtime_ns = self._get_mtime_ns()
+            if mtime_ns is not None and mtime_ns == self._mtime_ns:
+                return
+        
         self._load_config()
     
     def validate_config(self) -> bool:
@@ -158,8 +292,31 @@ class ConfigManager:
         
         return True
 
+@functools.lru_cache(maxsize=1)
+def get_config_manager() -> ConfigManager:
+    """获取全局配置管理器实例
+    
+    首次调用时创建，之后直接返回缓存的实例；
+    需要重新创建时调用 get_config_manager.cache_clear()
+    
+    Returns:
+        配置管理器实例
+    """
+    return ConfigManager()
+
+class _LazyConfig:
+    """全局配置实例的惰性代理
+    
+    首次访问属性时才创建配置管理器，仅导入模块时不读取和解析配置文件
+    """
+    
+    __slots__ = ()
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_config_manager(), name)
+
 # 全局配置实例
-config = ConfigManager()
+config = _LazyConfig()
 
 # 便捷函数
 def get_config(key: str = None, default: Any = None) -> Any:
@@ -173,21 +330,21 @@ def get_config(key: str = None, default: Any = None) -> Any:
         配置值或配置实例
     """
     if key is None:
-        return config
-    return config.get(key, default)
+        return get_config_manager()
+    return get_config_manager().get(key, default)
 
 def get_llm_config(provider: str) -> Dict[str, Any]:
     """获取LLM配置的便捷函数"""
-    return config.get_llm_config(provider)
+    return get_config_manager().get_llm_config(provider)
 
 def is_debug_mode() -> bool:
     """检查是否为调试模式"""
-    return config.get('app.debug', False)
+    return get_config_manager().get('app.debug', False)
 
 def get_app_port() -> int:
     """获取应用端口"""
-    return config.get('app.port', 8005)
+    return get_config_manager().get('app.port', 8005)
 
 def get_app_host() -> str:
     """获取应用主机"""
-    return config.get('app.host', '0.0.0.0')
\ No newline at end of file
+    return get_config_manager().get('app.host', '0.0.0.0')
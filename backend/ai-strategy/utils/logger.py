@@ -1,47 +1,66 @@
 """日志配置模块"""
 
+import asyncio
+import atexit
+import functools
 import logging
 import logging.handlers
+import queue
+import re
 import sys
+import time
 from pathlib import Path
 from typing import Optional
 
 from .config import config
 
-def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
-    """设置日志记录器
+# 文件大小字符串，如 '1024'、'10K'、'10MB'，单位不区分大小写
+_SIZE_PATTERN = re.compile(r'^\s*(\d+)\s*([KMG]?B?)\s*$', re.IGNORECASE)
+
+_SIZE_MULTIPLIERS = {
+    '': 1,
+    'B': 1,
+    'K': 1024,
+    'KB': 1024,
+    'M': 1024 ** 2,
+    'MB': 1024 ** 2,
+    'G': 1024 ** 3,
+    'GB': 1024 ** 3,
+}
+
+# 所有日志记录器共用的队列处理器，首次 setup_logger 时创建
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+def _get_queue_handler() -> logging.handlers.QueueHandler:
+    """获取共享的队列处理器
     
-    Args:
-        name: 日志记录器名称
-        level: 日志级别，如果不指定则使用配置文件中的级别
+    格式化器、控制台/文件处理器和后台监听线程只在首次调用时按日志配置创建一次，
+    之后每个日志记录器只挂载同一个队列处理器
     
     Returns:
-        配置好的日志记录器
+        共享的队列处理器
     """
-    logger = logging.getLogger(name)
-    
-    # 如果已经配置过，直接返回
-    if logger.handlers:
-        return logger
+    global _queue_handler
+    if _queue_handler is not None:
+        return _queue_handler
     
     # 获取日志配置
     log_config = config.get_logging_config()
-    log_level = level or log_config.get('level', 'INFO')
     log_format = log_config.get('format', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     log_file = log_config.get('file')
     max_file_size = log_config.get('max_file_size', '10MB')
     backup_count = log_config.get('backup_count', 5)
     
-    # 设置日志级别
-    logger.setLevel(getattr(logging, log_level.upper()))
-    
     # 创建格式化器
     formatter = logging.Formatter(log_format)
     
+    # 实际输出的处理器由后台监听线程持有，不直接挂到日志记录器上
+    handlers = []
+    
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # 文件处理器（如果配置了文件路径）
     if log_file:
@@ -58,7 +77,51 @@ def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        
+        # 文件日志先在内存中攒批，满256条或遇到ERROR及以上级别时再一次性写盘
+        handlers.append(logging.handlers.MemoryHandler(
+            capacity=256,
+            flushLevel=logging.ERROR,
+            target=file_handler,
+            flushOnClose=True
+        ))
+    
+    # 调用方只把日志记录放入队列，格式化和磁盘写入在监听线程中完成
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    return _queue_handler
+
+def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
+    """设置日志记录器
+    
+    Args:
+        name: 日志记录器名称
+        level: 日志级别，如果不指定则使用配置文件中的级别
+    
+    Returns:
+        配置好的日志记录器
+    """
+    logger = logging.getLogger(name)
+    queue_handler = _get_queue_handler()
+    
+    # 如果已经配置过，直接返回，避免重复挂载处理器
+    if queue_handler in logger.handlers:
+        return logger
+    
+    # 清理其他途径挂载的处理器，防止同一条日志被重复输出
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    
+    # 设置日志级别
+    log_level = level or config.get_logging_config().get('level', 'INFO')
+    logger.setLevel(getattr(logging, log_level.upper()))
+    
+    logger.addHandler(queue_handler)
     
     return logger
 
@@ -66,22 +129,19 @@ def _parse_file_size(size_str: str) -> int:
     """解析文件大小字符串
     
     Args:
-        size_str: 大小字符串，如 '10MB', '1GB'
+        size_str: 大小字符串，如 '10MB', '1GB', '10K'
     
     Returns:
         字节数
+    
+    Raises:
+        ValueError: 格式无效
     """
-    size_str = size_str.upper().strip()
-    
-    if size_str.endswith('KB'):
-        return int(size_str[:-2]) * 1024
-    elif size_str.endswith('MB'):
-        return int(size_str[:-2]) * 1024 * 1024
-    elif size_str.endswith('GB'):
-        return int(size_str[:-2]) * 1024 * 1024 * 1024
-    else:
-        # 默认为字节
-        return int(size_str)
+    match = _SIZE_PATTERN.match(size_str)
+    if not match:
+        raise ValueError(f"无效的文件大小: {size_str!r}")
+    
+    return int(match.group(1)) * _SIZE_MULTIPLIERS[match.group(2).upper()]
 
 def get_logger(name: str) -> logging.Logger:
     """获取日志记录器的便捷函数
@@ -94,57 +154,93 @@ def get_logger(name: str) -> logging.Logger:
     """
     return setup_logger(name)
 
-# 创建默认日志记录器
-default_logger = setup_logger('ai_strategy')
+def __getattr__(name: str):
+    """惰性创建默认日志记录器，导入模块时不读取日志配置"""
+    if name == 'default_logger':
+        return setup_logger('ai_strategy')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _ClassLogger:
+    """按类解析日志记录器的描述符
+    
+    首次访问时获取以类名命名的日志记录器，并用它替换类上的描述符本身，
+    之后 self.logger 只是一次普通的类属性读取
+    """
+    
+    def __set_name__(self, owner, name):
+        self._name = name
+    
+    def __get__(self, obj, owner=None) -> logging.Logger:
+        if owner is None:
+            owner = type(obj)
+        logger = get_logger(owner.__name__)
+        setattr(owner, self._name, logger)
+        return logger
 
 class LoggerMixin:
     """日志记录器混入类"""
     
-    @property
-    def logger(self) -> logging.Logger:
-        """获取当前类的日志记录器"""
-        if not hasattr(self, '_logger'):
-            self._logger = get_logger(self.__class__.__name__)
-        return self._logger
+    logger = _ClassLogger()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 每个子类使用独立的描述符，避免继承父类已缓存的日志记录器
+        if 'logger' not in cls.__dict__:
+            descriptor = _ClassLogger()
+            descriptor.__set_name__(cls, 'logger')
+            cls.logger = descriptor
 
-def log_execution_time(func):
-    """记录函数执行时间的装饰器"""
-    import time
-    import functools
-    
-    @functools.wraps(func)
-    async def async_wrapper(*args, **kwargs):
-        start_time = time.time()
-        logger = get_logger(func.__module__)
+def log_execution_time(func=None, *, logger: Optional[logging.Logger] = None, level: str = 'INFO'):
+    """记录函数执行时间的装饰器
+    
+    可直接使用 @log_execution_time，也可带参数使用 @log_execution_time(level='DEBUG')
+    
+    Args:
+        func: 被装饰的函数
+        logger: 日志记录器，默认使用函数所在模块的日志记录器
+        level: 成功时的日志级别
+    """
+    # 日志级别在装饰时解析一次，调用时不再做字符串转换
+    level_int = getattr(logging, level.upper(), logging.INFO)
+    
+    def decorator(func):
+        log = logger or get_logger(func.__module__)
         
-        try:
-            result = await func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            logger.info(f"{func.__name__} 执行完成，耗时: {execution_time:.2f}秒")
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_ns = time.perf_counter_ns()
+            
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                elapsed_ms = (time.perf_counter_ns() - start_ns) / 1e6
+                log.error("%s 执行失败，耗时: %.3f毫秒，错误: %s", func.__name__, elapsed_ms, e)
+                raise
+            
+            # 使用%格式的惰性参数，级别被过滤时不做格式化
+            log.log(level_int, "%s 执行完成，耗时: %.3f毫秒", func.__name__, (time.perf_counter_ns() - start_ns) / 1e6)
             return result
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"{func.__name__} 执行失败，耗时: {execution_time:.2f}秒，错误: {e}")
-            raise
-    
-    @functools.wraps(func)
-    def sync_wrapper(*args, **kwargs):
-        start_time = time.time()
-        logger = get_logger(func.__module__)
         
-        try:
-            result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            logger.info(f"{func.__name__} 执行完成，耗时: {execution_time:.2f}秒")
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            start_ns = time.perf_counter_ns()
+            
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                elapsed_ms = (time.perf_counter_ns() - start_ns) / 1e6
+                log.error("%s 执行失败，耗时: %.3f毫秒，错误: %s", func.__name__, elapsed_ms, e)
+                raise
+            
+            log.log(level_int, "%s 执行完成，耗时: %.3f毫秒", func.__name__, (time.perf_counter_ns() - start_ns) / 1e6)
             return result
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"{func.__name__} 执行失败，耗时: {execution_time:.2f}秒，错误: {e}")
-            raise
-    
-    # 检查是否为异步函数
-    import asyncio
-    if asyncio.iscoroutinefunction(func):
-        return async_wrapper
-    else:
-        return sync_wrapper
\ No newline at end of file
+        
+        # 检查是否为异步函数
+        if asyncio.iscoroutinefunction(func):
+            return async_wrapper
+        else:
+            return sync_wrapper
+    
+    if func is None:
+        return decorator
+    return decorator(func)